@@ -0,0 +1,384 @@
+"""
+Per-request performance instrumentation.
+
+MetricsMiddleware measures, for every request, the total latency, the
+number and duration of the database queries, the template rendering time
+and the cache hits and misses. They are sent back in a Server-Timing header
+and aggregated, per view, into histograms exposed in the Prometheus text
+format by ``metrics_view``.
+
+The measures are collected through supported extension points: a database
+execute wrapper installed on every connection, the DjangoTemplates backend
+below and the InstrumentedCache backend below, which wraps any cache
+backend. Outside of a request they cost a context variable lookup. The
+middleware runs in both sync and async mode, so it does not push async
+views onto a thread under ASGI.
+
+The aggregates are kept in the memory of each worker process, and
+``metrics_view`` answers with those of the worker serving it. Every sample
+carries a ``worker`` label (METRICS_WORKER, or the host name and the process
+id): each worker must be scraped on its own, and the series summed in
+Prometheus, e.g. ``sum without (worker) (rate(...))``. Scraped through a
+load balancer, /metrics would return the counts of a different worker every
+time.
+"""
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+from django.utils.module_loading import import_string
+
+# Upper bounds of the histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+DEFAULT_ALLOWED_IPS = ("127.0.0.1", "::1")
+
+_current = ContextVar("request_metrics", default=None)
+_missing = object()
+
+
+class RequestMetrics:
+    """
+    The measures of the request being served.
+
+    Attributes:
+        queries (int): The number of database queries run.
+        db_time (float): The time spent in the database, in seconds.
+        template_time (float): The time spent rendering templates, in seconds.
+        cache_hits (int): The number of cache keys found.
+        cache_misses (int): The number of cache keys not found.
+        view (str): The name of the view serving the request, once resolved.
+    """
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._rendering = 0
+
+
+def current():
+    """
+    Return the measures of the request being served, or None.
+    """
+    return _current.get()
+
+
+def record_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting and timing the queries of a request.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def install(connection, **kwargs):
+    """
+    Add the execute wrappers to a new database connection.
+    """
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+connection_created.connect(install)
+
+
+def record_cache(hits, misses):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+class InstrumentedCache:
+    """
+    Cache backend counting the hits and misses of the current request.
+
+    It wraps the backend given as OPTIONS["BACKEND"], which receives the
+    rest of the configuration:
+
+        "BACKEND": "core.metrics.InstrumentedCache",
+        "OPTIONS": {"BACKEND": "django.core.cache.backends.redis.RedisCache"},
+
+    Only the lookups made through ``get`` and ``get_many`` are counted.
+    """
+    def __init__(self, location, params):
+        options = dict(params.get("OPTIONS", {}))
+        backend = import_string(options.pop("BACKEND"))
+        self._cache = backend(location, dict(params, OPTIONS=options))
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, _missing, version)
+        if value is _missing:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self._cache.get_many(keys, version)
+        record_cache(len(found), len(keys) - len(found))
+        return found
+
+
+@contextmanager
+def _rendering():
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    # Templates rendered while rendering a page (fragments) are part of it.
+    metrics._rendering += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._rendering -= 1
+        if not metrics._rendering:
+            metrics.template_time += time.perf_counter() - started
+
+
+class TimedTemplate:
+    """
+    Wrapper of a backend template timing its rendering.
+    """
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with _rendering():
+            return self.template.render(context, request)
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    """
+    The Django template backend, with its rendering time measured.
+    """
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus sense (per upper bound counts).
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield _format_bound(bound), cumulative
+        yield "+Inf", self.count
+
+
+def worker_name():
+    """
+    Return the ``worker`` label of the process: METRICS_WORKER, or host:pid.
+    """
+    return getattr(settings, "METRICS_WORKER", None) or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _format_bound(bound):
+    return str(int(bound)) if float(bound).is_integer() else str(bound)
+
+
+class Registry:
+    """
+    The per-view aggregates of the requests served by the process.
+
+    They are not shared between processes: see the module docstring.
+    """
+    HISTOGRAMS = {
+        "request_duration_seconds": ("Request latency.", LATENCY_BUCKETS),
+        "db_query_duration_seconds": ("Time spent in the database per request.", LATENCY_BUCKETS),
+        "db_queries": ("Database queries per request.", QUERY_BUCKETS),
+        "template_render_seconds": ("Template rendering time per request.", LATENCY_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {name: {} for name in self.HISTOGRAMS}
+            self._requests = {}
+            self._cache = {}
+
+    def observe(self, view, status, latency, metrics):
+        values = {
+            "request_duration_seconds": latency,
+            "db_query_duration_seconds": metrics.db_time,
+            "db_queries": metrics.queries,
+            "template_render_seconds": metrics.template_time,
+        }
+        with self._lock:
+            for name, value in values.items():
+                histogram = self._histograms[name].get(view)
+                if histogram is None:
+                    histogram = self._histograms[name][view] = Histogram(self.HISTOGRAMS[name][1])
+                histogram.observe(value)
+            key = (view, f"{status // 100}xx")
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for result, count in (("hit", metrics.cache_hits), ("miss", metrics.cache_misses)):
+                if count:
+                    self._cache[(view, result)] = self._cache.get((view, result), 0) + count
+
+    def render(self, prefix="litreview"):
+        """
+        Return the aggregates in the Prometheus text exposition format.
+        """
+        lines = []
+        worker = f'worker="{worker_name()}"'
+        with self._lock:
+            lines.append(f"# HELP {prefix}_requests_total Requests served.")
+            lines.append(f"# TYPE {prefix}_requests_total counter")
+            for (view, status), count in sorted(self._requests.items()):
+                lines.append(f'{prefix}_requests_total{{{worker},view="{view}",status="{status}"}} {count}')
+            lines.append(f"# HELP {prefix}_cache_requests_total Cache lookups per result.")
+            lines.append(f"# TYPE {prefix}_cache_requests_total counter")
+            for (view, result), count in sorted(self._cache.items()):
+                lines.append(
+                    f'{prefix}_cache_requests_total{{{worker},view="{view}",result="{result}"}} {count}'
+                )
+            for name, (description, _) in self.HISTOGRAMS.items():
+                metric = f"{prefix}_{name}"
+                lines.append(f"# HELP {metric} {description}")
+                lines.append(f"# TYPE {metric} histogram")
+                for view, histogram in sorted(self._histograms[name].items()):
+                    for bound, count in histogram.samples():
+                        lines.append(f'{metric}_bucket{{{worker},view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{metric}_sum{{{worker},view="{view}"}} {histogram.sum:.6f}')
+                    lines.append(f'{metric}_count{{{worker},view="{view}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        # Unresolved paths share one label to keep the cardinality bounded.
+        return "unresolved"
+    return match.view_name or match._func_path
+
+
+def server_timing(metrics, latency):
+    """
+    Build the Server-Timing header value of a request.
+    """
+    return ", ".join([
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+        f"tpl;dur={metrics.template_time * 1000:.1f}",
+        f'cache;desc="{metrics.cache_hits} hits {metrics.cache_misses} misses"',
+        f"total;dur={latency * 1000:.1f}",
+    ])
+
+
+class MetricsMiddleware:
+    """
+    Measure every request, add its Server-Timing header and aggregate it.
+
+    Placed first so that the other middleware are measured too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before the middleware was loaded.
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started):
+        latency = time.perf_counter() - started
+        response.headers["Server-Timing"] = server_timing(metrics, latency)
+        registry.observe(_view_name(request), response.status_code, latency, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view = _view_name(request)
+
+
+def metrics_view(request):
+    """
+    Expose the aggregated measures to Prometheus.
+
+    Only served to the addresses of METRICS_ALLOWED_IPS and to staff users.
+    """
+    allowed = getattr(settings, "METRICS_ALLOWED_IPS", DEFAULT_ALLOWED_IPS)
+    if request.META.get("REMOTE_ADDR") not in allowed and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4")
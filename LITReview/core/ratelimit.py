@@ -0,0 +1,146 @@
+"""
+Rate limiting of the write endpoints.
+
+Every client has a token bucket per scope (e.g. "posts"), one for its user
+and one for its IP address: a request takes a token from both, and is
+answered 429 Too Many Requests, with a Retry-After header, when either is
+empty. The buckets are configured by RATE_LIMITS, scope by scope:
+
+    RATE_LIMITS = {"posts": {"user": (10, 60), "ip": (30, 60)}}
+
+gives every user 10 tokens, refilled over 60 seconds (one every 6 seconds),
+and every address 30. RATE_LIMIT_ENABLED turns the limits off.
+
+The buckets are stored in the RATE_LIMIT_CACHE cache. A bucket is kept as
+the time at which it will be full again (GCRA, the token bucket expressed
+as a single timestamp), so that taking a token is one atomic ``incr``.
+The cache must be shared by the web processes (memcached, redis): with the
+local-memory backend every process has its own buckets, and the effective
+limit is the configured one times the number of processes.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+DEFAULT_CACHE = "default"
+KEY_PREFIX = "ratelimit"
+
+
+class HttpResponseTooManyRequests(HttpResponse):
+    status_code = 429
+
+
+def limiter_cache():
+    """
+    Return the cache holding the buckets, RATE_LIMIT_CACHE.
+    """
+    return caches[getattr(settings, "RATE_LIMIT_CACHE", DEFAULT_CACHE)]
+
+
+def _now():
+    return int(time.time() * 1000)
+
+
+def take(key, capacity, period, cache=None):
+    """
+    Take a token from a bucket of ``capacity`` tokens refilled over
+    ``period`` seconds.
+
+    Returns 0 when a token was taken, otherwise the number of milliseconds
+    until the next one.
+    """
+    cache = cache or limiter_cache()
+    # Milliseconds per token, and the time a full bucket lasts.
+    interval = max(1, period * 1000 // capacity)
+    burst = capacity * interval
+    now = _now()
+    timeout = math.ceil(period) + 1
+    if cache.add(key, now + interval, timeout):
+        return 0
+    try:
+        full_at = cache.incr(key, interval)
+    except ValueError:
+        # Expired between add and incr: the bucket is full.
+        cache.set(key, now + interval, timeout)
+        return 0
+    if full_at - interval < now:
+        # The bucket had refilled. Concurrent requests may reset it together,
+        # granting them a token each.
+        cache.set(key, now + interval, timeout)
+        return 0
+    if full_at - now > burst:
+        cache.decr(key, interval)
+        return full_at - burst - now
+    cache.touch(key, math.ceil((full_at - now) / 1000) + 1)
+    return 0
+
+
+def client_ip(request):
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def check(request, scope):
+    """
+    Take a token from the buckets of a request's client in a scope.
+
+    Returns 0 when the request is allowed, otherwise the number of seconds
+    to wait before retrying.
+    """
+    if not getattr(settings, "RATE_LIMIT_ENABLED", True):
+        return 0
+    limits = getattr(settings, "RATE_LIMITS", {}).get(scope, {})
+    clients = {"ip": client_ip(request)}
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        clients["user"] = user.pk
+    wait = 0
+    for kind, client in clients.items():
+        if kind in limits:
+            capacity, period = limits[kind]
+            wait = max(wait, take(f"{KEY_PREFIX}:{scope}:{kind}:{client}", capacity, period))
+            if wait:
+                break
+    return math.ceil(wait / 1000)
+
+
+def too_many_requests(retry_after):
+    response = HttpResponseTooManyRequests(
+        f"Too many requests, retry in {retry_after} second{'s' if retry_after > 1 else ''}.",
+        content_type="text/plain; charset=utf-8",
+    )
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+class RateLimitMixin:
+    """
+    View mixin limiting the rate of the requests of rate_limit_methods.
+
+    Place it after the login mixin, so that anonymous requests are
+    redirected to the login page rather than counted, and after
+    StreamingUploadMixin, whose dispatch must stay the outermost one: it
+    carries the csrf_exempt marker the upload handlers rely on.
+
+    Attributes:
+        rate_limit_scope (str): The scope of RATE_LIMITS the view uses.
+        rate_limit_methods (tuple): The limited HTTP methods.
+    """
+    rate_limit_scope = None
+    rate_limit_methods = ("POST",)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in self.rate_limit_methods:
+            retry_after = check(request, self.rate_limit_scope)
+            if retry_after:
+                response = too_many_requests(retry_after)
+                if getattr(self, "view_is_async", False):
+                    return _returned(response)
+                return response
+        return super().dispatch(request, *args, **kwargs)
+
+
+async def _returned(response):
+    return response
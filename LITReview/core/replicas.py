@@ -0,0 +1,143 @@
+"""
+Read replicas: routing of the read-only pages to replica databases.
+
+Reads go to the primary ("default") unless a view opts in with
+ReplicaReadMixin, and only the models of REPLICA_APPS are routed, so that
+sessions and authentication never see replication lag. After a successful
+write, ReplicaPinMiddleware pins the client's reads to the primary for
+REPLICA_PIN_SECONDS (read-your-writes).
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PIN_COOKIE = "primary_pin"
+DEFAULT_PIN_SECONDS = 5
+DEFAULT_REPLICA_APPS = ("reviews",)
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# The replica the reads of the current request use, None for the primary.
+_replica = ContextVar("replica", default=None)
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def is_pinned(request):
+    """
+    Return whether the client wrote recently and must read from the primary.
+    """
+    return PIN_COOKIE in request.COOKIES
+
+
+@contextmanager
+def reads_from_replicas(enabled=True):
+    """
+    Let the reads of the routed models run inside the block use a replica.
+
+    One replica is drawn for the whole block, so that a page is never built
+    from replicas lagging differently.
+    """
+    aliases = replicas()
+    token = _replica.set(random.choice(aliases) if enabled and aliases else None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Database router sending the opted-in reads to the drawn replica.
+    """
+    def _routed(self, model):
+        apps = getattr(settings, "REPLICA_APPS", DEFAULT_REPLICA_APPS)
+        return model._meta.app_label in apps
+
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is not None and self._routed(model):
+            return alias
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas receive the schema from the primary.
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    View mixin reading the routed models from a replica on safe requests.
+
+    Requests of a client pinned to the primary (see ReplicaPinMiddleware),
+    and unsafe requests, keep reading from the primary. A TemplateResponse
+    is rendered here, as its lazy querysets must be evaluated in the block.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        enabled = request.method in SAFE_METHODS and not is_pinned(request)
+        if getattr(self, "view_is_async", False):
+            return self._adispatch(enabled, request, *args, **kwargs)
+        with reads_from_replicas(enabled):
+            return _rendered(super().dispatch(request, *args, **kwargs))
+
+    async def _adispatch(self, enabled, request, *args, **kwargs):
+        with reads_from_replicas(enabled):
+            return _rendered(await super().dispatch(request, *args, **kwargs))
+
+
+def _rendered(response):
+    if callable(getattr(response, "render", None)) and not response.is_rendered:
+        response.render()
+    return response
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin the reads of a client to the primary for a short while after it
+    successfully sent a write (an unsafe request).
+
+    Runs in both sync and async mode, so that async views are not moved to
+    a thread under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.pin(request, await self.get_response(request))
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=getattr(settings, "REPLICA_PIN_SECONDS", DEFAULT_PIN_SECONDS),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,11 +40,14 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "django_bootstrap5",
     "django_starfield",
+    "core.apps.CoreConfig",
     "accounts.apps.AccountsConfig",
     "reviews.apps.ReviewsConfig",
+    "jobs.apps.JobsConfig",
 ]
 
 MIDDLEWARE = [
+    "core.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -51,13 +55,14 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.replicas.ReplicaPinMiddleware",
 ]
 
 ROOT_URLCONF = "core.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "core.metrics.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -84,6 +89,48 @@ DATABASES = {
     }
 }
 
+# Read replicas serving the feed and listing pages (see core/replicas.py).
+# LITREVIEW_SQLITE_REPLICAS=N adds N local SQLite files standing in for
+# replicas, refreshed from the primary with `manage.py sync_sqlite_replicas`.
+for number in range(1, int(os.environ.get("LITREVIEW_SQLITE_REPLICAS", 0)) + 1):
+    DATABASES[f"replica{number}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"db.replica{number}.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["core.replicas.ReplicaRouter"]
+# Seconds during which a client that wrote reads from the primary only.
+REPLICA_PIN_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# The cache holds state every process must see: fragment versions, follow
+# lists, rate limit buckets and counters. It is shared through Redis when
+# LITREVIEW_REDIS_URL is set (atomic increments, for production), and through
+# files otherwise.
+if os.environ.get("LITREVIEW_REDIS_URL"):
+    SHARED_CACHE = {
+        "LOCATION": os.environ["LITREVIEW_REDIS_URL"],
+        "OPTIONS": {"BACKEND": "django.core.cache.backends.redis.RedisCache"},
+    }
+else:
+    SHARED_CACHE = {
+        "LOCATION": BASE_DIR / "cache",
+        "OPTIONS": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "MAX_ENTRIES": 10_000,
+        },
+    }
+CACHES = {
+    "default": {"BACKEND": "core.metrics.InstrumentedCache", **SHARED_CACHE},
+}
+# The tests run with a cache of their own (see core.testing).
+TEST_RUNNER = "core.testing.TestRunner"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -125,6 +172,64 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Limits enforced while ticket images are streamed to disk.
+TICKET_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+TICKET_IMAGE_MAX_DIMENSIONS = (6000, 6000)
+
+# Serve the feeds, posts and subscribe pages with their async views. Only
+# worth it under ASGI: under WSGI each request would start an event loop.
+ASYNC_VIEWS = False
+
+# Live feed (Server-Sent Events): seconds between heartbeats, events queued
+# per connection before it is closed as too slow, seconds before a connection
+# is recycled, and events replayed at most on reconnection.
+LIVE_HEARTBEAT = 15
+LIVE_QUEUE_SIZE = 100
+LIVE_MAX_AGE = 10 * 60
+LIVE_CATCH_UP = 100
+
+# Slow-query log (see core.slowqueries): queries slower than the threshold,
+# in milliseconds (None disables the log), are written with their plan to a
+# JSONL file rotated at SLOW_QUERY_LOG_MAX_BYTES. The query parameters are
+# replaced by their types unless SLOW_QUERY_LOG_PARAMS is set: they may hold
+# secrets such as session keys and password hashes.
+SLOW_QUERY_THRESHOLD = 100
+SLOW_QUERY_LOG = BASE_DIR / "logs" / "slow_queries.jsonl"
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+SLOW_QUERY_LOG_PARAMS = False
+
+# Request metrics (see core.metrics): clients allowed to scrape /metrics,
+# besides staff users. The metrics are per worker process, each one scraped
+# on its own; METRICS_WORKER names the worker in the samples' labels
+# (defaults to host:pid).
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+
+# Rate limits of the write endpoints (see core.ratelimit): per scope, the
+# tokens of the bucket of every user and of every IP address, and the
+# seconds over which they are refilled. RATE_LIMIT_CACHE must be shared by
+# the web processes, otherwise each of them applies the limits on its own.
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_CACHE = "default"
+RATE_LIMITS = {
+    "posts": {"user": (10, 60), "ip": (30, 60)},
+    "follows": {"user": (30, 60), "ip": (60, 60)},
+}
+
+# Usernames accepted at once by the bulk subscribe view.
+BULK_FOLLOW_MAX_USERNAMES = 1000
+
+# Background jobs (see jobs.queue), run by "manage.py runworkers": image
+# derivatives and fan-out to the followers' timelines. JOBS_EAGER runs them
+# in the web process instead, once the transaction is committed. Durations
+# are in seconds.
+JOBS_EAGER = False
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_RETRY_MAX_DELAY = 60 * 60
+JOBS_LEASE = 5 * 60
+JOBS_RETENTION = 7 * 24 * 60 * 60
+
 LOGIN_REDIRECT_URL = "/"
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -0,0 +1,222 @@
+"""
+Slow-query log.
+
+Every database connection gets an execute wrapper timing its queries. A
+query slower than SLOW_QUERY_THRESHOLD (milliseconds) is written to the
+rotating JSONL file SLOW_QUERY_LOG with its SQL, the view and the project
+code and templates that ran it, and its query plan. The parameters may hold
+session keys, password hashes or e-mail addresses: only their types are
+logged, unless SLOW_QUERY_LOG_PARAMS is set. The ``slow_queries`` command
+summarises the log per query fingerprint.
+"""
+import datetime
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+from . import metrics
+
+DEFAULT_THRESHOLD = 100
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 5
+DEFAULT_LOG_PARAMS = False
+MAX_PARAM_LENGTH = 200
+MAX_STACK = 20
+
+logger = logging.getLogger("litreview.slow_queries")
+logger.propagate = False
+_handler_lock = threading.Lock()
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def threshold():
+    """
+    Return the duration, in seconds, above which a query is logged, or None.
+    """
+    value = getattr(settings, "SLOW_QUERY_THRESHOLD", DEFAULT_THRESHOLD)
+    return None if value is None else value / 1000
+
+
+def log_path():
+    default = settings.BASE_DIR / "logs" / "slow_queries.jsonl"
+    return Path(getattr(settings, "SLOW_QUERY_LOG", default))
+
+
+def log_files(path=None):
+    """
+    Return the files of the log, the oldest rotated one first.
+    """
+    path = Path(path or log_path())
+    rotated = sorted(
+        path.parent.glob(f"{path.name}.*"),
+        key=lambda file: int(file.suffix[1:]) if file.suffix[1:].isdigit() else 0,
+        reverse=True,
+    )
+    return [file for file in rotated + [path] if file.exists()]
+
+
+def _ensure_handler():
+    if logger.handlers:
+        return
+    with _handler_lock:
+        if logger.handlers:
+            return
+        path = log_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=getattr(settings, "SLOW_QUERY_LOG_MAX_BYTES", DEFAULT_MAX_BYTES),
+            backupCount=getattr(settings, "SLOW_QUERY_LOG_BACKUPS", DEFAULT_BACKUPS),
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+
+def fingerprint(sql):
+    """
+    Normalize a query, so that the queries differing only by their values
+    (including the length of an IN list) share a fingerprint.
+
+    Returns the fingerprint and the normalized query.
+    """
+    normalized = _LITERALS.sub("?", sql).replace("%s", "?")
+    normalized = _PLACEHOLDER_LIST.sub("(...)", normalized)
+    normalized = _SPACES.sub(" ", normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+def _param(value):
+    if not getattr(settings, "SLOW_QUERY_LOG_PARAMS", DEFAULT_LOG_PARAMS):
+        return None if value is None else f"<{type(value).__name__}>"
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    value = str(value)
+    if len(value) > MAX_PARAM_LENGTH:
+        value = value[:MAX_PARAM_LENGTH] + "…"
+    return value
+
+
+def _params(params, many):
+    if params is None:
+        return None
+    if many:
+        # Only the first set of an executemany() is kept.
+        params = next(iter(params), None)
+        if params is None:
+            return None
+    if isinstance(params, dict):
+        return {key: _param(value) for key, value in params.items()}
+    return [_param(value) for value in params]
+
+
+def _stack():
+    """
+    Return the project code and the templates the query originates from,
+    innermost first.
+    """
+    base_dir = str(settings.BASE_DIR)
+    # The instrumentation itself is left out.
+    skipped = {__file__, metrics.__file__}
+    stack = []
+    frame = sys._getframe(2)
+    while frame is not None and len(stack) < MAX_STACK:
+        code = frame.f_code
+        filename = code.co_filename
+        if filename.startswith(base_dir) and filename not in skipped and "site-packages" not in filename:
+            relative = filename[len(base_dir) + 1:]
+            stack.append(f"{relative}:{frame.f_lineno} in {code.co_name}")
+        elif code.co_name == "render" and isinstance(frame.f_locals.get("self"), Template):
+            template = frame.f_locals["self"]
+            stack.append(f"template {template.origin.template_name or template.origin.name}")
+        frame = frame.f_back
+    return stack
+
+
+def _plan(connection, sql, params):
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    try:
+        with connection.cursor() as cursor:
+            # The backend cursor, under the execute wrappers and the debug
+            # log: the plan is not a query of the request.
+            cursor.cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+    except (DatabaseError, NotImplementedError) as error:
+        return [f"unavailable: {error}"]
+
+
+def record(sql, params, many, duration, connection):
+    """
+    Write a slow query to the log.
+    """
+    fingerprint_, normalized = fingerprint(sql)
+    current = metrics.current()
+    entry = {
+        "time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "duration_ms": round(duration * 1000, 3),
+        "database": connection.alias,
+        "fingerprint": fingerprint_,
+        "normalized": normalized,
+        "sql": sql,
+        "params": _params(params, many),
+        "many": many,
+        "view": current.view if current is not None else None,
+        "stack": _stack(),
+        "plan": None if many else _plan(connection, sql, params),
+    }
+    _ensure_handler()
+    logger.info(json.dumps(entry, default=str))
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper logging the queries slower than the threshold.
+    """
+    limit = threshold()
+    if limit is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        if duration >= limit:
+            record(sql, params, many, duration, context["connection"])
+
+
+def install(connection, **kwargs):
+    """
+    Add the slow-query wrapper to a database connection.
+    """
+    if log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_queries)
+
+
+def install_all():
+    """
+    Add the slow-query wrapper to the connections already opened, the
+    connections opened later get it through the connection_created signal.
+    """
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+
+
+connection_created.connect(install)
@@ -0,0 +1,44 @@
+"""
+Isolation of the tests and benchmarks from the shared cache.
+
+The default cache is shared on disk (or through Redis) with the development
+server and every other process. The tests and the benchmarks rather use a
+local-memory cache of their own: they neither see the rate limit buckets,
+fragments and counters left by other runs, nor leave theirs behind.
+"""
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+ISOLATED_CACHES = {
+    "default": {
+        "BACKEND": "core.metrics.InstrumentedCache",
+        "OPTIONS": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    },
+}
+
+
+def isolated_cache():
+    """
+    Return a settings override giving the process its own, empty cache.
+
+    The local-memory cache only holds for a single process, hence the
+    jobs.W001 warning silenced: jobs are run in the same process.
+    """
+    return override_settings(CACHES=ISOLATED_CACHES, SILENCED_SYSTEM_CHECKS=["jobs.W001"])
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner running the tests with an isolated cache.
+
+    The cache outlives the tests, whose database rows are rolled back: a
+    test relying on an empty cache clears it in its setUp.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated_cache = isolated_cache()
+        self._isolated_cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated_cache.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,211 @@
+import json
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.views import View
+from reviews.models import Ticket
+from . import ratelimit, slowqueries
+from .metrics import MetricsMiddleware, registry
+from .replicas import (
+    PIN_COOKIE, ReplicaPinMiddleware, ReplicaReadMixin, ReplicaRouter, reads_from_replicas,
+)
+
+
+async def async_view(request):
+    return HttpResponse()
+
+
+def sync_view(request):
+    return HttpResponse()
+
+
+class MiddlewareModesTests(SimpleTestCase):
+    """
+    The project middleware keep the mode of the chain they wrap, so that
+    async views are not moved to a thread under ASGI.
+    """
+    async def test_async_metrics(self):
+        handler = MetricsMiddleware(async_view)
+        self.assertTrue(iscoroutinefunction(handler))
+        response = await handler(RequestFactory().get("/"))
+        self.assertIn("Server-Timing", response.headers)
+
+    async def test_async_replica_pin(self):
+        handler = ReplicaPinMiddleware(async_view)
+        self.assertTrue(iscoroutinefunction(handler))
+        response = await handler(RequestFactory().post("/"))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_sync_chain(self):
+        for middleware in (MetricsMiddleware, ReplicaPinMiddleware):
+            handler = middleware(sync_view)
+            self.assertFalse(iscoroutinefunction(handler))
+            self.assertEqual(handler(RequestFactory().post("/")).status_code, 200)
+
+
+@override_settings(METRICS_WORKER="web-1:42")
+class MetricsRegistryTests(SimpleTestCase):
+    """
+    Every sample exposed by a worker is labelled with the worker's name.
+    """
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_worker_label(self):
+        MetricsMiddleware(sync_view)(RequestFactory().get("/"))
+        samples = [line for line in registry.render().splitlines() if not line.startswith("#")]
+        self.assertIn('litreview_requests_total{worker="web-1:42",view="unresolved",status="2xx"} 1', samples)
+        self.assertIn(
+            'litreview_db_queries_bucket{worker="web-1:42",view="unresolved",le="0"} 1', samples
+        )
+        for sample in samples:
+            self.assertIn('{worker="web-1:42",', sample)
+
+
+class ReadingView(ReplicaReadMixin, View):
+    """
+    View answering with the database the tickets would be read from.
+    """
+    def get(self, request):
+        return HttpResponse(ReplicaRouter().db_for_read(Ticket))
+
+    post = get
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_PIN_SECONDS=5)
+class ReplicaTests(SimpleTestCase):
+    """
+    Opted-in reads of the routed apps go to a replica, unless the client is
+    pinned to the primary by a recent write.
+    """
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Ticket), "default")
+        with reads_from_replicas():
+            self.assertEqual(router.db_for_read(Ticket), "replica1")
+            # Sessions and authentication never read from a replica.
+            self.assertEqual(router.db_for_read(User), "default")
+            self.assertEqual(router.db_for_write(Ticket), "default")
+        with reads_from_replicas(enabled=False):
+            self.assertEqual(router.db_for_read(Ticket), "default")
+        self.assertFalse(router.allow_migrate("replica1", "reviews"))
+        self.assertIsNone(router.allow_migrate("default", "reviews"))
+
+    def test_replica_read_mixin(self):
+        factory = RequestFactory()
+        view = ReadingView.as_view()
+        self.assertEqual(view(factory.get("/")).content, b"replica1")
+        self.assertEqual(view(factory.post("/")).content, b"default")
+        pinned = factory.get("/")
+        pinned.COOKIES[PIN_COOKIE] = "1"
+        self.assertEqual(view(pinned).content, b"default")
+
+    def test_pin_cookie(self):
+        handler = ReplicaPinMiddleware(sync_view)
+        cookie = handler(RequestFactory().post("/")).cookies[PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], 5)
+        self.assertTrue(cookie["httponly"])
+        self.assertNotIn(PIN_COOKIE, handler(RequestFactory().get("/")).cookies)
+        failed = ReplicaPinMiddleware(lambda request: HttpResponse(status=400))
+        self.assertNotIn(PIN_COOKIE, failed(RequestFactory().post("/")).cookies)
+
+
+class LimitedView(ratelimit.RateLimitMixin, View):
+    rate_limit_scope = "test"
+
+    def post(self, request):
+        return HttpResponse()
+
+
+@override_settings(
+    RATE_LIMIT_ENABLED=True, RATE_LIMITS={"test": {"user": (2, 60), "ip": (3, 60)}}
+)
+class RateLimitTests(SimpleTestCase):
+    """
+    Token buckets of the write endpoints, per user and per IP address.
+    """
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000
+        patcher = mock.patch.object(ratelimit, "_now", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, user=None, ip="10.0.0.1"):
+        request = RequestFactory().post("/", REMOTE_ADDR=ip)
+        request.user = user or AnonymousUser()
+        return LimitedView.as_view()(request)
+
+    def test_refill(self):
+        self.assertEqual(ratelimit.take("bucket", 2, 60), 0)
+        self.assertEqual(ratelimit.take("bucket", 2, 60), 0)
+        self.assertEqual(ratelimit.take("bucket", 2, 60), 30_000)
+        # One token every 30 seconds.
+        self.now += 30_000
+        self.assertEqual(ratelimit.take("bucket", 2, 60), 0)
+        self.assertGreater(ratelimit.take("bucket", 2, 60), 0)
+
+    def test_too_many_requests(self):
+        for _ in range(3):
+            self.assertEqual(self.post().status_code, 200)
+        response = self.post()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "20")
+
+    def test_user_and_ip_buckets(self):
+        user = User(pk=1, username="writer")
+        for _ in range(2):
+            self.assertEqual(self.post(user).status_code, 200)
+        # The user's bucket is empty, on any address.
+        self.assertEqual(self.post(user, ip="10.0.0.2").status_code, 429)
+        # The address still has a token for another client.
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(self.post().status_code, 429)
+        # Another address is not limited by the first one.
+        self.assertEqual(self.post(ip="10.0.0.3").status_code, 200)
+
+    @override_settings(RATE_LIMIT_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(5):
+            self.assertEqual(self.post().status_code, 200)
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=0)
+class SlowQueryLogTests(TestCase):
+    """
+    Slow queries are logged with their plan, their parameters redacted unless
+    SLOW_QUERY_LOG_PARAMS is set.
+    """
+    def slow_query(self):
+        with self.assertLogs(slowqueries.logger, "INFO") as logs:
+            User.objects.filter(username="reader", password="pbkdf2_sha256$secret").exists()
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        return next(entry for entry in entries if "auth_user" in entry["sql"])
+
+    def test_logged_with_plan(self):
+        entry = self.slow_query()
+        self.assertIn("username", entry["normalized"])
+        self.assertTrue(any("auth_user" in line for line in entry["plan"]))
+        self.assertIn("core/tests.py", entry["stack"][0])
+
+    def test_params_redacted(self):
+        entry = self.slow_query()
+        self.assertEqual(entry["params"].count("<str>"), 2)
+        self.assertNotIn("secret", json.dumps(entry))
+
+    @override_settings(SLOW_QUERY_LOG_PARAMS=True)
+    def test_params_opt_in(self):
+        entry = self.slow_query()
+        self.assertIn("reader", entry["params"])
+        self.assertIn("pbkdf2_sha256$secret", entry["params"])
+
+    @override_settings(SLOW_QUERY_THRESHOLD=None)
+    def test_disabled(self):
+        with mock.patch.object(slowqueries, "record") as record:
+            User.objects.exists()
+        record.assert_not_called()
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 from accounts.views import SignInView
+from core.metrics import metrics_view
 
 urlpatterns = [
     path('signin/', SignInView.as_view(), name="signin"),
@@ -11,6 +12,7 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("accounts.urls")),
     path("reviews/", include("reviews.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 if settings.DEBUG:
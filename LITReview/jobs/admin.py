@@ -0,0 +1,36 @@
+from django.contrib import admin
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import Job
+
+
+@admin.action(description="Run the selected jobs again")
+def retry(modeladmin, request, queryset):
+    """
+    Queue the selected jobs again, with a fresh number of attempts.
+
+    A failed job whose key was taken since by a new job is skipped.
+    """
+    count = 0
+    for job in queryset.exclude(status=Job.RUNNING):
+        try:
+            with transaction.atomic():
+                count += Job.objects.filter(pk=job.pk).exclude(status=Job.RUNNING).update(
+                    status=Job.QUEUED, attempts=0, run_at=timezone.now(), time_finished=None
+                )
+        except IntegrityError:
+            pass
+    modeladmin.message_user(request, f"{count} jobs queued again.")
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("task", "args", "status", "attempts", "run_at", "time_finished")
+    list_filter = ("status",)
+    search_fields = ("=key",)
+    show_full_result_count = False
+    ordering = ("-run_at",)
+    actions = [retry]
+    readonly_fields = ("locked_by", "locked_until", "last_error", "time_created", "time_finished")
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Warn when the jobs run in workers whose cache is private to a process.
+
+    The tasks invalidate cached fragments (see reviews.fragments): done by
+    runworkers, the invalidation would never reach the web processes.
+    """
+    if getattr(settings, "JOBS_EAGER", False):
+        return []
+    default = settings.CACHES.get("default", {})
+    backend = default.get("OPTIONS", {}).get("BACKEND", default.get("BACKEND"))
+    if backend not in LOCAL_CACHES:
+        return []
+    return [
+        Warning(
+            "The default cache is private to each process, the invalidations "
+            "made by the job workers will not reach the web processes.",
+            hint="Use a shared cache (file based or Redis), or set JOBS_EAGER.",
+            id="jobs.W001",
+        )
+    ]
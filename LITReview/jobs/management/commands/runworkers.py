@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from jobs import queue
+
+# Seconds between two purges of the finished (done or failed) jobs.
+PURGE_INTERVAL = 60 * 60
+
+
+def _work_process(worker, stop, poll, burst):
+    # The parent handles Ctrl-C: a worker finishes its job, then stops.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    queue.work(worker, stop, poll, burst)
+
+
+class Command(BaseCommand):
+    """
+    Run the jobs of the job queue (see jobs.queue) with a pool of workers.
+
+    Workers are threads by default: the tasks mostly wait on the database
+    and the storage. Processes suit CPU-bound tasks (e.g. images). On
+    SIGINT or SIGTERM, the workers finish their current job and stop.
+    """
+    help = "Run the background jobs with a pool of worker threads or processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Number of workers.")
+        parser.add_argument(
+            "--processes", action="store_true", help="Run the workers in processes, not threads."
+        )
+        parser.add_argument(
+            "--poll", type=float, default=1.0, help="Seconds between two looks for due jobs."
+        )
+        parser.add_argument(
+            "--burst", action="store_true", help="Stop once no job is due."
+        )
+
+    def handle(self, *args, **options):
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        if options["processes"]:
+            # The children must not share the parent's connections.
+            connections.close_all()
+            stop = multiprocessing.Event()
+            start, target = multiprocessing.Process, _work_process
+        else:
+            stop = threading.Event()
+            start, target = threading.Thread, queue.work
+        workers = [
+            start(
+                target=target,
+                args=(f"{prefix}:{number}", stop, options["poll"], options["burst"]),
+                name=f"worker-{number}",
+            )
+            for number in range(1, options["workers"] + 1)
+        ]
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        for worker in workers:
+            worker.start()
+        kind = "processes" if options["processes"] else "threads"
+        self.stdout.write(f"{len(workers)} worker {kind} started.")
+
+        purged_at = 0
+        try:
+            while any(worker.is_alive() for worker in workers):
+                if time.monotonic() - purged_at > PURGE_INTERVAL and not options["burst"]:
+                    purged = queue.purge()
+                    purged_at = time.monotonic()
+                    if purged:
+                        self.stdout.write(f"{purged} finished jobs purged.")
+                for worker in workers:
+                    worker.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after the current jobs...")
+            stop.set()
+            for worker in workers:
+                worker.join()
+        finally:
+            connections.close_all()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
@@ -0,0 +1,63 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """
+    Model representing a call of a task, run by the runworkers command.
+
+    Attributes:
+        task (str): The dotted path of the task function.
+        args (list): The arguments of the call, as JSON.
+        key (str): The idempotency key: a job is not enqueued again while a
+            job with the same key is queued, running or done. A failed job
+            does not keep it.
+        status (str): Either "QUEUED", "RUNNING", "DONE" or "FAILED".
+        attempts (int): The number of runs started.
+        max_attempts (int): The number of runs after which a failing job is
+            given up.
+        run_at (DateTimeField): When the job is due.
+        locked_by (str): The worker running the job.
+        locked_until (DateTimeField): When a running job is considered
+            abandoned by its worker.
+        last_error (str): The traceback of the last failure.
+        time_created (DateTimeField): The creation timestamp of the job.
+        time_finished (DateTimeField): When the job succeeded or was given up.
+    """
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+    task = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    key = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(
+        max_length=7,
+        choices=[(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")],
+        default=QUEUED,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    time_created = models.DateTimeField(auto_now_add=True)
+    time_finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The due jobs of a worker, and the running ones of the lease check.
+            models.Index(fields=["status", "run_at"], name="jobs_job_status_run_at"),
+        ]
+        constraints = [
+            # Failed jobs let the same call be enqueued again.
+            models.UniqueConstraint(
+                fields=["key"],
+                condition=~models.Q(status="FAILED"),
+                name="jobs_job_key_unless_failed",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task}{tuple(self.args)} ({self.status})"
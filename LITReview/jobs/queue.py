@@ -0,0 +1,211 @@
+"""
+Durable background jobs, stored in the database.
+
+A task is a function decorated with ``task``. ``enqueue`` records a call of
+it as a Job in the current transaction: when the write that asks for it is
+made in the same ``transaction.atomic()`` block, the job exists if and only
+if the write is committed (the reviews models save in such a block, for
+their post_save handlers to enqueue). In autocommit mode, a failure between
+the write and the enqueue would lose the job. The workers of the runworkers command
+claim the due jobs one by one with a conditional UPDATE, so that no broker
+nor row locks are needed, and run them:
+
+- a failing job is retried after an exponential backoff (JOBS_RETRY_DELAY,
+  doubled at every attempt up to JOBS_RETRY_MAX_DELAY), until it has run
+  JOBS_MAX_ATTEMPTS times;
+- a job still running after JOBS_LEASE seconds is considered abandoned by
+  its worker (e.g. killed) and queued again.
+
+A job may thus run more than once: tasks must be idempotent. Finished jobs
+are kept JOBS_RETENTION seconds. Until then, the idempotency key of a done
+job keeps a duplicate from being enqueued; a failed job frees its key, so
+that the call can be enqueued again.
+
+With JOBS_EAGER, jobs are not stored but run in the process once the
+transaction is committed.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 10
+DEFAULT_RETRY_MAX_DELAY = 60 * 60
+DEFAULT_LEASE = 5 * 60
+DEFAULT_RETENTION = 7 * 24 * 60 * 60
+# Due jobs read at once, so that workers racing for the first one fall back
+# on the next ones.
+CLAIM_CANDIDATES = 10
+
+_tasks = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task(func):
+    """
+    Register a function as a task, which ``enqueue`` can defer.
+
+    Its arguments must be JSON serializable.
+    """
+    func.task_name = f"{func.__module__}.{func.__qualname__}"
+    _tasks[func.task_name] = func
+    return func
+
+
+def get_task(name):
+    """
+    Return the task of a dotted path, importing its module if needed.
+    """
+    if name not in _tasks:
+        import_string(name)
+    if name not in _tasks:
+        raise ValueError(f"{name} is not a task.")
+    return _tasks[name]
+
+
+def enqueue(func, *args, key=None, delay=0, max_attempts=None):
+    """
+    Queue a call of a task, due in ``delay`` seconds.
+
+    Returns the job, or None when a job with the same key exists (or in
+    eager mode).
+    """
+    if _setting("JOBS_EAGER", False):
+        transaction.on_commit(lambda: _call(func, args))
+        return None
+    job = Job(
+        task=func.task_name,
+        args=list(args),
+        key=key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or _setting("JOBS_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS),
+    )
+    if key is None:
+        job.save(force_insert=True)
+        return job
+    try:
+        with transaction.atomic():
+            job.save(force_insert=True)
+    except IntegrityError:
+        return None
+    return job
+
+
+def _call(func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Task %s%r failed", func.task_name, tuple(args))
+
+
+def backoff(attempts):
+    """
+    Return the delay, in seconds, before retrying a job failed ``attempts``
+    times: exponential, with jitter so that failed jobs are spread out.
+    """
+    delay = min(
+        _setting("JOBS_RETRY_DELAY", DEFAULT_RETRY_DELAY) * 2 ** (attempts - 1),
+        _setting("JOBS_RETRY_MAX_DELAY", DEFAULT_RETRY_MAX_DELAY),
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim(worker):
+    """
+    Mark a due job as run by ``worker`` and return it, or None.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by("run_at")
+    for pk in due.values_list("pk", flat=True)[:CLAIM_CANDIDATES]:
+        claimed = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_until=now + timedelta(seconds=_setting("JOBS_LEASE", DEFAULT_LEASE)),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job):
+    """
+    Run a claimed job and record its outcome. Returns whether it succeeded.
+    """
+    mine = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by)
+    try:
+        get_task(job.task)(*job.args)
+    except Exception:
+        logger.exception("Job %s failed (attempt %s of %s)", job, job.attempts, job.max_attempts)
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            mine.update(status=Job.FAILED, last_error=traceback.format_exc(), time_finished=now)
+        else:
+            mine.update(
+                status=Job.QUEUED,
+                last_error=traceback.format_exc(),
+                run_at=now + timedelta(seconds=backoff(job.attempts)),
+            )
+        return False
+    mine.update(status=Job.DONE, time_finished=timezone.now())
+    return True
+
+
+def requeue_abandoned():
+    """
+    Queue again the jobs whose worker let the lease expire, or give them up
+    when they ran out of attempts. Returns the number of jobs queued again.
+    """
+    now = timezone.now()
+    abandoned = Job.objects.filter(status=Job.RUNNING, locked_until__lt=now)
+    abandoned.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED, last_error="Abandoned by its worker.", time_finished=now
+    )
+    return abandoned.update(status=Job.QUEUED)
+
+
+def purge():
+    """
+    Delete the jobs done or failed for longer than JOBS_RETENTION. Returns
+    their number.
+    """
+    before = timezone.now() - timedelta(seconds=_setting("JOBS_RETENTION", DEFAULT_RETENTION))
+    return Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED], time_finished__lt=before
+    ).delete()[0]
+
+
+def work(worker, stop, poll=1.0, burst=False):
+    """
+    Run the due jobs until ``stop`` (an Event) is set, or until none is due
+    in burst mode. Returns the number of jobs run.
+    """
+    done = 0
+    try:
+        while not stop.is_set():
+            job = claim(worker)
+            if job is None:
+                if requeue_abandoned():
+                    continue
+                if burst:
+                    break
+                stop.wait(poll)
+                continue
+            run(job)
+            done += 1
+    finally:
+        connections.close_all()
+    return done
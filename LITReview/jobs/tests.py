@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from . import queue
+from .models import Job
+
+
+@queue.task
+def failing():
+    raise RuntimeError("Failing task.")
+
+
+@override_settings(JOBS_EAGER=False)
+class IdempotencyKeyTests(TestCase):
+    """
+    A key keeps a call from being queued twice, until its job fails.
+    """
+    def run_failing(self):
+        job = queue.claim("test")
+        with self.assertLogs("jobs.queue", "ERROR"):
+            queue.run(job)
+        return Job.objects.get(pk=job.pk)
+
+    def test_duplicate_is_not_enqueued(self):
+        self.assertIsNotNone(queue.enqueue(failing, key="once"))
+        self.assertIsNone(queue.enqueue(failing, key="once"))
+
+    def test_failed_job_frees_its_key(self):
+        queue.enqueue(failing, key="once", max_attempts=1)
+        job = self.run_failing()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNotNone(queue.enqueue(failing, key="once"))
+
+    def test_purge_deletes_old_failed_jobs(self):
+        queue.enqueue(failing, key="once", max_attempts=1)
+        job = self.run_failing()
+        Job.objects.filter(pk=job.pk).update(time_finished=timezone.now() - timedelta(days=8))
+        self.assertEqual(queue.purge(), 1)
@@ -0,0 +1,143 @@
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import AccessMixin
+from django.shortcuts import render
+from django.views import View
+from core.ratelimit import RateLimitMixin
+from core.replicas import ReplicaReadMixin
+from .feeds import InvalidCursor, acursor_page, materialized_timeline, timeline
+from .forms import SubscribeForm
+from .models import UserFollow, UserStats
+from .views import BaseFeedsView, SubscribeView, handle_subscription
+from . import stats
+
+
+class AsyncLoginRequiredMixin(AccessMixin):
+    """
+    Asynchronous version of LoginRequiredMixin.
+
+    The user is loaded from the session in a thread, the lazy request.user
+    being usable from the event loop afterwards.
+    """
+    async def dispatch(self, request, *args, **kwargs):
+        authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncBaseFeedsView(BaseFeedsView):
+    """
+    Asynchronous version of BaseFeedsView.
+
+    Cursor pages are read with the async ORM. The legacy ``?page=`` links,
+    relying on the synchronous Paginator, are served from a thread.
+    """
+    async def aget_page(self):
+        """
+        Get the requested page of feeds/posts.
+        """
+        source = self.get_source()
+        if "page" in self.request.GET:
+            return await sync_to_async(self.get_paginator)(
+                source(None, True), per_page=self.per_page
+            )
+        try:
+            return await acursor_page(
+                source,
+                self.per_page,
+                after=self.request.GET.get("after"),
+                before=self.request.GET.get("before"),
+            )
+        except InvalidCursor:
+            return await acursor_page(source, self.per_page)
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _astats(user):
+    """
+    Return the stats of a user, created from a thread when missing.
+    """
+    found = await UserStats.objects.filter(user=user).afirst()
+    return found or await sync_to_async(stats.for_user)(user)
+
+
+class AsyncFeedsView(ReplicaReadMixin, AsyncLoginRequiredMixin, AsyncBaseFeedsView):
+    """
+    Asynchronous version of FeedsView.
+    """
+    def get_source(self):
+        return partial(materialized_timeline, self.request.user)
+
+    async def get(self, request):
+        paginated_feeds = await self.aget_page()
+        return render(
+            request,
+            "reviews/feeds.html",
+            context={"feeds": paginated_feeds, "title": "Feeds", "more_url_name": "feeds-more"},
+        )
+
+
+class AsyncPostsView(ReplicaReadMixin, AsyncLoginRequiredMixin, AsyncBaseFeedsView):
+    """
+    Asynchronous version of PostsView.
+
+    The page and the user's stats are read one after the other: the async
+    ORM of Django 4.2 runs every query in the same thread, so fetching them
+    concurrently would not overlap them.
+    """
+    def get_source(self):
+        return partial(timeline, [self.request.user])
+
+    async def get(self, request):
+        paginated_posts = await self.aget_page()
+        user_stats = await _astats(request.user)
+        return render(
+            request,
+            "reviews/feeds.html",
+            context={
+                "feeds": paginated_posts,
+                "title": "Posts",
+                "stats": user_stats,
+                "more_url_name": "posts-more",
+            },
+        )
+
+
+class AsyncSubscribeView(ReplicaReadMixin, AsyncLoginRequiredMixin, RateLimitMixin, View):
+    """
+    Asynchronous version of SubscribeView.
+
+    Followed users, followers and stats are read with the async ORM, one
+    after the other (its queries share a single thread); the subscription
+    form, which writes and sends signals, is run in a thread.
+    """
+    rate_limit_scope = SubscribeView.rate_limit_scope
+    template_name = SubscribeView.template_name
+    title = SubscribeView.title
+
+    async def get(self, request, *args, **kwargs):
+        user_follows = UserFollow.objects.filter(user=request.user).select_related(
+            "followed_user"
+        ).order_by("followed_user")
+        followed_by = UserFollow.objects.filter(
+            followed_user=request.user
+        ).select_related("user").order_by("user")
+        user_follows = await _alist(user_follows)
+        followed_by = await _alist(followed_by)
+        user_stats = await _astats(request.user)
+        context = {
+            "form": SubscribeForm(),
+            "user_follows": user_follows,
+            "followed_by": followed_by,
+            "stats": user_stats,
+            "title": self.title,
+        }
+        return render(request, self.template_name, context)
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(handle_subscription)(request)
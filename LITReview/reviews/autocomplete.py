@@ -0,0 +1,56 @@
+import unicodedata
+
+from django.core.cache import cache
+from .models import FoldedUsername
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_TIMEOUT = 30
+# Highest code point: appended to a prefix it bounds every string starting with it.
+_MAX_CHAR = "\U0010ffff"
+
+
+def fold(text):
+    """
+    Return a text normalized (NFKC) and casefolded, for caseless comparisons.
+    """
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def index_usernames(users):
+    """
+    Store the folded usernames of users, given as (id, username) pairs.
+    """
+    FoldedUsername.objects.bulk_create(
+        [FoldedUsername(user_id=user_id, folded=fold(username)) for user_id, username in users],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["folded"],
+    )
+
+
+def usernames_starting_with(prefix, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Return up to ``limit`` usernames starting with prefix, case-insensitively.
+
+    The lookup is a range on the folded usernames (FoldedUsername), served
+    by their index, and results are cached for a short time as the same
+    prefixes are typed by everyone.
+    """
+    prefix = fold(prefix.strip())
+    if not prefix:
+        return []
+    key = f"autocomplete:{limit}:{prefix.encode().hex()}"
+    usernames = cache.get(key)
+    if usernames is None:
+        usernames = list(
+            FoldedUsername.objects.filter(
+                folded__gte=prefix,
+                folded__lt=prefix + _MAX_CHAR,
+                user__is_active=True,
+            )
+            .order_by("folded")
+            .values_list("user__username", flat=True)[:limit]
+        )
+        cache.set(key, usernames, AUTOCOMPLETE_TIMEOUT)
+    return usernames
@@ -0,0 +1,186 @@
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from . import autocomplete, fanout, stats
+from .models import Review, Ticket, UserFollow
+
+SEED_PREFIX = "seed_"
+SEED_PASSWORD = "P@ssword123"
+BATCH_SIZE = 1000
+
+
+def _batched_create(model, objects, batch_size=BATCH_SIZE):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+def _power_law_weights(size, alpha):
+    """
+    Return the cumulative weights giving the user of rank r a 1 / r ** alpha
+    probability to be followed, i.e. a power-law (Zipf) follower distribution.
+    """
+    cumulative = []
+    total = 0.0
+    for rank in range(1, size + 1):
+        total += 1 / rank ** alpha
+        cumulative.append(total)
+    return cumulative
+
+
+def _power_law_targets(rng, user_ids, cum_weights, count):
+    """
+    Draw ``count`` distinct users, popular ones being far more likely.
+    """
+    targets = set()
+    # Bounded number of draws so that a too large count cannot loop forever.
+    for _ in range(4):
+        targets.update(rng.choices(user_ids, cum_weights=cum_weights, k=count - len(targets)))
+        if len(targets) >= count:
+            break
+    return targets
+
+
+def seed(users, follows, tickets, reviews, alpha=1.2, days=365, seed=None, prefix=SEED_PREFIX):
+    """
+    Insert a synthetic dataset with bulk inserts and return its user ids.
+
+    ``follows`` is the average number of users followed by each user, the
+    followed users being drawn from a power-law distribution. ``reviews`` is
+    capped by ``tickets`` as a ticket receives at most one review. The
+    materialized timelines, the stats and the folded usernames of the new
+    users are rebuilt, bulk inserts not sending any signal.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(SEED_PASSWORD)
+    start = User.objects.filter(username__startswith=prefix).count()
+
+    _batched_create(
+        User,
+        (User(username=f"{prefix}{start + i}", password=password) for i in range(users)),
+    )
+    users = list(
+        User.objects.filter(username__startswith=prefix).order_by("id").values_list("id", "username")
+    )[start:]
+    if not users:
+        return []
+    autocomplete.index_usernames(users)
+    user_ids = [user_id for user_id, _ in users]
+
+    def random_time():
+        return now - timedelta(seconds=rng.uniform(0, days * 24 * 3600))
+
+    last_ticket_id = Ticket.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    cum_weights = _power_law_weights(len(user_ids), alpha)
+
+    def edges():
+        for user_id in user_ids:
+            count = min(int(rng.expovariate(1 / follows)) if follows else 0, len(user_ids) - 1)
+            for followed_id in _power_law_targets(rng, user_ids, cum_weights, count):
+                if followed_id != user_id:
+                    yield UserFollow(user_id=user_id, followed_user_id=followed_id)
+
+    _batched_create(UserFollow, edges())
+
+    _batched_create(
+        Ticket,
+        (
+            Ticket(
+                title=f"Book #{i}",
+                description="Synthetic ticket " * rng.randint(1, 20),
+                user_id=rng.choice(user_ids),
+                time_created=random_time(),
+            )
+            for i in range(tickets)
+        ),
+    )
+    ticket_rows = list(
+        Ticket.objects.filter(user__username__startswith=prefix, id__gt=last_ticket_id)
+        .values_list("id", "time_created")
+    )
+    _batched_create(
+        Review,
+        (
+            Review(
+                ticket_id=ticket_id,
+                rating=rng.randint(1, 5),
+                headline=f"Review of ticket #{ticket_id}",
+                body="Synthetic review " * rng.randint(1, 40),
+                user_id=rng.choice(user_ids),
+                time_created=time_created + timedelta(seconds=rng.uniform(0, 7 * 24 * 3600)),
+            )
+            for ticket_id, time_created in rng.sample(ticket_rows, min(reviews, len(ticket_rows)))
+        ),
+    )
+
+    fanout.rebuild(
+        User.objects.filter(username__startswith=prefix).values_list("id", flat=True).iterator()
+    )
+    stats.reconcile()
+    return user_ids
+
+
+def clear(prefix=SEED_PREFIX):
+    """
+    Delete the seeded users along with their follows, tickets and reviews.
+    """
+    return User.objects.filter(username__startswith=prefix).delete()
+
+
+def percentile(values, percent):
+    """
+    Return the percentile of a list of values (nearest-rank method).
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def measure(call, repeat):
+    """
+    Run ``call`` repeat times and report latency, query count and peak memory.
+
+    Latencies are in milliseconds. The peak memory (traced Python
+    allocations, in kilobytes) is taken from one extra run, tracing being too
+    slow to be enabled while timing.
+    """
+    latencies = []
+    queries = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            call()
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context.captured_queries))
+    tracemalloc.start()
+    try:
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "runs": repeat,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "queries": max(queries),
+        "peak_kb": round(peak / 1024, 1),
+    }
@@ -0,0 +1,184 @@
+import csv
+import json
+import time
+import zipfile
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from .feeds import REVIEW, TICKET, serialize, timeline
+from .models import Ticket
+
+CHUNK_SIZE = 500
+FILE_CHUNK_SIZE = 64 * 1024
+# Pieces of a synchronous export produced per thread hop of ``aiterate``.
+ASYNC_BATCH_SIZE = 100
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+}
+CSV_COLUMNS = [
+    "type", "id", "time_created", "title", "text", "rating", "image",
+    "ticket_id", "ticket_title", "ticket_author",
+]
+
+
+def posts(user, chunk_size=CHUNK_SIZE):
+    """
+    Yield every ticket and review of a user, oldest first, as serialized by
+    ``feeds.serialize``.
+
+    The timeline is walked with its keyset cursor, ``chunk_size`` rows at a
+    time (three queries per chunk), so the memory used does not depend on
+    the number of posts.
+    """
+    cursor = None
+    while True:
+        rows = list(timeline([user], cursor, older=False)[:chunk_size])
+        if not rows:
+            return
+        yield from serialize(rows)
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+        cursor = (last["time_created"], last["content_type"], last["post_id"])
+
+
+def image_names(user, chunk_size=CHUNK_SIZE):
+    """
+    Yield the storage names of the images referenced by the posts of a user:
+    its tickets, and the tickets its reviews answer.
+    """
+    return (
+        Ticket.objects.filter(Q(user=user) | Q(review__user=user))
+        .exclude(Q(image="") | Q(image=None))
+        .order_by("pk")
+        .values_list("image", flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Echo:
+    """
+    Write-only file handing back what is written, for csv.writer.
+    """
+    def write(self, value):
+        return value
+
+
+def _csv_row(post):
+    if post["type"] == TICKET:
+        return [
+            TICKET, post["id"], post["time_created"].isoformat(), post["title"],
+            post["description"], "", post["image"] or "", "", "", "",
+        ]
+    return [
+        REVIEW, post["id"], post["time_created"].isoformat(), post["headline"],
+        post["body"], post["rating"], "", post["ticket"]["id"], post["ticket"]["title"],
+        post["ticket"]["author"],
+    ]
+
+
+def as_csv(posts):
+    """
+    Yield the lines of a CSV document of the posts.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for post in posts:
+        yield writer.writerow(_csv_row(post))
+
+
+def as_jsonl(posts):
+    """
+    Yield the lines of a JSON Lines document of the posts.
+    """
+    for post in posts:
+        yield json.dumps(post, cls=DjangoJSONEncoder) + "\n"
+
+
+RENDERERS = {"csv": as_csv, "jsonl": as_jsonl}
+
+
+def export(user, export_format, chunk_size=CHUNK_SIZE):
+    """
+    Yield the lines of the export of a user's posts in the given format.
+    """
+    return RENDERERS[export_format](posts(user, chunk_size))
+
+
+class _Sink:
+    """
+    Unseekable file collecting what zipfile writes, until it is drained.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """
+        Yield what was written since the last drain, if anything.
+        """
+        if self.chunks:
+            data = b"".join(self.chunks)
+            self.chunks = []
+            yield data
+
+
+def export_zip(user, export_format, chunk_size=CHUNK_SIZE):
+    """
+    Yield the bytes of a zip archive holding the export of a user's posts
+    and, under ``images/``, the images they reference.
+
+    The archive is built on the fly: zipfile writes to an unseekable sink
+    (the sizes of an entry follow its data), drained after each piece, so
+    that neither the archive nor an image is ever held in memory.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        name = f"posts.{FORMATS[export_format][1]}"
+        with archive.open(name, mode="w", force_zip64=True) as entry:
+            for line in export(user, export_format, chunk_size):
+                entry.write(line.encode())
+                yield from sink.drain()
+        for image in image_names(user, chunk_size):
+            if not default_storage.exists(image):
+                continue
+            info = zipfile.ZipInfo(f"images/{image}", date_time=time.localtime()[:6])
+            # Images are compressed already.
+            info.compress_type = zipfile.ZIP_STORED
+            with default_storage.open(image, "rb") as source, archive.open(
+                info, mode="w", force_zip64=True
+            ) as entry:
+                for chunk in iter(lambda: source.read(FILE_CHUNK_SIZE), b""):
+                    entry.write(chunk)
+                    yield from sink.drain()
+    yield from sink.drain()
+
+
+async def aiterate(content, batch_size=ASYNC_BATCH_SIZE):
+    """
+    Yield the pieces of a synchronous export from async code.
+
+    Django 4.2 serves a synchronous iterator under ASGI by reading it whole
+    into memory first. The export is rather run in the thread of the
+    request's synchronous code, a batch of pieces at a time, and closed (as
+    well as its database cursor) if the client goes away.
+    """
+    iterator = iter(content)
+    next_batch = sync_to_async(lambda: list(islice(iterator, batch_size)))
+    try:
+        while batch := await next_batch():
+            for piece in batch:
+                yield piece
+    finally:
+        if hasattr(iterator, "close"):
+            await sync_to_async(iterator.close)()
@@ -0,0 +1,146 @@
+from itertools import chain
+from django.db import transaction
+from .models import FeedEntry, Review, Ticket, UserFollow
+
+BATCH_SIZE = 1000
+
+
+def _entry_for(owner_id, post, content_type):
+    """
+    Build the (unsaved) timeline entry of a post for one owner.
+    """
+    return FeedEntry(
+        owner_id=owner_id,
+        author_id=post.user_id,
+        content_type=content_type,
+        ticket_id=post.pk if content_type == "TICKET" else None,
+        review_id=post.pk if content_type == "REVIEW" else None,
+        time_created=post.time_created,
+    )
+
+
+def _bulk_insert(entries):
+    """
+    Insert timeline entries in batches, skipping the ones already present.
+
+    Returns the number of entries submitted.
+    """
+    batch = []
+    count = 0
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        count += len(batch)
+    return count
+
+
+def fan_out_to_author(post, content_type):
+    """
+    Write a new ticket or review into the timeline of its author.
+    """
+    FeedEntry.objects.bulk_create([_entry_for(post.user_id, post, content_type)], ignore_conflicts=True)
+
+
+def fan_out_to_followers(post, content_type):
+    """
+    Write a new ticket or review into the timelines of its author's followers.
+    """
+    followers = UserFollow.objects.filter(followed_user_id=post.user_id).values_list(
+        "user_id", flat=True
+    ).iterator()
+    with transaction.atomic():
+        _bulk_insert(_entry_for(owner_id, post, content_type) for owner_id in followers)
+
+
+def fan_out_posts(posts):
+    """
+    Write new posts, given as (post, content_type) pairs, into the timelines
+    of their authors and of their authors' followers.
+
+    The bulk version of ``fan_out_to_author`` and ``fan_out_to_followers``:
+    the followers of all the authors are read with one query.
+    """
+    followers = {}
+    author_ids = {post.user_id for post, _ in posts}
+    for followed_id, follower_id in UserFollow.objects.filter(
+        followed_user_id__in=author_ids
+    ).values_list("followed_user_id", "user_id").iterator():
+        followers.setdefault(followed_id, []).append(follower_id)
+    with transaction.atomic():
+        return _bulk_insert(
+            _entry_for(owner_id, post, content_type)
+            for post, content_type in posts
+            for owner_id in chain([post.user_id], followers.get(post.user_id, []))
+        )
+
+
+def _posts_of(author_ids):
+    """
+    Yield (post, content_type) for every ticket and review of the given authors.
+    """
+    tickets = Ticket.objects.filter(user_id__in=author_ids).only("id", "user_id", "time_created")
+    reviews = Review.objects.filter(user_id__in=author_ids).only("id", "user_id", "time_created")
+    for ticket in tickets.iterator(chunk_size=BATCH_SIZE):
+        yield ticket, "TICKET"
+    for review in reviews.iterator(chunk_size=BATCH_SIZE):
+        yield review, "REVIEW"
+
+
+def add_follow(follower_id, followed_id):
+    """
+    Copy the posts of a newly followed user into the follower's timeline.
+    """
+    add_follows(follower_id, [followed_id])
+
+
+def add_follows(follower_id, followed_ids):
+    """
+    Copy the posts of several newly followed users into the follower's timeline.
+    """
+    with transaction.atomic():
+        _bulk_insert(
+            _entry_for(follower_id, post, content_type)
+            for post, content_type in _posts_of(followed_ids)
+        )
+
+
+def remove_follow(follower_id, followed_id):
+    """
+    Drop the posts of an unfollowed user from the follower's timeline.
+    """
+    remove_follows(follower_id, [followed_id])
+
+
+def remove_follows(follower_id, followed_ids):
+    """
+    Drop the posts of several unfollowed users from the follower's timeline.
+    """
+    FeedEntry.objects.filter(owner_id=follower_id, author_id__in=followed_ids).delete()
+
+
+def rebuild(owner_ids):
+    """
+    Recompute from scratch the timelines of the given owners.
+
+    The follows are read from the database, not from the cache of
+    ``follows.followed_ids``: a repair must not trust it. Returns the number
+    of entries written.
+    """
+    written = 0
+    for owner_id in owner_ids:
+        authors = [
+            *UserFollow.objects.filter(user_id=owner_id).values_list("followed_user_id", flat=True),
+            owner_id,
+        ]
+        with transaction.atomic():
+            FeedEntry.objects.filter(owner_id=owner_id).delete()
+            written += _bulk_insert(
+                _entry_for(owner_id, post, content_type)
+                for post, content_type in _posts_of(authors)
+            )
+    return written
@@ -0,0 +1,364 @@
+import asyncio
+import base64
+import binascii
+import json
+
+from django.core.files.storage import default_storage
+from django.db.models import Value, CharField, Exists, F, Max, OuterRef, Q
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+from .images import derivative_name
+from .models import FeedEntry, Ticket, Review, UserStats
+
+TICKET = "TICKET"
+REVIEW = "REVIEW"
+
+
+class InvalidCursor(ValueError):
+    """
+    Raised when a pagination cursor cannot be decoded.
+    """
+
+
+def encode_cursor(time_created, content_type, pk):
+    """
+    Encode a (time_created, content_type, id) position into an opaque token.
+    """
+    raw = json.dumps([time_created.isoformat(), content_type, pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Decode a token built by encode_cursor back into its position.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        time_created, content_type, pk = json.loads(base64.urlsafe_b64decode(padded))
+        time_created = parse_datetime(time_created)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(token)
+    if time_created is None or content_type not in (TICKET, REVIEW) or not isinstance(pk, int):
+        raise InvalidCursor(token)
+    return time_created, content_type, pk
+
+
+def timeline_key(cursor):
+    """
+    Return the sort key of a decoded cursor in the order of ``timeline``.
+    """
+    time_created, content_type, pk = cursor
+    return time_created, pk, content_type
+
+
+def _position_filter(content_type, cursor, older):
+    """
+    Build the filter keeping the rows of one branch strictly after the cursor.
+
+    Rows are ordered on (time_created, id, content_type). As content_type is a
+    constant inside a branch, the comparison on it is resolved here and only
+    the time_created / id part is left to the database.
+    """
+    time_created, cursor_type, pk = cursor
+    op = "lt" if older else "gt"
+    if content_type != cursor_type and (content_type < cursor_type) == older:
+        op_id = f"{op}e"
+    else:
+        op_id = op
+    return Q(**{f"time_created__{op}": time_created}) | Q(
+        time_created=time_created, **{f"id__{op_id}": pk}
+    )
+
+
+def timeline(users, cursor=None, older=True):
+    """
+    Return the merged ticket/review timeline of the given users.
+
+    The queryset is a UNION ALL computed by the database, yielding
+    dictionaries (post_id, time_created, content_type) ordered newest first, or
+    oldest first when ``older`` is False. When a cursor is given, only the
+    rows past it in that direction are kept.
+
+    Ties are broken on (id, content_type) rather than (content_type, id): each
+    branch is then read in the order of the (user, time_created) indexes and
+    merged without any temporary sort.
+    """
+    branches = []
+    for model, content_type in ((Ticket, TICKET), (Review, REVIEW)):
+        queryset = model.objects.filter(user__in=users)
+        if cursor is not None:
+            queryset = queryset.filter(_position_filter(content_type, cursor, older))
+        branches.append(
+            queryset.annotate(post_id=F("id"), content_type=Value(content_type, CharField()))
+            .values("post_id", "time_created", "content_type")
+            .order_by()
+        )
+    prefix = "-" if older else ""
+    return branches[0].union(branches[1], all=True).order_by(
+        f"{prefix}time_created", f"{prefix}post_id", f"{prefix}content_type"
+    )
+
+
+def materialized_timeline(owner, cursor=None, older=True):
+    """
+    Return the timeline of a user read from its FeedEntry rows.
+
+    Yields the same dictionaries as ``timeline`` over the user and the users
+    it follows, newest first, with a single range scan on (owner,
+    time_created). Ties are broken on (content_type, post id).
+    """
+    queryset = FeedEntry.objects.filter(owner=owner).annotate(
+        post_id=Coalesce("ticket_id", "review_id")
+    )
+    if cursor is not None:
+        time_created, content_type, pk = cursor
+        op = "lt" if older else "gt"
+        queryset = queryset.filter(
+            Q(**{f"time_created__{op}": time_created})
+            | Q(time_created=time_created, **{f"content_type__{op}": content_type})
+            | Q(time_created=time_created, content_type=content_type, **{f"post_id__{op}": pk})
+        )
+    # Within a content type, one of ticket_id / review_id is always null, so
+    # ordering on both is ordering on post_id, and matches the owner index.
+    prefix = "-" if older else ""
+    return queryset.values("post_id", "time_created", "content_type").order_by(
+        f"{prefix}time_created", f"{prefix}content_type", f"{prefix}ticket_id", f"{prefix}review_id"
+    )
+
+
+def feed_tickets():
+    """
+    Return the tickets queryset carrying what the feed templates display.
+
+    Authors are joined and the closed state is annotated (has_review) so that
+    rendering a ticket does not run any further query.
+    """
+    return Ticket.objects.select_related("user").annotate(
+        has_review=Exists(Review.objects.filter(ticket=OuterRef("pk")))
+    )
+
+
+def feed_reviews():
+    """
+    Return the reviews queryset carrying what the feed templates display.
+
+    Authors, tickets and ticket authors are joined in the same query.
+    """
+    return Review.objects.select_related("user", "ticket", "ticket__user")
+
+
+def hydrate(rows):
+    """
+    Turn timeline rows into Ticket and Review instances, keeping their order.
+
+    Each instance gets a ``content_type`` attribute as expected by the feed
+    templates. Whatever the number of rows, at most two queries are run.
+    """
+    rows = list(rows)
+    ids = {TICKET: [], REVIEW: []}
+    for row in rows:
+        ids[row["content_type"]].append(row["post_id"])
+    instances = {
+        TICKET: feed_tickets().in_bulk(ids[TICKET]) if ids[TICKET] else {},
+        REVIEW: feed_reviews().in_bulk(ids[REVIEW]) if ids[REVIEW] else {},
+    }
+    posts = []
+    for row in rows:
+        post = instances[row["content_type"]].get(row["post_id"])
+        if post is not None:
+            post.content_type = row["content_type"]
+            posts.append(post)
+    return posts
+
+
+async def ahydrate(rows):
+    """
+    Asynchronous version of ``hydrate``, the two lookups being run together.
+    """
+    ids = {TICKET: [], REVIEW: []}
+    for row in rows:
+        ids[row["content_type"]].append(row["post_id"])
+
+    async def lookup(queryset, pks):
+        return await queryset.ain_bulk(pks) if pks else {}
+
+    tickets, reviews = await asyncio.gather(
+        lookup(feed_tickets(), ids[TICKET]), lookup(feed_reviews(), ids[REVIEW])
+    )
+    instances = {TICKET: tickets, REVIEW: reviews}
+    posts = []
+    for row in rows:
+        post = instances[row["content_type"]].get(row["post_id"])
+        if post is not None:
+            post.content_type = row["content_type"]
+            posts.append(post)
+    return posts
+
+
+def _image_urls(name, has_derivatives):
+    if not name:
+        return None, None
+    thumbnail = default_storage.url(derivative_name(name, "thumb")) if has_derivatives else None
+    return default_storage.url(name), thumbnail
+
+
+def serialize(rows):
+    """
+    Turn timeline rows into JSON-ready dictionaries, keeping their order.
+
+    Like ``hydrate`` it runs at most two queries, but only the displayed
+    columns are selected (``values()``) and no model instance is built.
+    """
+    rows = list(rows)
+    ids = {TICKET: [], REVIEW: []}
+    for row in rows:
+        ids[row["content_type"]].append(row["post_id"])
+    tickets = {}
+    if ids[TICKET]:
+        tickets = {
+            ticket["id"]: ticket
+            for ticket in Ticket.objects.filter(pk__in=ids[TICKET])
+            .annotate(
+                author=F("user__username"),
+                closed=Exists(Review.objects.filter(ticket=OuterRef("pk"))),
+            )
+            .values(
+                "id", "title", "description", "image", "has_derivatives",
+                "time_created", "author", "closed",
+            )
+        }
+    reviews = {}
+    if ids[REVIEW]:
+        reviews = {
+            review["id"]: review
+            for review in Review.objects.filter(pk__in=ids[REVIEW])
+            .annotate(
+                author=F("user__username"),
+                ticket_title=F("ticket__title"),
+                ticket_author=F("ticket__user__username"),
+            )
+            .values(
+                "id", "headline", "body", "rating", "time_created", "author",
+                "ticket_id", "ticket_title", "ticket_author",
+            )
+        }
+    posts = []
+    for row in rows:
+        if row["content_type"] == TICKET and row["post_id"] in tickets:
+            ticket = tickets[row["post_id"]]
+            image, thumbnail = _image_urls(ticket.pop("image"), ticket.pop("has_derivatives"))
+            posts.append(dict(ticket, type=TICKET, image=image, thumbnail=thumbnail))
+        elif row["content_type"] == REVIEW and row["post_id"] in reviews:
+            review = reviews[row["post_id"]]
+            posts.append({
+                "type": REVIEW,
+                "id": review["id"],
+                "headline": review["headline"],
+                "body": review["body"],
+                "rating": review["rating"],
+                "time_created": review["time_created"],
+                "author": review["author"],
+                "ticket": {
+                    "id": review["ticket_id"],
+                    "title": review["ticket_title"],
+                    "author": review["ticket_author"],
+                },
+            })
+    return posts
+
+
+def last_modified(user_ids):
+    """
+    Return the time the posts of the given users last changed, or None.
+
+    Read from the UserStats rows (a primary key lookup), so that the freshness
+    of a timeline is known without querying the timeline itself.
+    """
+    return UserStats.objects.filter(user_id__in=user_ids).aggregate(
+        last=Max("last_activity")
+    )["last"]
+
+
+class CursorPage:
+    """
+    A page of the timeline delimited by keyset cursors.
+
+    Attributes:
+        object_list (list): The tickets and reviews of the page.
+        has_next (bool): Whether older posts exist.
+        has_previous (bool): Whether newer posts exist.
+        next_cursor (str): Token to fetch the following (older) page.
+        previous_cursor (str): Token to fetch the preceding (newer) page.
+    """
+    is_cursor = True
+
+    def __init__(self, rows, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = self._cursor_of(rows[-1]) if rows else None
+        self.previous_cursor = self._cursor_of(rows[0]) if rows else None
+
+    @staticmethod
+    def _cursor_of(row):
+        return encode_cursor(row["time_created"], row["content_type"], row["post_id"])
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def cursor_page(source, per_page, after=None, before=None, hydrator=hydrate):
+    """
+    Fetch one page of a timeline.
+
+    ``source`` is called as ``source(cursor, older)`` and returns the rows of
+    the timeline past the cursor (see ``timeline`` and
+    ``materialized_timeline``). ``after`` walks towards older posts and
+    ``before`` towards newer ones; both are tokens produced by a previous
+    CursorPage. Only per_page + 1 rows are read from the database, whatever
+    the depth of the page. ``hydrator`` turns the rows into the page objects
+    (``hydrate`` for the templates, ``serialize`` for the JSON API).
+    """
+    if before:
+        cursor = decode_cursor(before)
+        rows = list(source(cursor, False)[:per_page + 1])
+        if not rows:
+            return cursor_page(source, per_page, hydrator=hydrator)
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return CursorPage(rows, hydrator(rows), has_next=True, has_previous=has_previous)
+
+    cursor = decode_cursor(after) if after else None
+    rows = list(source(cursor, True)[:per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    return CursorPage(rows, hydrator(rows), has_next=has_next, has_previous=cursor is not None)
+
+
+async def acursor_page(source, per_page, after=None, before=None, hydrator=ahydrate):
+    """
+    Asynchronous version of ``cursor_page``, rows being read with the async
+    ORM and turned into page objects by an async ``hydrator``.
+    """
+    if before:
+        cursor = decode_cursor(before)
+        rows = [row async for row in source(cursor, False)[:per_page + 1]]
+        if not rows:
+            return await acursor_page(source, per_page, hydrator=hydrator)
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return CursorPage(rows, await hydrator(rows), has_next=True, has_previous=has_previous)
+
+    cursor = decode_cursor(after) if after else None
+    rows = [row async for row in source(cursor, True)[:per_page + 1]]
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    return CursorPage(
+        rows, await hydrator(rows), has_next=has_next, has_previous=cursor is not None
+    )
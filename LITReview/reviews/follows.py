@@ -0,0 +1,185 @@
+import csv
+import io
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from jobs.queue import enqueue
+from . import stats
+from .models import UserFollow
+
+FOLLOW_CACHE_TIMEOUT = 60 * 60 * 24
+# Keeps the IN (...) lists under the SQLite limit of query parameters.
+CHUNK_SIZE = 500
+DEFAULT_BULK_MAX_USERNAMES = 1000
+
+# Per-username results of bulk_follow / bulk_unfollow.
+FOLLOWED = "followed"
+ALREADY_FOLLOWING = "already_following"
+UNFOLLOWED = "unfollowed"
+NOT_FOLLOWING = "not_following"
+UNKNOWN_USER = "unknown_user"
+SELF = "self"
+
+
+# Set while bulk_unfollow deletes follows: its set-based updates replace the
+# per-row post_delete handlers.
+_bulk_deleting = ContextVar("bulk_deleting", default=False)
+
+
+def bulk_max_usernames():
+    return getattr(settings, "BULK_FOLLOW_MAX_USERNAMES", DEFAULT_BULK_MAX_USERNAMES)
+
+
+def is_bulk_deleting():
+    return _bulk_deleting.get()
+
+
+def _following_key(user_id):
+    return f"follows:following:{user_id}"
+
+
+def followed_ids(user_id):
+    """
+    Return the set of ids of the users followed by a user.
+
+    The set is read from the cache; the database is only queried after an
+    invalidation or an eviction.
+    """
+    key = _following_key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(
+            UserFollow.objects.filter(user_id=user_id).values_list("followed_user_id", flat=True)
+        )
+        cache.set(key, ids, FOLLOW_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate(user_id):
+    """
+    Drop the cached followed users of a user adding or removing follows.
+
+    The entry is dropped right away and again once the transaction is
+    committed, so that a concurrent read cannot cache the pre-commit state.
+    The follower counts are kept by UserStats.
+    """
+    key = _following_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def parse_usernames(text):
+    """
+    Return the usernames of a list or CSV export, in order and without duplicates.
+
+    The first column of each row is used; separators may be commas or new
+    lines, and a "username" header row is ignored.
+    """
+    rows = [row for row in csv.reader(io.StringIO(text.strip())) if row]
+    cells = rows[0] if len(rows) == 1 else [row[0] for row in rows]
+    usernames = []
+    seen = set()
+    for cell in cells:
+        username = cell.strip()
+        if username and username.lower() != "username" and username not in seen:
+            seen.add(username)
+            usernames.append(username)
+    return usernames
+
+
+def _chunks(items):
+    items = list(items)
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
+
+
+def _resolve(user, usernames):
+    """
+    Map usernames to user ids and pre-fill the results of the invalid ones.
+    """
+    ids = {}
+    for chunk in _chunks(usernames):
+        ids.update(User.objects.filter(username__in=chunk).values_list("username", "id"))
+    results = {}
+    for username in usernames:
+        if username not in ids:
+            results[username] = UNKNOWN_USER
+        elif ids[username] == user.id:
+            results[username] = SELF
+            del ids[username]
+    return ids, results
+
+
+def _followed_among(user, user_ids):
+    followed = set()
+    for chunk in _chunks(user_ids):
+        followed.update(
+            UserFollow.objects.filter(user=user, followed_user_id__in=chunk).values_list(
+                "followed_user_id", flat=True
+            )
+        )
+    return followed
+
+
+def _count_follows(user_id, followed_ids, delta):
+    stats.apply([user_id], following_count=delta * len(followed_ids))
+    for chunk in _chunks(followed_ids):
+        stats.apply(chunk, followers_count=delta)
+
+
+def bulk_follow(user, usernames):
+    """
+    Make a user follow every user of a list, with set-based queries.
+
+    Returns a {username: result} dictionary. As bulk_create does not send
+    signals, the caches are updated here for all the new follows at once,
+    and the backfill of the timeline is queued by chunks of followed users.
+    """
+    from . import tasks
+
+    ids, results = _resolve(user, usernames)
+    with transaction.atomic():
+        already = _followed_among(user, ids.values())
+        new_ids = [user_id for user_id in ids.values() if user_id not in already]
+        UserFollow.objects.bulk_create(
+            [UserFollow(user=user, followed_user_id=user_id) for user_id in new_ids],
+            batch_size=CHUNK_SIZE,
+            ignore_conflicts=True,
+        )
+        if new_ids:
+            for chunk in _chunks(new_ids):
+                enqueue(tasks.add_follows, user.id, chunk)
+            _count_follows(user.id, new_ids, 1)
+            invalidate(user.id)
+    for username, user_id in ids.items():
+        results[username] = ALREADY_FOLLOWING if user_id in already else FOLLOWED
+    return {username: results[username] for username in usernames}
+
+
+def bulk_unfollow(user, usernames):
+    """
+    Make a user stop following every user of a list, with set-based deletes.
+
+    Returns a {username: result} dictionary.
+    """
+    from . import fanout
+
+    ids, results = _resolve(user, usernames)
+    with transaction.atomic():
+        followed = _followed_among(user, ids.values())
+        token = _bulk_deleting.set(True)
+        try:
+            for chunk in _chunks(followed):
+                UserFollow.objects.filter(user=user, followed_user_id__in=chunk).delete()
+                fanout.remove_follows(user.id, chunk)
+        finally:
+            _bulk_deleting.reset(token)
+        if followed:
+            _count_follows(user.id, followed, -1)
+            invalidate(user.id)
+    for username, user_id in ids.items():
+        results[username] = UNFOLLOWED if user_id in followed else NOT_FOLLOWING
+    return {username: results[username] for username in usernames}
@@ -1,6 +1,46 @@
 from django import forms
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
 from django_starfield import Stars
-from .models import Ticket, Review, UserFollow
+from PIL import Image
+from .models import Ticket, Review
+from .uploads import max_upload_dimensions, max_upload_size
+
+
+class BoundedImageField(forms.ImageField):
+    """
+    Image field enforcing byte and pixel-dimension limits.
+
+    Both limits are checked before Pillow verifies the whole image: the size
+    is known from the upload and the dimensions from the image header.
+    """
+    def to_python(self, data):
+        if data in self.empty_values or not hasattr(data, "size"):
+            return super().to_python(data)
+        if data.size > max_upload_size():
+            raise ValidationError(
+                f"The image is too large ({filesizeformat(data.size)}), "
+                f"the limit is {filesizeformat(max_upload_size())}.",
+                code="file_too_large",
+            )
+        source = data.temporary_file_path() if hasattr(data, "temporary_file_path") else data
+        try:
+            with Image.open(source) as image:
+                width, height = image.size
+        except Exception:
+            # Let ImageField report the invalid image.
+            return super().to_python(data)
+        finally:
+            data.seek(0)
+        max_width, max_height = max_upload_dimensions()
+        if width > max_width or height > max_height:
+            raise ValidationError(
+                f"The image is too large ({width}x{height} pixels), "
+                f"the limit is {max_width}x{max_height}.",
+                code="image_too_large",
+            )
+        return super().to_python(data)
 
 
 class TicketForm(forms.ModelForm):
@@ -15,6 +55,7 @@ class TicketForm(forms.ModelForm):
     class Meta:
         model = Ticket
         fields = ["title", "description", "image"]
+        field_classes = {"image": BoundedImageField}
 
 
 class ReviewForm(forms.ModelForm):
@@ -33,13 +74,25 @@ class ReviewForm(forms.ModelForm):
         fields = ["headline", "rating", "body"]
 
 
-class SubscribeForm(forms.ModelForm):
+class SubscribeForm(forms.Form):
     """
     Form for subscribing to a user's updates.
 
+    The user is entered by username (with autocompletion) rather than chosen
+    from a list of every user.
+
     Attributes:
-        followed_user (ForeignKey): The user to follow for updates.
+        followed_user (str): The username of the user to follow for updates.
     """
-    class Meta:
-        model = UserFollow
-        fields = ["followed_user"]
+    followed_user = forms.CharField(
+        max_length=150,
+        label="Followed user",
+        widget=forms.TextInput(attrs={"list": "user-autocomplete", "autocomplete": "off"}),
+    )
+
+    def clean_followed_user(self):
+        username = self.cleaned_data["followed_user"].strip()
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise ValidationError(f"User {username} does not exist", code="unknown_user")
@@ -0,0 +1,137 @@
+"""
+Cached HTML fragments of the feed snippets.
+
+The fragments and their versions live in the default cache, which is shared
+by the web processes, the job workers and the management commands: a version
+bumped by any of them invalidates the fragments everywhere.
+
+The hit/miss counters are kept off the request path: each process counts in
+memory and adds its counts to the shared counters at most every
+STATS_FLUSH_INTERVAL seconds, so that fragment_cache_stats reads the counts
+of all the web processes, up to that delay.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+STATS_KEYS = {"hits": "fragments:stats:hits", "misses": "fragments:stats:misses"}
+STATS_FLUSH_INTERVAL = 10
+
+# Viewer-independent parts of the feed snippets, cached per post.
+TEMPLATES = {
+    "ticket": "reviews/ticket_body.html",
+    "review": "reviews/review_body.html",
+}
+
+
+def _version_key(kind, pk):
+    return f"fragments:version:{kind}:{pk}"
+
+
+def bump(kind, pk):
+    """
+    Invalidate the cached fragments of a post by giving it a new version.
+    """
+    cache.set(_version_key(kind, pk), time.time_ns(), None)
+
+
+def _versions(kind, post):
+    """
+    Return the versions the fragment key of a post is built from.
+
+    A review fragment also depends on its ticket. Missing versions (never set
+    or evicted) are initialised with a fresh value so that an old fragment can
+    never be served again.
+    """
+    keys = [_version_key(kind, post.pk)]
+    if kind == "review":
+        keys.append(_version_key("ticket", post.ticket_id))
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions.append(str(found[key]))
+    return versions
+
+
+# Counts of the process not added to the shared counters yet.
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def _count(stat):
+    global _flushed_at
+    with _pending_lock:
+        _pending[stat] += 1
+        if time.monotonic() - _flushed_at < STATS_FLUSH_INTERVAL:
+            return
+        counts = dict(_pending)
+        _pending.clear()
+        _flushed_at = time.monotonic()
+    _add(counts)
+
+
+def _add(counts):
+    for stat, count in counts.items():
+        key = STATS_KEYS[stat]
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            if not cache.add(key, count, None):
+                cache.incr(key, count)
+
+
+def flush_stats():
+    """
+    Add the counts of the process to the shared counters.
+    """
+    global _flushed_at
+    with _pending_lock:
+        counts = dict(_pending)
+        _pending.clear()
+        _flushed_at = time.monotonic()
+    _add(counts)
+
+
+def render_fragment(kind, post):
+    """
+    Return the cached HTML of the viewer-independent part of a post.
+    """
+    key = ":".join(["fragments", kind, str(post.pk)] + _versions(kind, post))
+    html = cache.get(key)
+    if html is None:
+        _count("misses")
+        html = render_to_string(TEMPLATES[kind], {"el": post})
+        cache.set(key, html, FRAGMENT_TIMEOUT)
+    else:
+        _count("hits")
+    return mark_safe(html)
+
+
+def stats():
+    """
+    Return the hit/miss counters of the fragment cache.
+    """
+    flush_stats()
+    found = cache.get_many(STATS_KEYS.values())
+    counters = {stat: found.get(key, 0) for stat, key in STATS_KEYS.items()}
+    total = counters["hits"] + counters["misses"]
+    counters["hit_ratio"] = counters["hits"] / total if total else 0.0
+    return counters
+
+
+def reset_stats():
+    """
+    Reset the hit/miss counters of the fragment cache.
+    """
+    with _pending_lock:
+        _pending.clear()
+    cache.delete_many(STATS_KEYS.values())
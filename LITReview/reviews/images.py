@@ -0,0 +1,68 @@
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# name: (max width in pixels, Pillow format, file extension)
+DERIVATIVES = {
+    "thumb": (150, "JPEG", "jpg"),
+    "medium": (600, "JPEG", "jpg"),
+    "webp": (300, "WEBP", "webp"),
+}
+DERIVATIVES_DIR = "derivatives"
+
+
+def derivative_name(image_name, kind):
+    """
+    Return the storage name of a derivative of an uploaded image.
+
+    "img/reviews/cover.png" gives "img/reviews/derivatives/cover.png_thumb.jpg":
+    the extension of the source is kept, so that "cover.jpg" does not share
+    its derivatives.
+    """
+    directory, filename = posixpath.split(image_name)
+    extension = DERIVATIVES[kind][2]
+    return posixpath.join(directory, DERIVATIVES_DIR, f"{filename}_{kind}.{extension}")
+
+
+def render_derivatives(image_name):
+    """
+    Generate and store every derivative of an uploaded image.
+
+    Only the storage is used so the function can run in a thread or in a
+    separate process. Returns the image name.
+    """
+    with default_storage.open(image_name, "rb") as source:
+        with Image.open(source) as original:
+            original = ImageOps.exif_transpose(original)
+            for kind, (width, image_format, _) in DERIVATIVES.items():
+                image = original.copy()
+                image.thumbnail((width, width * 4))
+                if image_format == "JPEG" and image.mode != "RGB":
+                    image = image.convert("RGB")
+                buffer = io.BytesIO()
+                image.save(buffer, image_format, quality=85, optimize=True)
+                name = derivative_name(image_name, kind)
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+    return image_name
+
+
+def mark_ready(ticket_id, image_name):
+    """
+    Record that the derivatives of a ticket's current image are available.
+
+    Called from the job workers and from regenerate_derivatives: the
+    fragments of the ticket are invalidated through the shared cache.
+    """
+    from .fragments import bump
+    from .models import Ticket
+    from .stats import apply
+
+    tickets = Ticket.objects.filter(pk=ticket_id, image=image_name)
+    if tickets.update(has_derivatives=True):
+        bump("ticket", ticket_id)
+        apply(tickets.values("user_id"), touch=True)
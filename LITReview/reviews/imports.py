@@ -0,0 +1,289 @@
+"""
+Bulk import of tickets and reviews from JSON Lines.
+
+Each line holds one record:
+
+- a ticket: ``{"type": "ticket", "user": "<username>", "title": ...,
+  "description": ..., "image": "<path>", "time_created": "<ISO 8601>",
+  "review": {"headline": ..., "rating": ..., "body": ..., "user": ...}}``,
+  the review (written by the ticket's author unless ``user`` is given),
+  the image and the time being optional;
+- a review of an existing ticket: ``{"type": "review", "ticket_id": <id>,
+  "user": "<username>", "headline": ..., "rating": ..., "body": ...}``.
+
+Records are validated with the rules of TicketForm and ReviewForm, then
+inserted batch by batch with bulk_create, in one transaction per batch. The
+images are copied and their derivatives generated by a process pool before
+their batch is inserted.
+"""
+import json
+import os
+
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+from . import fanout, stats
+from .forms import ReviewForm, TicketForm
+from .images import render_derivatives
+from .models import Review, Ticket
+from .uploads import max_upload_dimensions, max_upload_size
+
+BATCH_SIZE = 500
+
+
+class InvalidRecord(ValueError):
+    """
+    Raised when a record cannot be imported.
+
+    Attributes:
+        errors (dict): The messages of each invalid field.
+    """
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def read_records(path, offset=0, line=0):
+    """
+    Yield (line number, offset of the next line, raw line) from a JSONL file,
+    starting at a byte offset (a checkpoint).
+    """
+    with open(path, "rb") as source:
+        source.seek(offset)
+        for raw in source:
+            offset += len(raw)
+            line += 1
+            if raw.strip():
+                yield line, offset, raw
+
+
+def import_image(path):
+    """
+    Copy an image into the storage and generate its derivatives.
+
+    Enforces the limits of ticket uploads. Only the filesystem and the
+    storage are used, so that it runs in a worker process. Returns the
+    storage name of the image.
+    """
+    size = os.path.getsize(path)
+    if size > max_upload_size():
+        raise ValueError(
+            f"The image is too large ({filesizeformat(size)}), "
+            f"the limit is {filesizeformat(max_upload_size())}."
+        )
+    with Image.open(path) as image:
+        width, height = image.size
+        image.verify()
+    max_width, max_height = max_upload_dimensions()
+    if width > max_width or height > max_height:
+        raise ValueError(
+            f"The image is too large ({width}x{height} pixels), "
+            f"the limit is {max_width}x{max_height}."
+        )
+    field = Ticket._meta.get_field("image")
+    with open(path, "rb") as source:
+        name = field.storage.save(
+            field.generate_filename(None, os.path.basename(path)), File(source)
+        )
+    render_derivatives(name)
+    return name
+
+
+def _form_errors(form):
+    return {field: list(messages) for field, messages in form.errors.items()}
+
+
+def _time_created(record):
+    value = record.get("time_created")
+    if value is None:
+        return timezone.now()
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise InvalidRecord({"time_created": [f"Invalid date and time: {value!r}."]})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _user_id(record, users, default=None):
+    username = record.get("user")
+    if username is None and default is not None:
+        return default
+    if not isinstance(username, str) or username not in users:
+        raise InvalidRecord({"user": [f"User {username} does not exist."]})
+    return users[username]
+
+
+def _review(record, users, default_user=None):
+    form = ReviewForm(data={
+        "headline": record.get("headline"),
+        "rating": record.get("rating"),
+        "body": record.get("body", ""),
+    })
+    if not form.is_valid():
+        raise InvalidRecord(_form_errors(form))
+    review = form.save(commit=False)
+    review.user_id = _user_id(record, users, default_user)
+    review.time_created = _time_created(record)
+    return review
+
+
+def _ticket(record, users):
+    form = TicketForm(data={
+        "title": record.get("title"),
+        "description": record.get("description", ""),
+    })
+    if not form.is_valid():
+        raise InvalidRecord(_form_errors(form))
+    ticket = form.save(commit=False)
+    ticket.user_id = _user_id(record, users)
+    ticket.time_created = _time_created(record)
+    return ticket
+
+
+class Batch:
+    """
+    The records of a batch, validated and ready to be inserted.
+
+    Attributes:
+        tickets (list): The (unsaved) tickets, with their ``image_path``.
+        reviews (list): The (unsaved) reviews, of new or existing tickets.
+        rejected (list): (line number, errors) of the invalid records.
+    """
+    def __init__(self):
+        self.tickets = []
+        self.reviews = []
+        self.rejected = []
+
+
+def parse(lines, images_dir=None):
+    """
+    Validate a batch of (line number, raw line) and return it as a Batch.
+
+    Users and reviewed tickets are looked up with one query each. A review
+    of an existing ticket is rejected when the ticket already has a review,
+    or gets another one earlier in the batch.
+    """
+    batch = Batch()
+    records = []
+    for line, raw in lines:
+        try:
+            record = json.loads(raw)
+        except ValueError as error:
+            batch.rejected.append((line, {"record": [f"Invalid JSON: {error}."]}))
+            continue
+        if not isinstance(record, dict) or record.get("type") not in ("ticket", "review"):
+            batch.rejected.append((line, {"type": ["Expected a ticket or a review record."]}))
+            continue
+        records.append((line, record))
+
+    usernames = set()
+    ticket_ids = set()
+    for _, record in records:
+        nested = record.get("review") if isinstance(record.get("review"), dict) else {}
+        usernames.update(
+            name for name in (record.get("user"), nested.get("user")) if isinstance(name, str)
+        )
+        if record["type"] == "review" and isinstance(record.get("ticket_id"), int):
+            ticket_ids.add(record["ticket_id"])
+    users = dict(User.objects.filter(username__in=usernames).values_list("username", "id"))
+    tickets = dict(Ticket.objects.filter(pk__in=ticket_ids).values_list("pk", "user_id"))
+    reviewed = set(Review.objects.filter(ticket_id__in=ticket_ids).values_list("ticket_id", flat=True))
+
+    for line, record in records:
+        try:
+            if record["type"] == "ticket":
+                ticket = _ticket(record, users)
+                ticket.line, ticket.image_path = line, None
+                if record.get("image"):
+                    ticket.image_path = os.path.join(images_dir or "", record["image"])
+                review = None
+                if record.get("review"):
+                    if not isinstance(record["review"], dict):
+                        raise InvalidRecord({"review": ["Expected a review record."]})
+                    review = _review(record["review"], users, default_user=ticket.user_id)
+                    review.ticket = ticket
+                batch.tickets.append(ticket)
+                if review is not None:
+                    batch.reviews.append(review)
+            else:
+                ticket_id = record.get("ticket_id")
+                if ticket_id not in tickets:
+                    raise InvalidRecord({"ticket_id": [f"Ticket {ticket_id} does not exist."]})
+                if ticket_id in reviewed:
+                    raise InvalidRecord({"ticket_id": [f"Ticket {ticket_id} already has a review."]})
+                review = _review(record, users)
+                review.ticket_id = ticket_id
+                review.ticket_author_id = tickets[ticket_id]
+                reviewed.add(ticket_id)
+                batch.reviews.append(review)
+        except InvalidRecord as error:
+            batch.rejected.append((line, error.errors))
+    return batch
+
+
+def process_images(batch, executor):
+    """
+    Copy the images of a batch in the worker processes of ``executor``.
+
+    A ticket whose image is rejected is dropped from the batch, along with
+    its review.
+    """
+    futures = {
+        executor.submit(import_image, ticket.image_path): ticket
+        for ticket in batch.tickets
+        if ticket.image_path
+    }
+    dropped = set()
+    for future, ticket in futures.items():
+        try:
+            ticket.image = future.result()
+            ticket.has_derivatives = True
+        except Exception as error:
+            dropped.add(id(ticket))
+            batch.rejected.append((ticket.line, {"image": [str(error)]}))
+    if dropped:
+        batch.tickets = [ticket for ticket in batch.tickets if id(ticket) not in dropped]
+        batch.reviews = [
+            review
+            for review in batch.reviews
+            if review.ticket_id is not None or id(review.ticket) not in dropped
+        ]
+
+
+def insert(batch):
+    """
+    Insert a batch in one transaction and update what the signals would.
+
+    Bulk inserts do not send signals: the posts are fanned out to the
+    timelines and the counters of their authors updated here, while the
+    search index is kept up to date by its triggers. The imported posts are
+    not pushed to the live feed connections.
+    """
+    deltas = {}
+
+    def count(user_id, **changes):
+        user = deltas.setdefault(user_id, {})
+        for field, delta in changes.items():
+            user[field] = user.get(field, 0) + delta
+
+    with transaction.atomic():
+        Ticket.objects.bulk_create(batch.tickets)
+        Review.objects.bulk_create(batch.reviews)
+        fanout.fan_out_posts(
+            [(ticket, "TICKET") for ticket in batch.tickets]
+            + [(review, "REVIEW") for review in batch.reviews]
+        )
+        for ticket in batch.tickets:
+            count(ticket.user_id, tickets_count=1, open_tickets_count=1)
+        for review in batch.reviews:
+            count(review.user_id, reviews_count=1, rating_total=review.rating)
+            author_id = getattr(review, "ticket_author_id", None) or review.ticket.user_id
+            count(author_id, open_tickets_count=-1)
+        for user_id, changes in deltas.items():
+            stats.apply([user_id], touch=True, **changes)
+    return len(batch.tickets), len(batch.reviews)
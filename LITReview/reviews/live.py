@@ -0,0 +1,232 @@
+import asyncio
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from .feeds import decode_cursor, encode_cursor, serialize, timeline, timeline_key
+
+DEFAULT_HEARTBEAT = 15
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_MAX_AGE = 10 * 60
+DEFAULT_CATCH_UP = 100
+# Milliseconds the browser waits before reconnecting a closed stream.
+RETRY_MS = 3000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _position(event_id):
+    """
+    Return the sort key of an event id, in the order of ``timeline``.
+
+    Events are compared on the key the catch-up query orders on, so that a
+    live event is skipped only if the catch-up already sent it.
+    """
+    return timeline_key(decode_cursor(event_id))
+
+
+class Subscription:
+    """
+    The bounded queue of events waiting to be sent on one live connection.
+
+    Attributes:
+        authors (frozenset): The ids of the users whose posts are streamed.
+        queue (asyncio.Queue): The pending events, bounded for backpressure.
+        overflowed (bool): Whether events were dropped because the client
+            does not read fast enough.
+    """
+    def __init__(self, authors, loop, size):
+        self.authors = frozenset(authors)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=size)
+        self.overflowed = False
+
+    def offer(self, event):
+        """
+        Queue an event, or flag the subscription when its queue is full.
+
+        Runs in the subscription's event loop.
+        """
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            # Wake the reader so it notices the overflow right away.
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class Hub:
+    """
+    In-process publish/subscribe hub routing new posts to live connections.
+
+    Publishers are the model signals, running in any thread; subscribers are
+    coroutines, each waiting on its own asyncio queue. Only the connections
+    of the current process are reached: a client served by another worker
+    catches up from the database when it reconnects (see ``stream``).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_author = {}
+
+    def subscribe(self, authors, size=None):
+        subscription = Subscription(
+            authors,
+            asyncio.get_running_loop(),
+            size or _setting("LIVE_QUEUE_SIZE", DEFAULT_QUEUE_SIZE),
+        )
+        with self._lock:
+            for author in subscription.authors:
+                self._by_author.setdefault(author, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for author in subscription.authors:
+                subscribers = self._by_author.get(author)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_author[author]
+
+    def has_subscribers(self, author):
+        return author in self._by_author
+
+    def publish(self, author, event):
+        """
+        Hand an event to every connection following its author.
+
+        Never blocks: the event is queued in each subscriber's loop, full
+        queues being flagged instead of waited on.
+        """
+        with self._lock:
+            subscribers = list(self._by_author.get(author, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # The loop of the connection is closed.
+                self.unsubscribe(subscription)
+
+
+hub = Hub()
+
+
+def _event(post, event_id):
+    return {"id": event_id, "type": post["type"].lower(), "data": post}
+
+
+def publish_post(author_id, content_type, pk, time_created):
+    """
+    Publish a new ticket or review to the live connections of this process.
+
+    Called once the post is committed. The post is only serialized (one
+    query) when a connection follows its author.
+    """
+    if not hub.has_subscribers(author_id):
+        return
+    row = {"post_id": pk, "time_created": time_created, "content_type": content_type}
+    posts = serialize([row])
+    if posts:
+        hub.publish(author_id, _event(posts[0], encode_cursor(time_created, content_type, pk)))
+
+
+def _catch_up(authors, event_id, limit):
+    """
+    Return the events of the authors' posts posted after an event id.
+
+    The posts are read from the tickets and reviews rather than from the
+    owner's FeedEntry rows, which are written by a job once the posts are
+    committed: a post not yet fanned out is not missed. The second value
+    tells whether more than ``limit`` events were missed.
+    """
+    rows = list(timeline(authors, decode_cursor(event_id), older=False)[:limit + 1])
+    missed = len(rows) > limit
+    rows = rows[:limit]
+    events = [
+        _event(post, encode_cursor(row["time_created"], row["content_type"], row["post_id"]))
+        for row, post in zip(rows, serialize(rows))
+    ]
+    return events, missed
+
+
+def _head(authors):
+    """
+    Return the event id of the newest post of the authors, or None.
+    """
+    row = timeline(authors).first()
+    if row is None:
+        return None
+    return encode_cursor(row["time_created"], row["content_type"], row["post_id"])
+
+
+def format_event(event):
+    """
+    Format an event as a Server-Sent Events message.
+    """
+    lines = []
+    if event.get("id"):
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    data = json.dumps(event.get("data", {}), cls=DjangoJSONEncoder)
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream(authors, last_event_id=None):
+    """
+    Yield the Server-Sent Events messages of a live feed connection.
+
+    The connection is subscribed before the missed events (after
+    ``last_event_id``) are read from the database, and live events already
+    sent by the catch-up are skipped, so nothing is lost or repeated. A new
+    connection starts with the id of the timeline's newest post, so that it
+    can resume even if it is closed before receiving any event. A
+    comment line is sent when nothing happened for LIVE_HEARTBEAT seconds.
+    The stream ends (and the browser reconnects with its Last-Event-ID)
+    after LIVE_MAX_AGE seconds, or when the client is too slow to keep up
+    with its queue.
+    """
+    heartbeat = _setting("LIVE_HEARTBEAT", DEFAULT_HEARTBEAT)
+    deadline = time.monotonic() + _setting("LIVE_MAX_AGE", DEFAULT_MAX_AGE)
+    subscription = hub.subscribe(authors)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        last = None
+        if last_event_id:
+            events, missed = await sync_to_async(_catch_up)(
+                authors, last_event_id, _setting("LIVE_CATCH_UP", DEFAULT_CATCH_UP)
+            )
+            if missed:
+                yield format_event({"type": "reset"})
+                return
+            for event in events:
+                yield format_event(event)
+            last = _position(events[-1]["id"]) if events else _position(last_event_id)
+        else:
+            head = await sync_to_async(_head)(authors)
+            if head:
+                yield f"id: {head}\n\n"
+                last = _position(head)
+
+        while time.monotonic() < deadline:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if subscription.overflowed:
+                yield format_event({"type": "overflow"})
+                return
+            if last is not None and _position(event["id"]) <= last:
+                continue
+            yield format_event(event)
+    finally:
+        hub.unsubscribe(subscription)
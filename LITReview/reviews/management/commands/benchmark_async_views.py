@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import AsyncRequestFactory
+from django.test.utils import setup_test_environment, teardown_test_environment
+from core.testing import isolated_cache
+from reviews import benchmarks
+from reviews.async_views import AsyncFeedsView, AsyncPostsView, AsyncSubscribeView
+from reviews.views import FeedsView, PostsView, SubscribeView
+
+SCENARIOS = {
+    "feeds": ("/reviews/feeds", FeedsView, AsyncFeedsView),
+    "posts": ("/reviews/posts", PostsView, AsyncPostsView),
+    "subscribe": ("/reviews/subscribe/", SubscribeView, AsyncSubscribeView),
+}
+
+
+def _rendered(view):
+    """
+    Wrap a view so that a TemplateResponse is rendered, as the handler does.
+    """
+    def wrapper(request):
+        response = view(request)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+    return wrapper
+
+
+async def _load(handler, make_request, requests, concurrency):
+    """
+    Send ``requests`` requests through ``concurrency`` concurrent clients.
+
+    Returns the wall-clock duration and the per-request latencies, in
+    seconds.
+    """
+    remaining = iter(range(requests))
+    latencies = []
+
+    async def client():
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await handler(make_request())
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"Unexpected status {response.status_code}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies
+
+
+class Command(BaseCommand):
+    """
+    Compare the throughput of the sync and async feeds, posts and subscribe
+    views under concurrent load.
+
+    The views are called the way the ASGI handler calls them: async views
+    are awaited in the event loop, sync views run through sync_to_async in
+    the thread-sensitive executor. Middleware is left out so that only the
+    views are compared. The dataset is seeded in a throwaway test database,
+    with a cache of its own (see core.testing).
+    """
+    help = "Report requests per second and latency of the sync and async views."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Number of users seeded.")
+        parser.add_argument("--follows", type=float, default=50)
+        parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+        parser.add_argument(
+            "--concurrency", type=int, nargs="+", default=[1, 10, 50],
+            help="Numbers of concurrent clients.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with isolated_cache():
+                self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, options):
+        size = options["users"]
+        benchmarks.seed(
+            users=size,
+            follows=options["follows"],
+            tickets=size * 10,
+            reviews=size * 5,
+            seed=options["seed"],
+        )
+        viewer = User.objects.annotate(n=Count("following")).order_by("-n").first()
+        factory = AsyncRequestFactory()
+        self.stdout.write(f"{size} users, viewer {viewer.username} follows {viewer.n} users")
+        self.stdout.write(
+            f"{'scenario':<12}{'clients':>8}{'sync req/s':>12}{'async req/s':>13}"
+            f"{'sync p95 ms':>13}{'async p95 ms':>14}"
+        )
+        for name, (path, sync_view, async_view) in SCENARIOS.items():
+
+            def make_request():
+                request = factory.get(path)
+                request.user = viewer
+                return request
+
+            handlers = {
+                "sync": sync_to_async(_rendered(sync_view.as_view()), thread_sensitive=True),
+                "async": async_view.as_view(),
+            }
+            for concurrency in options["concurrency"]:
+                results = {}
+                for kind, handler in handlers.items():
+                    asyncio.run(_load(handler, make_request, concurrency, concurrency))
+                    duration, latencies = asyncio.run(
+                        _load(handler, make_request, options["requests"], concurrency)
+                    )
+                    results[kind] = (
+                        options["requests"] / duration,
+                        benchmarks.percentile(latencies, 95) * 1000,
+                    )
+                self.stdout.write(
+                    f"{name:<12}{concurrency:>8}{results['sync'][0]:>12.1f}"
+                    f"{results['async'][0]:>13.1f}{results['sync'][1]:>13.2f}"
+                    f"{results['async'][1]:>14.2f}"
+                )
@@ -0,0 +1,121 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from core.testing import isolated_cache
+from reviews import benchmarks
+from reviews.models import Ticket
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the feed, posts, subscribe and create views on synthetic datasets.
+
+    Every dataset is seeded in a throwaway test database and the views are
+    called in-process through the test client, with a cache of their own
+    (see core.testing). The rate limits are turned off, so that the create
+    scenarios time the writes rather than 429s.
+    """
+    help = "Report p50/p95/p99 latency, query counts and peak memory of the main views."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[100, 1000], help="Numbers of users seeded."
+        )
+        parser.add_argument("--follows", type=float, default=50)
+        parser.add_argument("--tickets-per-user", type=float, default=10)
+        parser.add_argument("--reviews-per-user", type=float, default=5)
+        parser.add_argument("--repeat", type=int, default=20, help="Requests per scenario.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--label", default=None, help="Name of the run, e.g. the branch.")
+        parser.add_argument("--output", default=None, help="Write the results as JSON here.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with isolated_cache(), override_settings(RATE_LIMIT_ENABLED=False):
+                datasets = [self.run_dataset(size, options) for size in options["sizes"]]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        results = {
+            "label": options["label"],
+            "revision": _git_revision(),
+            "created": datetime.now(timezone.utc).isoformat(),
+            "repeat": options["repeat"],
+            "datasets": datasets,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run_dataset(self, size, options):
+        benchmarks.clear()
+        benchmarks.seed(
+            users=size,
+            follows=options["follows"],
+            tickets=int(size * options["tickets_per_user"]),
+            reviews=int(size * options["reviews_per_user"]),
+            seed=options["seed"],
+        )
+        # The heaviest reader: the user following the largest number of users.
+        viewer = User.objects.annotate(n=Count("following")).order_by("-n").first()
+        client = Client()
+        client.force_login(viewer)
+        repeat = options["repeat"]
+        open_tickets = iter(
+            Ticket.objects.filter(review__isnull=True).values_list("id", flat=True)[:repeat + 2]
+        )
+        post = {"title": "Benchmark", "description": "d", "headline": "h", "rating": "3", "body": "b"}
+        scenarios = {
+            "feeds": lambda: client.get("/reviews/feeds"),
+            "feeds_page_20": lambda: client.get("/reviews/feeds", {"page": 20}),
+            "posts": lambda: client.get("/reviews/posts"),
+            "subscribe": lambda: client.get("/reviews/subscribe/"),
+            "ticket_create": lambda: client.post("/reviews/add-ticket/", post),
+            "review_full_create": lambda: client.post("/reviews/add-review-full/", post),
+            "review_response_create": lambda: client.post(
+                f"/reviews/add-review-response/{next(open_tickets)}/", post
+            ),
+        }
+
+        self.stdout.write(
+            f"\n{size} users, viewer {viewer.username} follows {viewer.n} users"
+        )
+        self.stdout.write(
+            f"{'scenario':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KB':>10}"
+        )
+        stats = {}
+        for name, call in scenarios.items():
+            call()  # warm-up
+            stats[name] = result = benchmarks.measure(call, repeat)
+            self.stdout.write(
+                f"{name:<24}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+                f"{result['queries']:>9}{result['peak_kb']:>10}"
+            )
+        return {
+            "users": size,
+            "follows": options["follows"],
+            "tickets": int(size * options["tickets_per_user"]),
+            "reviews": int(size * options["reviews_per_user"]),
+            "viewer_follows": viewer.n,
+            "scenarios": stats,
+        }
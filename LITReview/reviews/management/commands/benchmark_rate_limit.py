@@ -0,0 +1,71 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.views import View
+from core import ratelimit
+from reviews import benchmarks
+
+SCOPE = "benchmark"
+
+
+class PlainView(View):
+    def post(self, request):
+        return HttpResponse()
+
+
+class LimitedView(ratelimit.RateLimitMixin, PlainView):
+    rate_limit_scope = SCOPE
+
+
+class Command(BaseCommand):
+    """
+    Measure the overhead of the rate limiter on a request.
+
+    An empty view is called with and without RateLimitMixin, first with
+    buckets large enough for every request to be allowed (the common case),
+    then with buckets already empty (every request refused). The user and IP
+    buckets are both used, in the cache configured by RATE_LIMIT_CACHE.
+    """
+    help = "Report the latency the rate limiter adds to a request."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=10000, help="Requests per case.")
+
+    def handle(self, *args, **options):
+        requests = options["requests"]
+        factory = RequestFactory()
+        user = User.objects.order_by("pk").first() or AnonymousUser()
+        self.stdout.write(f"{'case':<16}{'mean µs':>10}{'p95 µs':>10}{'overhead µs':>13}")
+        baseline = self.run(PlainView.as_view(), factory, user, requests)
+        self.report("no limiter", baseline)
+        for case, limits in (
+            ("allowed", {"user": (requests * 10, 1), "ip": (requests * 10, 1)}),
+            ("refused", {"user": (1, 3600), "ip": (1, 3600)}),
+        ):
+            with override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={SCOPE: limits}):
+                ratelimit.limiter_cache().delete_many(
+                    [f"{ratelimit.KEY_PREFIX}:{SCOPE}:{kind}:{client}"
+                     for kind, client in (("ip", "127.0.0.1"), ("user", user.pk))]
+                )
+                latencies = self.run(LimitedView.as_view(), factory, user, requests)
+            self.report(case, latencies, baseline)
+
+    def run(self, view, factory, user, requests):
+        latencies = []
+        for _ in range(requests):
+            request = factory.post("/")
+            request.user = user
+            started = time.perf_counter()
+            view(request)
+            latencies.append((time.perf_counter() - started) * 1_000_000)
+        return latencies
+
+    def report(self, case, latencies, baseline=None):
+        mean = sum(latencies) / len(latencies)
+        overhead = mean - sum(baseline) / len(baseline) if baseline else 0
+        self.stdout.write(
+            f"{case:<16}{mean:>10.1f}{benchmarks.percentile(latencies, 95):>10.1f}{overhead:>13.1f}"
+        )
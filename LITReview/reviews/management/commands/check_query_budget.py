@@ -0,0 +1,44 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from reviews.querybudget import FEED_QUERY_BUDGET, QueryBudgetExceeded, assert_query_budget
+from reviews.views import FeedsView, PostsView
+
+
+class Command(BaseCommand):
+    """
+    Check that FeedsView and PostsView render within a fixed number of queries.
+
+    The test suite asserts the budget on fixture data (QueryBudgetTests);
+    this command checks it against the data of an existing user.
+    """
+    help = "Fail if the feed or posts pages exceed their query budget, whatever the page size."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User whose feed and posts are rendered.")
+        parser.add_argument("--budget", type=int, default=FEED_QUERY_BUDGET)
+        parser.add_argument(
+            "--page-sizes", type=int, nargs="+", default=[5, 20, 100],
+            help="Page sizes the budget must hold for.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        for view_class, path in ((FeedsView, "/reviews/feeds"), (PostsView, "/reviews/posts")):
+            for per_page in options["page_sizes"]:
+                view = view_class.as_view(per_page=per_page)
+                for params in ({}, {"page": "2"}):
+                    try:
+                        _, queries = assert_query_budget(
+                            view, user, options["budget"], path, **params
+                        )
+                    except QueryBudgetExceeded as error:
+                        raise CommandError(str(error))
+                    self.stdout.write(
+                        f"{view_class.__name__} per_page={per_page} {params or ''}: "
+                        f"{len(queries)} queries"
+                    )
+        self.stdout.write(self.style.SUCCESS("Query budget respected."))
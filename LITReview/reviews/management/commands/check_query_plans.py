@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from reviews.queryplan import explain, hot_queries, plan_problems
+
+
+class Command(BaseCommand):
+    """
+    Check that the hot feed and subscription queries are served by indexes.
+    """
+    help = "Fail if a hot query falls back to a full table scan or a temporary B-tree sort."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", nargs="?", help="User the queries are built for.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Query plans can only be checked on SQLite.")
+        user = User.objects.filter(username=options["username"]).first() if options["username"] \
+            else User.objects.order_by("pk").first()
+        if user is None:
+            raise CommandError("No user to build the queries for.")
+
+        failures = []
+        for name, queryset in hot_queries(user).items():
+            plan = explain(queryset)
+            problems = plan_problems(plan)
+            status = self.style.ERROR("FAIL") if problems else self.style.SUCCESS("ok")
+            self.stdout.write(f"{status} {name}")
+            for detail in plan:
+                self.stdout.write(f"    {detail}")
+            if problems:
+                failures.append(name)
+        if failures:
+            raise CommandError(f"Unindexed query plans: {', '.join(failures)}")
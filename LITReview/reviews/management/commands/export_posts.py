@@ -0,0 +1,50 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from reviews import exports
+
+
+class Command(BaseCommand):
+    """
+    Dump all the tickets and reviews of a user, for the user or compliance.
+
+    The dump is written as it is read, chunk by chunk (see reviews.exports),
+    so the memory used does not depend on the size of the user's history.
+    """
+    help = "Export the tickets and reviews of a user as CSV or JSONL, optionally zipped with images."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--format", choices=sorted(exports.FORMATS), default="csv")
+        parser.add_argument("--images", action="store_true", help="Write a zip archive with the images.")
+        parser.add_argument("--output", "-o", help="Output file (defaults to the standard output).")
+        parser.add_argument("--chunk-size", type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['username']}.")
+        if options["images"]:
+            if not options["output"]:
+                raise CommandError("--images needs an --output file.")
+            content = exports.export_zip(user, options["format"], options["chunk_size"])
+        else:
+            content = (
+                line.encode()
+                for line in exports.export(user, options["format"], options["chunk_size"])
+            )
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            written = 0
+            for data in content:
+                output.write(data)
+                written += len(data)
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"{written} bytes written to {options['output']}."))
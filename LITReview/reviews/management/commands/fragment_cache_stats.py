@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from reviews import fragments
+
+
+class Command(BaseCommand):
+    """
+    Display the hit/miss counters of the feed fragment cache.
+    """
+    help = "Show (and optionally reset) the feed fragment cache hit/miss counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reset the counters.")
+
+    def handle(self, *args, **options):
+        counters = fragments.stats()
+        self.stdout.write(
+            f"hits: {counters['hits']}  misses: {counters['misses']}  "
+            f"hit ratio: {counters['hit_ratio']:.1%}"
+        )
+        if options["reset"]:
+            fragments.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,38 @@
+import sys
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from reviews.follows import bulk_follow, bulk_unfollow, parse_usernames
+
+
+class Command(BaseCommand):
+    """
+    Subscribe (or unsubscribe) a user to/from a list of users.
+    """
+    help = "Follow or unfollow the usernames of a list or CSV file (first column), in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="The user whose subscriptions change.")
+        parser.add_argument("file", help="List or CSV of usernames, '-' for stdin.")
+        parser.add_argument("--unfollow", action="store_true", help="Unsubscribe instead.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        if options["file"] == "-":
+            text = sys.stdin.read()
+        else:
+            with open(options["file"], encoding="utf-8-sig") as source:
+                text = source.read()
+        usernames = parse_usernames(text)
+
+        apply = bulk_unfollow if options["unfollow"] else bulk_follow
+        results = apply(user, usernames)
+        for username, result in results.items():
+            self.stdout.write(f"{username}: {result}")
+        summary = ", ".join(f"{count} {result}" for result, count in Counter(results.values()).items())
+        self.stdout.write(self.style.SUCCESS(summary or "No usernames given."))
@@ -0,0 +1,110 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from reviews import imports
+
+
+class Command(BaseCommand):
+    """
+    Import tickets and reviews (and their images) from a JSON Lines file.
+
+    See reviews.imports for the records. Each batch is inserted in its own
+    transaction, after which a checkpoint (the offset of the next line) is
+    saved: an interrupted import resumes from there when run again. Invalid
+    records are reported and skipped.
+    """
+    help = "Bulk import tickets, reviews and images from a JSONL file, resuming from checkpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="The JSONL file to import.")
+        parser.add_argument(
+            "--images-dir", help="Directory of the image paths (defaults to the file's directory)."
+        )
+        parser.add_argument("--batch-size", type=int, default=imports.BATCH_SIZE)
+        parser.add_argument("--workers", type=int, default=None, help="Image processes.")
+        parser.add_argument("--checkpoint", help="Checkpoint file (defaults to <file>.checkpoint).")
+        parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint.")
+        parser.add_argument("--rejects", help="Append the rejected records to this JSONL file.")
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options["file"])
+        if not os.path.isfile(source):
+            raise CommandError(f"No file {source}.")
+        images_dir = options["images_dir"] or os.path.dirname(source)
+        self.checkpoint_path = options["checkpoint"] or f"{source}.checkpoint"
+        checkpoint = {"source": source, "offset": 0, "line": 0, "tickets": 0, "reviews": 0, "rejected": 0}
+        if os.path.exists(self.checkpoint_path) and not options["restart"]:
+            with open(self.checkpoint_path, encoding="utf-8") as saved:
+                checkpoint = json.load(saved)
+            if checkpoint["source"] != source:
+                raise CommandError(f"{self.checkpoint_path} is the checkpoint of {checkpoint['source']}.")
+            self.stdout.write(f"Resuming after line {checkpoint['line']}.")
+        self.rejects = open(options["rejects"], "a", encoding="utf-8") if options["rejects"] else None
+
+        # The workers only touch the files and the storage: they are forked
+        # right away, before any connection is opened, not to share one.
+        connections.close_all()
+        try:
+            with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+                executor.submit(os.getpid).result()
+                self.run(source, images_dir, checkpoint, options["batch_size"], executor)
+        finally:
+            if self.rejects:
+                self.rejects.close()
+
+    def run(self, source, images_dir, checkpoint, batch_size, executor):
+        started = time.perf_counter()
+        rows = 0
+        lines = []
+        records = imports.read_records(source, checkpoint["offset"], checkpoint["line"])
+        for line, offset, raw in records:
+            lines.append((line, raw))
+            if len(lines) >= batch_size:
+                rows += self.import_batch(lines, images_dir, checkpoint, line, offset, executor)
+                lines = []
+                self.progress(checkpoint, rows, started)
+        if lines:
+            rows += self.import_batch(lines, images_dir, checkpoint, line, offset, executor)
+            self.progress(checkpoint, rows, started)
+        self.stdout.write(self.style.SUCCESS(
+            f"{checkpoint['tickets']} tickets and {checkpoint['reviews']} reviews imported, "
+            f"{checkpoint['rejected']} records rejected."
+        ))
+
+    def import_batch(self, lines, images_dir, checkpoint, line, offset, executor):
+        batch = imports.parse(lines, images_dir)
+        imports.process_images(batch, executor)
+        tickets, reviews = imports.insert(batch)
+        for rejected_line, errors in sorted(batch.rejected, key=lambda rejected: rejected[0]):
+            if self.rejects:
+                self.rejects.write(json.dumps({"line": rejected_line, "errors": errors}) + "\n")
+            else:
+                self.stderr.write(f"line {rejected_line}: {errors}")
+        checkpoint.update(
+            offset=offset,
+            line=line,
+            tickets=checkpoint["tickets"] + tickets,
+            reviews=checkpoint["reviews"] + reviews,
+            rejected=checkpoint["rejected"] + len(batch.rejected),
+        )
+        self.save_checkpoint(checkpoint)
+        return len(lines)
+
+    def save_checkpoint(self, checkpoint):
+        temporary = f"{self.checkpoint_path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as saved:
+            json.dump(checkpoint, saved)
+        os.replace(temporary, self.checkpoint_path)
+
+    def progress(self, checkpoint, rows, started):
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(
+            f"line {checkpoint['line']}: {checkpoint['tickets']} tickets, "
+            f"{checkpoint['reviews']} reviews, {checkpoint['rejected']} rejected, "
+            f"{rate:.0f} rows/s"
+        )
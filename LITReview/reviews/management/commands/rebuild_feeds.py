@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from reviews import fanout
+
+
+class Command(BaseCommand):
+    """
+    Backfill or rebuild the materialized timelines (FeedEntry) of users.
+    """
+    help = "Rebuild the materialized feed timelines from tickets, reviews and follows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "usernames", nargs="*", help="Only rebuild the timelines of these users."
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+        owner_ids = users.values_list("id", flat=True).iterator()
+        written = fanout.rebuild(owner_ids)
+        self.stdout.write(self.style.SUCCESS(f"{written} feed entries written."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from reviews import search
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the full-text search index (FTS5) from the tickets and reviews.
+    """
+    help = "Re-index every ticket and review in the full-text search table."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("The search index does not exist: run the migrations on SQLite.")
+        indexed = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{indexed} posts indexed."))
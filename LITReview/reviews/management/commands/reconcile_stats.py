@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from reviews import stats
+
+
+class Command(BaseCommand):
+    """
+    Recompute the per-user counters (UserStats) and repair any drift.
+    """
+    help = "Recompute the user stats from tickets, reviews and follows, fixing drifted rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=stats.CHUNK_SIZE,
+            help="Number of users recomputed per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        checked, repaired = stats.reconcile(chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{checked} users checked, {repaired} stats rows created or repaired.")
+        )
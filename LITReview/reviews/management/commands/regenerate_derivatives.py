@@ -0,0 +1,52 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from reviews.images import mark_ready, render_derivatives
+from reviews.models import Ticket
+
+
+class Command(BaseCommand):
+    """
+    Generate the thumbnail, medium and WebP variants of existing ticket images.
+
+    The cached fragments of the tickets are invalidated through the default
+    cache, which must be shared with the web processes (see
+    reviews.fragments): with a local-memory cache, they would keep serving
+    the original images until the fragments expire.
+    """
+    help = "Regenerate image derivatives of tickets in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Number of processes.")
+        parser.add_argument(
+            "--missing", action="store_true",
+            help="Only process tickets whose derivatives are not generated yet.",
+        )
+
+    def handle(self, *args, **options):
+        tickets = Ticket.objects.exclude(image="").exclude(image__isnull=True)
+        if options["missing"]:
+            tickets = tickets.filter(has_derivatives=False)
+        jobs = {}
+        for pk, name in tickets.values_list("pk", "image"):
+            jobs.setdefault(name, []).append(pk)
+        # Worker processes only touch the storage; close the connections so
+        # that they are not shared with the forked children.
+        connections.close_all()
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {executor.submit(render_derivatives, name): name for name in jobs}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                else:
+                    for pk in jobs[name]:
+                        mark_ready(pk, name)
+                    done += 1
+        self.stdout.write(self.style.SUCCESS(f"{done} images processed, {failed} failed."))
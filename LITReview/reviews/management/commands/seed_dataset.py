@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reviews import benchmarks
+
+
+class Command(BaseCommand):
+    """
+    Seed a synthetic dataset of users, follows, tickets and reviews.
+    """
+    help = "Insert a synthetic dataset (bulk inserts, power-law follower distribution)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--follows", type=float, default=50, help="Average number of users followed."
+        )
+        parser.add_argument("--tickets", type=int, default=10000)
+        parser.add_argument("--reviews", type=int, default=5000)
+        parser.add_argument(
+            "--alpha", type=float, default=1.2, help="Exponent of the follower power law."
+        )
+        parser.add_argument("--days", type=int, default=365, help="Time span of the posts.")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+        parser.add_argument("--prefix", default=benchmarks.SEED_PREFIX, help="Username prefix.")
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete previously seeded users first."
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["clear"]:
+                benchmarks.clear(options["prefix"])
+            user_ids = benchmarks.seed(
+                users=options["users"],
+                follows=options["follows"],
+                tickets=options["tickets"],
+                reviews=options["reviews"],
+                alpha=options["alpha"],
+                days=options["days"],
+                seed=options["seed"],
+                prefix=options["prefix"],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(user_ids)} users seeded (password: {benchmarks.SEED_PASSWORD})."
+        ))
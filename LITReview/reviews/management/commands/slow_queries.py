@@ -0,0 +1,93 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core import slowqueries
+from reviews import benchmarks
+
+SORTS = {
+    "total": lambda group: sum(group["durations"]),
+    "count": lambda group: len(group["durations"]),
+    "mean": lambda group: sum(group["durations"]) / len(group["durations"]),
+    "max": lambda group: max(group["durations"]),
+}
+
+
+class Command(BaseCommand):
+    """
+    Summarise the slow-query log (see core.slowqueries) per fingerprint.
+
+    Queries differing only by their values share a fingerprint, so a query
+    made slow by a change stands out as one line, with the views and code
+    running it and the plan of its slowest occurrence.
+    """
+    help = "Summarise the slow-query log by normalized query fingerprint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", help="Log file (defaults to SLOW_QUERY_LOG).")
+        parser.add_argument("--hours", type=float, help="Only the queries of the last hours.")
+        parser.add_argument("--view", help="Only the queries run by this view.")
+        parser.add_argument("--sort", choices=sorted(SORTS), default="total")
+        parser.add_argument("--limit", type=int, default=10, help="Number of fingerprints shown.")
+        parser.add_argument("--plans", action="store_true", help="Show the query plans.")
+
+    def handle(self, *args, **options):
+        files = slowqueries.log_files(options["log"])
+        if not files:
+            raise CommandError(f"No slow-query log at {options['log'] or slowqueries.log_path()}.")
+        since = None
+        if options["hours"]:
+            since = timezone.now() - datetime.timedelta(hours=options["hours"])
+        groups = {}
+        for entry in self.entries(files):
+            if since is not None and parse_datetime(entry["time"]) < since:
+                continue
+            if options["view"] and entry.get("view") != options["view"]:
+                continue
+            group = groups.setdefault(
+                entry["fingerprint"],
+                {"normalized": entry["normalized"], "durations": [], "views": {}, "origins": {}},
+            )
+            group["durations"].append(entry["duration_ms"])
+            view = entry.get("view") or "-"
+            group["views"][view] = group["views"].get(view, 0) + 1
+            origin = next((frame for frame in entry["stack"] if not frame.startswith("template")), "-")
+            group["origins"][origin] = group["origins"].get(origin, 0) + 1
+            if entry["duration_ms"] >= max(group["durations"]):
+                group["slowest"] = entry
+        if not groups:
+            self.stdout.write("No slow query.")
+            return
+        ranked = sorted(groups.items(), key=lambda item: SORTS[options["sort"]](item[1]), reverse=True)
+        total = sum(len(group["durations"]) for group in groups.values())
+        self.stdout.write(f"{total} slow queries, {len(groups)} fingerprints")
+        for fingerprint, group in ranked[:options["limit"]]:
+            self.write_group(fingerprint, group, options["plans"])
+
+    def entries(self, files):
+        for file in files:
+            with open(file, encoding="utf-8") as lines:
+                for number, line in enumerate(lines, 1):
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        self.stderr.write(f"{file}:{number}: not a JSON entry, skipped.")
+
+    def write_group(self, fingerprint, group, plans):
+        durations = group["durations"]
+        self.stdout.write("")
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{fingerprint}  {len(durations)} x  total {sum(durations):.1f} ms  "
+            f"mean {sum(durations) / len(durations):.1f} ms  "
+            f"p95 {benchmarks.percentile(durations, 95):.1f} ms  max {max(durations):.1f} ms"
+        ))
+        self.stdout.write(f"  {group['normalized'][:300]}")
+        for label, counts in (("views", group["views"]), ("from", group["origins"])):
+            top = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:3]
+            self.stdout.write(f"  {label}: " + ", ".join(f"{name} ({count})" for name, count in top))
+        if plans and group["slowest"]["plan"]:
+            self.stdout.write("  plan of the slowest:")
+            for row in group["slowest"]["plan"]:
+                self.stdout.write(f"    {row}")
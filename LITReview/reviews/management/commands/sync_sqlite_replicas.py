@@ -0,0 +1,41 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    """
+    Copy the primary SQLite database onto the local replica files.
+
+    Stands in for replication when the replicas are local SQLite files
+    (LITREVIEW_SQLITE_REPLICAS), using the SQLite online backup API so the
+    primary can keep serving writes during the copy.
+    """
+    help = "Refresh the local SQLite replica files from the primary database."
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES["default"]
+        if primary["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("The primary database is not SQLite.")
+        aliases = [
+            alias
+            for alias in settings.DATABASE_REPLICAS
+            if settings.DATABASES[alias]["ENGINE"] == "django.db.backends.sqlite3"
+        ]
+        if not aliases:
+            raise CommandError("No SQLite replica configured (set LITREVIEW_SQLITE_REPLICAS).")
+        source = sqlite3.connect(str(primary["NAME"]))
+        try:
+            for alias in aliases:
+                connections[alias].close()
+                target = sqlite3.connect(str(settings.DATABASES[alias]["NAME"]))
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f"{alias} refreshed.")
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS(f"{len(aliases)} replicas refreshed."))
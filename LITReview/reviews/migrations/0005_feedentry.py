@@ -0,0 +1,150 @@
+# Generated by Django 4.2.3 on 2026-10-18 16:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_feed_entries(apps, schema_editor):
+    User = apps.get_model("auth", "User")
+    UserFollow = apps.get_model("reviews", "UserFollow")
+    Ticket = apps.get_model("reviews", "Ticket")
+    Review = apps.get_model("reviews", "Review")
+    FeedEntry = apps.get_model("reviews", "FeedEntry")
+    for owner_id in User.objects.values_list("id", flat=True).iterator():
+        authors = list(
+            UserFollow.objects.filter(user_id=owner_id).values_list(
+                "followed_user_id", flat=True
+            )
+        )
+        authors.append(owner_id)
+        entries = [
+            FeedEntry(
+                owner_id=owner_id,
+                author_id=ticket.user_id,
+                content_type="TICKET",
+                ticket_id=ticket.id,
+                time_created=ticket.time_created,
+            )
+            for ticket in Ticket.objects.filter(user_id__in=authors).iterator()
+        ] + [
+            FeedEntry(
+                owner_id=owner_id,
+                author_id=review.user_id,
+                content_type="REVIEW",
+                review_id=review.id,
+                time_created=review.time_created,
+            )
+            for review in Review.objects.filter(user_id__in=authors).iterator()
+        ]
+        FeedEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("reviews", "0004_auto_20230727_1651"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="review",
+            name="body",
+            field=models.TextField(blank=True, max_length=8192, verbose_name="Review"),
+        ),
+        migrations.AlterField(
+            model_name="review",
+            name="headline",
+            field=models.CharField(max_length=128, verbose_name="Comment"),
+        ),
+        migrations.AlterField(
+            model_name="ticket",
+            name="title",
+            field=models.CharField(max_length=128, verbose_name="Title"),
+        ),
+        migrations.CreateModel(
+            name="FeedEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "content_type",
+                    models.CharField(
+                        choices=[("TICKET", "Ticket"), ("REVIEW", "Review")],
+                        max_length=6,
+                    ),
+                ),
+                ("time_created", models.DateTimeField()),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "review",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_entries",
+                        to="reviews.review",
+                    ),
+                ),
+                (
+                    "ticket",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_entries",
+                        to="reviews.ticket",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Feed Entry",
+                "verbose_name_plural": "Feed Entries",
+                "indexes": [
+                    models.Index(
+                        fields=["owner", "-time_created"],
+                        name="reviews_feed_owner_time",
+                    ),
+                    models.Index(
+                        fields=["owner", "author"], name="reviews_feed_owner_author"
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="feedentry",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "ticket"), name="reviews_feed_unique_ticket"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="feedentry",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "review"), name="reviews_feed_unique_review"
+            ),
+        ),
+        migrations.RunPython(backfill_feed_entries, migrations.RunPython.noop),
+    ]
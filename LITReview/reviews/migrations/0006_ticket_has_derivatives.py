@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-18 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reviews", "0005_feedentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ticket",
+            name="has_derivatives",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
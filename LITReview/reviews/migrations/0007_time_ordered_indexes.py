@@ -0,0 +1,47 @@
+# Generated by Django 4.2.3 on 2026-10-18 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reviews", "0006_ticket_has_derivatives"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="feedentry",
+            name="reviews_feed_owner_time",
+        ),
+        migrations.AddIndex(
+            model_name="feedentry",
+            index=models.Index(
+                fields=[
+                    "owner",
+                    "-time_created",
+                    "-content_type",
+                    "-ticket",
+                    "-review",
+                ],
+                name="reviews_feed_owner_time",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["user", "time_created"], name="reviews_review_user_time"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                fields=["user", "time_created"], name="reviews_ticket_user_time"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userfollow",
+            index=models.Index(
+                fields=["followed_user", "user"], name="reviews_follow_followed_user"
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.3 on 2026-10-18 17:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import unicodedata
+
+
+def backfill_folded_usernames(apps, schema_editor):
+    User = apps.get_model("auth", "User")
+    FoldedUsername = apps.get_model("reviews", "FoldedUsername")
+    FoldedUsername.objects.bulk_create(
+        (
+            FoldedUsername(
+                user_id=user_id, folded=unicodedata.normalize("NFKC", username).casefold()
+            )
+            for user_id, username in User.objects.values_list("id", "username").iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("reviews", "0007_time_ordered_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FoldedUsername",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="folded_username",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("folded", models.CharField(db_index=True, max_length=450)),
+            ],
+        ),
+        migrations.RunPython(backfill_folded_usernames, migrations.RunPython.noop),
+    ]
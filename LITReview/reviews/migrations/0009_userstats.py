@@ -0,0 +1,107 @@
+# Generated by Django 4.2.3 on 2026-10-18 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+CHUNK_SIZE = 1000
+
+
+def _grouped(queryset, field, **aggregates):
+    return {row.pop(field): row for row in queryset.values(field).annotate(**aggregates)}
+
+
+def backfill_user_stats(apps, schema_editor):
+    """
+    Compute the stats of the existing users, a chunk of users at a time,
+    with one grouped aggregate query per table.
+    """
+    User = apps.get_model("auth", "User")
+    UserFollow = apps.get_model("reviews", "UserFollow")
+    Ticket = apps.get_model("reviews", "Ticket")
+    Review = apps.get_model("reviews", "Review")
+    UserStats = apps.get_model("reviews", "UserStats")
+    user_ids = User.objects.order_by("pk").values_list("pk", flat=True)
+    last = 0
+    while True:
+        chunk = list(user_ids.filter(pk__gt=last)[:CHUNK_SIZE])
+        if not chunk:
+            break
+        last = chunk[-1]
+        tickets = _grouped(
+            Ticket.objects.filter(user_id__in=chunk), "user_id",
+            total=models.Count("id", distinct=True),
+            open=models.Count("id", distinct=True, filter=models.Q(review__isnull=True)),
+            latest=models.Max("time_created"),
+        )
+        reviews = _grouped(
+            Review.objects.filter(user_id__in=chunk), "user_id",
+            total=models.Count("id"),
+            rating=models.Sum("rating"),
+            latest=models.Max("time_created"),
+        )
+        followers = _grouped(
+            UserFollow.objects.filter(followed_user_id__in=chunk), "followed_user_id",
+            total=models.Count("id"),
+        )
+        following = _grouped(
+            UserFollow.objects.filter(user_id__in=chunk), "user_id", total=models.Count("id")
+        )
+        empty = {"total": 0, "open": 0, "rating": 0, "latest": None}
+        UserStats.objects.bulk_create(
+            UserStats(
+                user_id=user_id,
+                tickets_count=tickets.get(user_id, empty)["total"],
+                open_tickets_count=tickets.get(user_id, empty)["open"],
+                reviews_count=reviews.get(user_id, empty)["total"],
+                rating_total=reviews.get(user_id, empty)["rating"] or 0,
+                followers_count=followers.get(user_id, empty)["total"],
+                following_count=following.get(user_id, empty)["total"],
+                last_activity=max(
+                    filter(None, (
+                        tickets.get(user_id, empty)["latest"],
+                        reviews.get(user_id, empty)["latest"],
+                    )),
+                    default=None,
+                ),
+            )
+            for user_id in chunk
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("reviews", "0008_foldedusername"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("tickets_count", models.IntegerField(default=0)),
+                ("open_tickets_count", models.IntegerField(default=0)),
+                ("reviews_count", models.IntegerField(default=0)),
+                ("rating_total", models.IntegerField(default=0)),
+                ("followers_count", models.IntegerField(default=0)),
+                ("following_count", models.IntegerField(default=0)),
+                ("last_activity", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "User Stats",
+                "verbose_name_plural": "User Stats",
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,123 @@
+from django.db import migrations
+
+TICKET_ROW = (
+    "INSERT INTO reviews_search (rowid, title, body, user_id, time_created) "
+    "VALUES (2 * new.id, new.title, new.description, new.user_id, new.time_created);"
+)
+REVIEW_ROW = (
+    "INSERT INTO reviews_search (rowid, title, body, user_id, time_created) "
+    "VALUES (2 * new.id + 1, new.headline, new.body, new.user_id, new.time_created);"
+)
+
+
+def has_fts5(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+class SearchIndexSQL(migrations.RunSQL):
+    """
+    RunSQL applied only to the SQLite databases built with FTS5; the others
+    are left without search index (see reviews.search.is_available).
+    """
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if has_fts5(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if has_fts5(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reviews", "0009_userstats"),
+    ]
+
+    operations = [
+        # Full-text index of the tickets and reviews (SQLite FTS5). The rowid
+        # encodes the post, 2 * id for a ticket and 2 * id + 1 for a review,
+        # so that the triggers keeping the index in sync never scan it.
+        SearchIndexSQL(
+            """
+            CREATE VIRTUAL TABLE reviews_search USING fts5(
+                title,
+                body,
+                user_id UNINDEXED,
+                time_created UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            );
+            """,
+            "DROP TABLE reviews_search;",
+        ),
+        SearchIndexSQL(
+            [
+                f"""
+                CREATE TRIGGER reviews_search_ticket_insert
+                AFTER INSERT ON reviews_ticket BEGIN
+                    {TICKET_ROW}
+                END;
+                """,
+                f"""
+                CREATE TRIGGER reviews_search_ticket_update
+                AFTER UPDATE OF title, description, user_id, time_created
+                ON reviews_ticket BEGIN
+                    DELETE FROM reviews_search WHERE rowid = 2 * old.id;
+                    {TICKET_ROW}
+                END;
+                """,
+                """
+                CREATE TRIGGER reviews_search_ticket_delete
+                AFTER DELETE ON reviews_ticket BEGIN
+                    DELETE FROM reviews_search WHERE rowid = 2 * old.id;
+                END;
+                """,
+                f"""
+                CREATE TRIGGER reviews_search_review_insert
+                AFTER INSERT ON reviews_review BEGIN
+                    {REVIEW_ROW}
+                END;
+                """,
+                f"""
+                CREATE TRIGGER reviews_search_review_update
+                AFTER UPDATE OF headline, body, user_id, time_created
+                ON reviews_review BEGIN
+                    DELETE FROM reviews_search WHERE rowid = 2 * old.id + 1;
+                    {REVIEW_ROW}
+                END;
+                """,
+                """
+                CREATE TRIGGER reviews_search_review_delete
+                AFTER DELETE ON reviews_review BEGIN
+                    DELETE FROM reviews_search WHERE rowid = 2 * old.id + 1;
+                END;
+                """,
+            ],
+            [
+                "DROP TRIGGER reviews_search_ticket_insert;",
+                "DROP TRIGGER reviews_search_ticket_update;",
+                "DROP TRIGGER reviews_search_ticket_delete;",
+                "DROP TRIGGER reviews_search_review_insert;",
+                "DROP TRIGGER reviews_search_review_update;",
+                "DROP TRIGGER reviews_search_review_delete;",
+            ],
+        ),
+        SearchIndexSQL(
+            [
+                """
+                INSERT INTO reviews_search (rowid, title, body, user_id, time_created)
+                SELECT 2 * id, title, description, user_id, time_created
+                FROM reviews_ticket;
+                """,
+                """
+                INSERT INTO reviews_search (rowid, title, body, user_id, time_created)
+                SELECT 2 * id + 1, headline, body, user_id, time_created
+                FROM reviews_review;
+                """,
+            ],
+            migrations.RunSQL.noop,
+        ),
+    ]
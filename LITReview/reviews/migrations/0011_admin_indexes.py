@@ -0,0 +1,26 @@
+# Generated by Django 4.2.3 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reviews", "0010_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(fields=["time_created"], name="reviews_review_time"),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["rating", "time_created"], name="reviews_review_rating_time"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(fields=["time_created"], name="reviews_ticket_time"),
+        ),
+    ]
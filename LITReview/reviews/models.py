@@ -1,10 +1,26 @@
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import models, router, transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from .images import derivative_name
 
 
-class UserFollow(models.Model):
+class AtomicSaveMixin:
+    """
+    Model mixin saving a row and running its post_save handlers in one
+    transaction.
+
+    The handlers (see reviews.signals) enqueue jobs: even in autocommit
+    mode, the jobs are committed with the row or not at all.
+    """
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class UserFollow(AtomicSaveMixin, models.Model):
     """
     Model representing a user following another user.
 
@@ -21,12 +37,16 @@ class UserFollow(models.Model):
         verbose_name = "User Follow"
         verbose_name_plural = "User Follows"
         unique_together = ("user", "followed_user")
+        indexes = [
+            # Followers of a user, listed by follower (SubscribeView).
+            models.Index(fields=["followed_user", "user"], name="reviews_follow_followed_user"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} |---> {self.followed_user.username}"
 
 
-class Ticket(models.Model):
+class Ticket(AtomicSaveMixin, models.Model):
     """
     Model representing a ticket.
 
@@ -36,6 +56,7 @@ class Ticket(models.Model):
         user (ForeignKey): The user who created the ticket.
         time_created (DateTimeField): The timestamp when the ticket was created.
         image (ImageField): An image associated with the ticket.
+        has_derivatives (bool): Whether the resized variants of the image exist.
     """
     title = models.CharField(max_length=128, verbose_name="Title")
     description = models.TextField(
@@ -45,20 +66,56 @@ class Ticket(models.Model):
     time_created = models.DateTimeField(default=timezone.now)
     image = models.ImageField(
         blank=True, null=True, upload_to="img/reviews")
+    has_derivatives = models.BooleanField(default=False, editable=False)
 
     @property
     def is_closed(self):
-        return hasattr(self, "review")
+        # Feed querysets annotate has_review to avoid one query per ticket.
+        has_review = getattr(self, "has_review", None)
+        if has_review is None:
+            return hasattr(self, "review")
+        return has_review
+
+    def derivative_url(self, kind):
+        """
+        Return the URL of a derivative of the image, or of the original image
+        while the derivatives are not generated yet.
+        """
+        if not self.image:
+            return ""
+        if not self.has_derivatives:
+            return self.image.url
+        return default_storage.url(derivative_name(self.image.name, kind))
+
+    @property
+    def thumbnail_url(self):
+        return self.derivative_url("thumb")
+
+    @property
+    def webp_url(self):
+        return self.derivative_url("webp") if self.has_derivatives else ""
+
+    @property
+    def image_srcset(self):
+        if not self.image or not self.has_derivatives:
+            return ""
+        return f"{self.derivative_url('thumb')} 150w, {self.derivative_url('medium')} 600w"
 
     class Meta:
         verbose_name = "Ticket"
         verbose_name_plural = "Tickets"
+        indexes = [
+            # Ascending so that a backward scan yields (time_created, id) descending.
+            models.Index(fields=["user", "time_created"], name="reviews_ticket_user_time"),
+            # Admin date hierarchy.
+            models.Index(fields=["time_created"], name="reviews_ticket_time"),
+        ]
 
     def __str__(self):
         return f"Ticket ( {self.title} )"
 
 
-class Review(models.Model):
+class Review(AtomicSaveMixin, models.Model):
     """
     Model representing a review for a ticket.
 
@@ -82,6 +139,135 @@ class Review(models.Model):
     class Meta:
         verbose_name = "Review"
         verbose_name_plural = "Reviews"
+        indexes = [
+            models.Index(fields=["user", "time_created"], name="reviews_review_user_time"),
+            # Admin date hierarchy and rating filter.
+            models.Index(fields=["time_created"], name="reviews_review_time"),
+            models.Index(fields=["rating", "time_created"], name="reviews_review_rating_time"),
+        ]
 
     def __str__(self):
         return f"Review ( {self.headline} )"
+
+
+class FeedEntry(models.Model):
+    """
+    Model representing a post in the materialized timeline of a user.
+
+    Rows are written when a ticket or a review is created (one per follower of
+    its author, plus the author) and when a follow is added; they are removed
+    along with their post (cascade) or when the follow is removed.
+
+    Attributes:
+        owner (ForeignKey): The user whose timeline holds the entry.
+        author (ForeignKey): The user who created the post.
+        content_type (str): Either "TICKET" or "REVIEW".
+        ticket (ForeignKey): The ticket, for ticket entries.
+        review (ForeignKey): The review, for review entries.
+        time_created (DateTimeField): The creation timestamp of the post.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="feed_entries")
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    content_type = models.CharField(
+        max_length=6, choices=[("TICKET", "Ticket"), ("REVIEW", "Review")]
+    )
+    ticket = models.ForeignKey(
+        Ticket, on_delete=models.CASCADE, null=True, blank=True, related_name="feed_entries"
+    )
+    review = models.ForeignKey(
+        Review, on_delete=models.CASCADE, null=True, blank=True, related_name="feed_entries"
+    )
+    time_created = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Feed Entry"
+        verbose_name_plural = "Feed Entries"
+        indexes = [
+            # Covers the timeline ordering (time_created, content_type, post id).
+            models.Index(
+                fields=["owner", "-time_created", "-content_type", "-ticket", "-review"],
+                name="reviews_feed_owner_time",
+            ),
+            models.Index(fields=["owner", "author"], name="reviews_feed_owner_author"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "ticket"], name="reviews_feed_unique_ticket"),
+            models.UniqueConstraint(fields=["owner", "review"], name="reviews_feed_unique_review"),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} <--- {self.content_type} ( {self.ticket_id or self.review_id} )"
+
+
+class UserStats(models.Model):
+    """
+    Model holding the activity counters of a user.
+
+    The counters are maintained incrementally (F() updates) by signals, so
+    that pages never aggregate the Ticket, Review and UserFollow tables; the
+    reconcile_stats command repairs any drift.
+
+    Attributes:
+        user (OneToOneField): The user the counters belong to.
+        tickets_count (int): The number of tickets created by the user.
+        open_tickets_count (int): The number of those tickets without review.
+        reviews_count (int): The number of reviews written by the user.
+        rating_total (int): The sum of the ratings given by the user.
+        followers_count (int): The number of users following the user.
+        following_count (int): The number of users the user follows.
+        last_activity (DateTimeField): When the posts of the user last changed.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    tickets_count = models.IntegerField(default=0)
+    open_tickets_count = models.IntegerField(default=0)
+    reviews_count = models.IntegerField(default=0)
+    rating_total = models.IntegerField(default=0)
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    last_activity = models.DateTimeField(null=True, blank=True)
+
+    COUNTERS = (
+        "tickets_count",
+        "open_tickets_count",
+        "reviews_count",
+        "rating_total",
+        "followers_count",
+        "following_count",
+    )
+
+    class Meta:
+        verbose_name = "User Stats"
+        verbose_name_plural = "User Stats"
+
+    @property
+    def average_rating(self):
+        if not self.reviews_count:
+            return None
+        return round(self.rating_total / self.reviews_count, 1)
+
+    def __str__(self):
+        return f"Stats ( {self.user_id} )"
+
+
+class FoldedUsername(models.Model):
+    """
+    Model holding the username of a user folded for caseless prefix lookups.
+
+    SQLite's LOWER() only folds ASCII letters: the username is normalized and
+    casefolded in Python (see reviews.autocomplete.fold) when the user is
+    saved, and indexed for the autocomplete range scans.
+
+    Attributes:
+        user (OneToOneField): The user the username belongs to.
+        folded (str): The folded username.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="folded_username"
+    )
+    # Casefolding may lengthen a name, e.g. "ß" becomes "ss".
+    folded = models.CharField(max_length=450, db_index=True)
+
+    def __str__(self):
+        return self.folded
@@ -0,0 +1,140 @@
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+# Rows counted exactly at most; larger listings are estimated.
+EXACT_COUNT_LIMIT = 10_000
+
+
+def estimated_rows(model, using="default"):
+    """
+    Return an estimate of the number of rows of a model's table, or None.
+
+    The estimate comes from the statistics of the database (ANALYZE) or, on
+    SQLite without statistics, from the largest rowid: a cheap upper bound,
+    read from the end of the table's B-tree.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    name = model._meta.db_table
+    queries = {
+        # CAST keeps the leading integer of a stat: the number of rows.
+        "sqlite": [
+            ("SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s", [name]),
+            (f"SELECT MAX(rowid) FROM {table}", []),
+        ],
+        "postgresql": [
+            ("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [name]),
+        ],
+    }
+    with connection.cursor() as cursor:
+        for sql, params in queries.get(connection.vendor, []):
+            try:
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+            except DatabaseError:
+                # e.g. sqlite_stat1 does not exist before the first ANALYZE.
+                continue
+            if row and row[0] is not None and row[0] >= 0:
+                return row[0]
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts a whole large table.
+
+    Listings are counted exactly up to EXACT_COUNT_LIMIT rows, with a COUNT
+    over a LIMITed subquery, so that the cost of the count is bounded.
+    Past the limit, an unfiltered listing is counted from the table
+    statistics (see ``estimated_rows``), and a filtered one is reported at
+    the limit: narrow the filters to page further.
+    """
+    exact_count_limit = EXACT_COUNT_LIMIT
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        count = queryset[:self.exact_count_limit].count()
+        if count < self.exact_count_limit or queryset.query.where:
+            return count
+        estimate = estimated_rows(queryset.model, queryset.db)
+        return max(count, estimate or 0)
+
+
+class CountlessPage:
+    """
+    A page of a CountlessPaginator.
+
+    Attributes:
+        object_list (list): The objects of the page.
+        number (int): The number of the page, from 1.
+        paginator (CountlessPaginator): The paginator of the page.
+    """
+    def __init__(self, object_list, number, has_next, paginator):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    @property
+    def page_window(self):
+        """
+        The page numbers to link around the current page: at most ``window``
+        previous pages, and the next page when it exists.
+        """
+        first = max(1, self.number - self.paginator.window)
+        return range(first, self.number + (2 if self._has_next else 1))
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CountlessPaginator:
+    """
+    Paginator that never counts its objects.
+
+    A page reads per_page + 1 objects: the extra one only tells whether a
+    next page exists. The number of pages is thus unknown, and only a
+    bounded window of page numbers is offered (see CountlessPage).
+    """
+    def __init__(self, object_list, per_page, window=2):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.window = window
+
+    def validate_number(self, number):
+        """
+        Return the page number as an int, 1 when it is not a valid one.
+        """
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return 1
+        return max(number, 1)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return CountlessPage(
+            objects[:self.per_page], number, len(objects) > self.per_page, self
+        )
@@ -0,0 +1,41 @@
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+# Session and user lookups excluded, a feed page must render within this many
+# queries, whatever its size and page: the timeline rows, the tickets, the
+# reviews, and the user's UserStats row shown by the posts page. The ?page=
+# mode adds none: its paginator reads one extra row instead of counting.
+FEED_QUERY_BUDGET = 4
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a view runs more queries than its budget allows.
+    """
+
+
+def count_queries(view, user, path="/", **params):
+    """
+    Render a view for the given user and return (response, executed queries).
+    """
+    request = RequestFactory().get(path, params)
+    request.user = user
+    with CaptureQueriesContext(connection) as context:
+        response = view(request)
+        if hasattr(response, "render"):
+            response.render()
+    return response, context.captured_queries
+
+
+def assert_query_budget(view, user, budget=FEED_QUERY_BUDGET, path="/", **params):
+    """
+    Render a view and raise QueryBudgetExceeded if it runs more than budget queries.
+    """
+    response, queries = count_queries(view, user, path, **params)
+    if len(queries) > budget:
+        statements = "\n".join(query["sql"] for query in queries)
+        raise QueryBudgetExceeded(
+            f"{path} ran {len(queries)} queries (budget {budget}):\n{statements}"
+        )
+    return response, queries
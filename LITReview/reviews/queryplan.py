@@ -0,0 +1,63 @@
+import re
+
+from django.db import connections
+from .feeds import TICKET, feed_tickets, materialized_timeline, timeline
+from .models import UserFollow
+
+# Plan details revealing a full table scan or a sort the indexes should avoid.
+FULL_SCAN = re.compile(r"^SCAN (?!.*\bUSING (COVERING )?INDEX\b)")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE")
+
+
+class QueryPlanError(AssertionError):
+    """
+    Raised when a hot query falls back to a full table scan or a temporary sort.
+    """
+
+
+def explain(queryset):
+    """
+    Return the EXPLAIN QUERY PLAN details of a queryset (SQLite only).
+    """
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan):
+    """
+    Return the plan details showing a full table scan or a temporary B-tree.
+    """
+    return [detail for detail in plan if FULL_SCAN.search(detail) or TEMP_SORT.search(detail)]
+
+
+def assert_indexed(queryset, name=None):
+    """
+    Raise QueryPlanError if the plan of a queryset scans or sorts a table.
+    """
+    plan = explain(queryset)
+    problems = plan_problems(plan)
+    if problems:
+        raise QueryPlanError(f"{name or queryset.model.__name__}: " + "; ".join(problems))
+    return plan
+
+
+def hot_queries(user, per_page=5):
+    """
+    Return, by name, the querysets run on every feed, posts and subscribe page.
+
+    The tickets are hydrated for the ids of the user's first posts page; an
+    id matching nothing stands in when it has no ticket, as an empty IN
+    list would not reach the database.
+    """
+    posts = timeline([user])[:per_page + 1]
+    ticket_ids = [row["post_id"] for row in posts if row["content_type"] == TICKET]
+    return {
+        "feeds": materialized_timeline(user)[:per_page + 1],
+        "posts": posts,
+        "closed_tickets": feed_tickets().filter(pk__in=ticket_ids or [0]),
+        "user_follows": UserFollow.objects.filter(user=user).order_by("followed_user"),
+        "followed_by": UserFollow.objects.filter(followed_user=user).order_by("user"),
+    }
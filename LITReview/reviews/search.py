@@ -0,0 +1,164 @@
+import base64
+import binascii
+import datetime
+import json
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from .feeds import REVIEW, TICKET, InvalidCursor
+
+SEARCH_TABLE = "reviews_search"
+# bm25 weights of the indexed columns: a match in a title counts more.
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+SNIPPET_TOKENS = 16
+# Placeholders wrapped around the matches by FTS5, turned into <mark> tags
+# once the text is escaped.
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+# The FTS5 rowid encodes the post: 2 * id for a ticket, 2 * id + 1 for a
+# review, so that the triggers update an entry by rowid, without any scan.
+_REBUILD_SQL = [
+    f"DELETE FROM {SEARCH_TABLE}",
+    f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, title, body, user_id, time_created)
+    SELECT 2 * id, title, description, user_id, time_created FROM reviews_ticket
+    """,
+    f"""
+    INSERT INTO {SEARCH_TABLE} (rowid, title, body, user_id, time_created)
+    SELECT 2 * id + 1, headline, body, user_id, time_created FROM reviews_review
+    """,
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')",
+]
+
+
+def is_available():
+    """
+    Return whether the database holds the search index (SQLite only).
+    """
+    return (
+        connection.vendor == "sqlite"
+        and SEARCH_TABLE in connection.introspection.table_names()
+    )
+
+
+def rebuild():
+    """
+    Re-index every ticket and review, and return the number of entries.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql in _REBUILD_SQL:
+            cursor.execute(sql)
+        cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def build_match(query):
+    """
+    Turn free text into an FTS5 query matching every word, as a prefix.
+
+    Each word is quoted, so the FTS5 operators and syntax typed by a user
+    are searched for as plain text. Returns None when there is no word.
+    """
+    terms = _TERM.findall(query or "")
+    if not terms:
+        return None
+    return " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def encode_cursor(rank, rowid):
+    raw = json.dumps([rank, rowid]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        rank, rowid = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(token)
+    if not isinstance(rank, (int, float)) or not isinstance(rowid, int):
+        raise InvalidCursor(token)
+    return float(rank), rowid
+
+
+def _as_datetime(value):
+    """
+    Convert a time_created copied in the index (UTC text) to a datetime.
+    """
+    value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    return value
+
+
+def _marked(text):
+    """
+    Escape an FTS5 highlight/snippet and turn its placeholders into <mark>.
+    """
+    return mark_safe(
+        escape(text).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+    )
+
+
+def search(query, author_ids, per_page=10, after=None):
+    """
+    Return one page of the posts of the given authors matching a query.
+
+    Posts are ranked with bm25 (best first) and come with their highlighted
+    title and a snippet of their body, both safe HTML. Pages are delimited
+    by a (rank, rowid) keyset cursor: the returned ``next_cursor`` is None on
+    the last page. Only the posts of ``author_ids`` are searched, which
+    scopes the results to what the viewer can see.
+    """
+    match = build_match(query)
+    author_ids = list(author_ids)
+    if match is None or not author_ids:
+        return [], None
+    keyset, keyset_params = "", []
+    if after:
+        rank, rowid = decode_cursor(after)
+        keyset = f"AND (rank > %s OR (rank = %s AND {SEARCH_TABLE}.rowid > %s))"
+        keyset_params = [rank, rank, rowid]
+    placeholders = ", ".join(["%s"] * len(author_ids))
+    sql = f"""
+        SELECT {SEARCH_TABLE}.rowid, rank, highlight({SEARCH_TABLE}, 0, %s, %s),
+               snippet({SEARCH_TABLE}, 1, %s, %s, '…', {SNIPPET_TOKENS}),
+               {SEARCH_TABLE}.time_created, auth_user.username
+        FROM {SEARCH_TABLE}
+        JOIN auth_user ON auth_user.id = {SEARCH_TABLE}.user_id
+        WHERE {SEARCH_TABLE} MATCH %s
+          AND rank MATCH 'bm25({TITLE_WEIGHT}, {BODY_WEIGHT})'
+          AND {SEARCH_TABLE}.user_id IN ({placeholders})
+          {keyset}
+        ORDER BY rank, {SEARCH_TABLE}.rowid
+        LIMIT %s
+    """
+    params = [_MARK_START, _MARK_END, _MARK_START, _MARK_END, match]
+    params += author_ids + keyset_params + [per_page + 1]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    results = [
+        {
+            "type": REVIEW if rowid % 2 else TICKET,
+            "id": rowid // 2,
+            "title": _marked(title),
+            "snippet": _marked(snippet),
+            "time_created": _as_datetime(time_created),
+            "author": username,
+            "rank": rank,
+        }
+        for rowid, rank, title, snippet, time_created, username in rows[:per_page]
+    ]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = rows[per_page - 1]
+        next_cursor = encode_cursor(last[1], last[0])
+    return results, next_cursor
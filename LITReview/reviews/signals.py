@@ -0,0 +1,184 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from jobs.queue import enqueue
+from .models import Ticket, Review, UserFollow, UserStats
+from . import autocomplete, fanout, follows, fragments, live, stats, tasks
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """
+    Give every new user an (empty) stats row for the counters to update,
+    and index the folded username of the autocomplete.
+    """
+    if kwargs.get("raw"):
+        return
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    update_fields = kwargs.get("update_fields")
+    if update_fields is None or "username" in update_fields:
+        autocomplete.index_usernames([(instance.pk, instance.username)])
+
+
+def _publish(post, content_type):
+    args = (post.user_id, content_type, post.pk, post.time_created)
+    transaction.on_commit(lambda: live.publish_post(*args))
+
+
+def _fan_out(post, content_type):
+    """
+    Write a new post into its author's timeline, and defer the followers'
+    timelines to the job queue.
+    """
+    fanout.fan_out_to_author(post, content_type)
+    enqueue(
+        tasks.fan_out_post, content_type, post.pk, key=f"fan-out:{content_type.lower()}:{post.pk}"
+    )
+
+
+@receiver(pre_save, sender=Ticket)
+def ticket_saving(sender, instance, **kwargs):
+    """
+    Forget the derivatives of a ticket whose image is replaced or removed.
+    """
+    if not instance.image or not instance.image._committed:
+        instance.has_derivatives = False
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_saved(sender, instance, created, **kwargs):
+    """
+    Fan a new ticket out to the timelines and live connections of its
+    author's followers and queue the generation of its image derivatives.
+    """
+    if created:
+        _fan_out(instance, "TICKET")
+        _publish(instance, "TICKET")
+        stats.apply([instance.user_id], touch=True, tickets_count=1, open_tickets_count=1)
+    else:
+        fragments.bump("ticket", instance.pk)
+        # Reviews display their ticket: their authors' posts changed too.
+        reviewers = Review.objects.filter(ticket=instance).values("user_id")
+        stats.apply([instance.user_id], touch=True)
+        stats.apply(reviewers, touch=True)
+    if instance.image and not instance.has_derivatives:
+        enqueue(
+            tasks.generate_derivatives,
+            instance.pk,
+            instance.image.name,
+            key=f"derivatives:{instance.pk}:{instance.image.name}",
+        )
+
+
+def _ticket_author(ticket_id):
+    return Ticket.objects.filter(pk=ticket_id).values("user_id")
+
+
+def _is_only_review(review):
+    return not Review.objects.filter(ticket_id=review.ticket_id).exclude(pk=review.pk).exists()
+
+
+@receiver(pre_save, sender=Review)
+def review_saving(sender, instance, **kwargs):
+    """
+    Remember the previous rating of an edited review.
+    """
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list("rating", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    """
+    Fan a new review out to the timelines and live connections of its
+    author's followers.
+    """
+    if created:
+        _fan_out(instance, "REVIEW")
+        _publish(instance, "REVIEW")
+        stats.apply([instance.user_id], touch=True, reviews_count=1, rating_total=instance.rating)
+        if _is_only_review(instance):
+            stats.apply(_ticket_author(instance.ticket_id), touch=True, open_tickets_count=-1)
+    else:
+        fragments.bump("review", instance.pk)
+        previous = getattr(instance, "_previous_rating", None)
+        delta = instance.rating - previous if previous is not None else 0
+        stats.apply([instance.user_id], touch=True, rating_total=delta)
+
+
+@receiver(post_delete, sender=Ticket)
+def ticket_deleted(sender, instance, **kwargs):
+    """
+    Invalidate the cached fragments of a deleted ticket.
+    """
+    fragments.bump("ticket", instance.pk)
+    # The reviews of a ticket are deleted first, so the ticket is open by now.
+    stats.apply([instance.user_id], touch=True, tickets_count=-1, open_tickets_count=-1)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    """
+    Invalidate the cached fragments of a deleted review.
+    """
+    fragments.bump("review", instance.pk)
+    stats.apply([instance.user_id], touch=True, reviews_count=-1, rating_total=-instance.rating)
+    if _is_only_review(instance):
+        stats.apply(_ticket_author(instance.ticket_id), touch=True, open_tickets_count=1)
+
+
+@receiver(pre_save, sender=UserFollow)
+def follow_saving(sender, instance, **kwargs):
+    """
+    Remember the previous pair of an edited follow (e.g. from the admin).
+    """
+    instance._previous_pair = None
+    if instance.pk:
+        instance._previous_pair = (
+            UserFollow.objects.filter(pk=instance.pk)
+            .values_list("user_id", "followed_user_id")
+            .first()
+        )
+
+
+def _count_follow(user_id, followed_user_id, delta):
+    stats.apply([user_id], following_count=delta)
+    stats.apply([followed_user_id], followers_count=delta)
+
+
+@receiver(post_save, sender=UserFollow)
+def follow_saved(sender, instance, created, **kwargs):
+    """
+    Queue the backfill of the follower's timeline with the posts of the
+    followed user.
+    """
+    pair = (instance.user_id, instance.followed_user_id)
+    previous = getattr(instance, "_previous_pair", None)
+    if previous and previous != pair:
+        follows.invalidate(previous[0])
+        fanout.remove_follow(*previous)
+        _count_follow(*previous, delta=-1)
+    if created or (previous and previous != pair):
+        follows.invalidate(instance.user_id)
+        enqueue(tasks.add_follow, *pair, key=f"add-follow:{instance.pk}:{pair[0]}:{pair[1]}")
+        _count_follow(*pair, delta=1)
+
+
+@receiver(post_delete, sender=UserFollow)
+def follow_deleted(sender, instance, **kwargs):
+    """
+    Remove the posts of the unfollowed user from the follower's timeline.
+
+    Follows deleted by bulk_unfollow are skipped: it updates the timeline,
+    counters and caches of all of them at once.
+    """
+    if follows.is_bulk_deleting():
+        return
+    follows.invalidate(instance.user_id)
+    fanout.remove_follow(instance.user_id, instance.followed_user_id)
+    _count_follow(instance.user_id, instance.followed_user_id, delta=-1)
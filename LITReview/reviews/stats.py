@@ -0,0 +1,120 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+from .models import Review, Ticket, UserFollow, UserStats
+
+CHUNK_SIZE = 500
+
+
+def apply(users, touch=False, **deltas):
+    """
+    Add deltas to the counters of the given users with a single UPDATE.
+
+    ``users`` is a list of user ids or a queryset of user ids. ``touch`` also
+    sets last_activity to now. Users without a stats row are left alone: their
+    row is computed from scratch when first needed (see ``for_user``).
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if touch:
+        changes["last_activity"] = timezone.now()
+    if changes:
+        UserStats.objects.filter(user_id__in=users).update(**changes)
+
+
+def _grouped(queryset, field, **aggregates):
+    return {row.pop(field): row for row in queryset.values(field).annotate(**aggregates)}
+
+
+def compute(user_ids):
+    """
+    Compute from scratch the (unsaved) stats of the given users.
+    """
+    user_ids = list(user_ids)
+    tickets = _grouped(
+        Ticket.objects.filter(user_id__in=user_ids), "user_id",
+        total=Count("id", distinct=True),
+        open=Count("id", distinct=True, filter=Q(review__isnull=True)),
+        latest=Max("time_created"),
+    )
+    reviews = _grouped(
+        Review.objects.filter(user_id__in=user_ids), "user_id",
+        total=Count("id"), rating=Sum("rating"), latest=Max("time_created"),
+    )
+    followers = _grouped(
+        UserFollow.objects.filter(followed_user_id__in=user_ids), "followed_user_id",
+        total=Count("id"),
+    )
+    following = _grouped(
+        UserFollow.objects.filter(user_id__in=user_ids), "user_id", total=Count("id")
+    )
+    empty = {"total": 0, "open": 0, "rating": 0, "latest": None}
+
+    def latest(user_id):
+        times = [
+            found[user_id]["latest"] for found in (tickets, reviews) if user_id in found
+        ]
+        return max(times, default=None)
+
+    return [
+        UserStats(
+            user_id=user_id,
+            tickets_count=tickets.get(user_id, empty)["total"],
+            open_tickets_count=tickets.get(user_id, empty)["open"],
+            reviews_count=reviews.get(user_id, empty)["total"],
+            rating_total=reviews.get(user_id, empty)["rating"] or 0,
+            followers_count=followers.get(user_id, empty)["total"],
+            following_count=following.get(user_id, empty)["total"],
+            last_activity=latest(user_id),
+        )
+        for user_id in user_ids
+    ]
+
+
+def reconcile(chunk_size=CHUNK_SIZE):
+    """
+    Recompute the stats of every user, chunk by chunk, and repair the drift.
+
+    Returns (number of users checked, number of rows created or repaired).
+    """
+    checked = repaired = 0
+    user_ids = User.objects.order_by("pk").values_list("pk", flat=True)
+    last = 0
+    while True:
+        chunk = list(user_ids.filter(pk__gt=last)[:chunk_size])
+        if not chunk:
+            break
+        last = chunk[-1]
+        with transaction.atomic():
+            current = UserStats.objects.select_for_update().in_bulk(chunk)
+            expected = compute(chunk)
+            to_create = [stats for stats in expected if stats.user_id not in current]
+            to_update = []
+            for stats in expected:
+                row = current.get(stats.user_id)
+                if row is None:
+                    continue
+                drifted = any(
+                    getattr(row, field) != getattr(stats, field) for field in UserStats.COUNTERS
+                )
+                if drifted or row.last_activity is None and stats.last_activity:
+                    for field in UserStats.COUNTERS:
+                        setattr(row, field, getattr(stats, field))
+                    row.last_activity = row.last_activity or stats.last_activity
+                    to_update.append(row)
+            UserStats.objects.bulk_create(to_create)
+            UserStats.objects.bulk_update(to_update, UserStats.COUNTERS + ("last_activity",))
+        checked += len(chunk)
+        repaired += len(to_create) + len(to_update)
+    return checked, repaired
+
+
+def for_user(user):
+    """
+    Return the stats of a user, creating them if they do not exist yet.
+    """
+    stats = UserStats.objects.filter(user=user).first()
+    if stats is None:
+        stats = compute([user.pk])[0]
+        UserStats.objects.bulk_create([stats], ignore_conflicts=True)
+    return stats
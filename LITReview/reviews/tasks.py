@@ -0,0 +1,54 @@
+"""
+Background tasks of the reviews, run by the job queue (see jobs.queue).
+
+A task may run late, or more than once: it reads the current state of the
+database rather than trusting its arguments, and its writes ignore what is
+already there.
+"""
+from jobs.queue import task
+from . import fanout, images
+from .models import Review, Ticket, UserFollow
+
+
+@task
+def fan_out_post(content_type, post_id):
+    """
+    Write a new ticket or review into the timelines of its author's followers.
+    """
+    model = Ticket if content_type == "TICKET" else Review
+    post = model.objects.filter(pk=post_id).only("id", "user_id", "time_created").first()
+    if post is not None:
+        fanout.fan_out_to_followers(post, content_type)
+
+
+@task
+def add_follow(follower_id, followed_id):
+    """
+    Copy the posts of a newly followed user into the follower's timeline,
+    unless the user was unfollowed since.
+    """
+    add_follows(follower_id, [followed_id])
+
+
+@task
+def add_follows(follower_id, followed_ids):
+    """
+    Copy the posts of newly followed users into the follower's timeline,
+    skipping the users unfollowed since.
+    """
+    still_followed = UserFollow.objects.filter(
+        user_id=follower_id, followed_user_id__in=followed_ids
+    ).values_list("followed_user_id", flat=True)
+    followed_ids = list(still_followed)
+    if followed_ids:
+        fanout.add_follows(follower_id, followed_ids)
+
+
+@task
+def generate_derivatives(ticket_id, image_name):
+    """
+    Generate the derivatives of a ticket's image, unless it was replaced since.
+    """
+    if Ticket.objects.filter(pk=ticket_id, image=image_name).exists():
+        images.render_derivatives(image_name)
+        images.mark_ready(ticket_id, image_name)
@@ -0,0 +1,14 @@
+from django import template
+from reviews.fragments import render_fragment
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_fragment(kind, post):
+    """
+    Render the cached viewer-independent part of a ticket or a review.
+
+    Usage: {% post_fragment "ticket" el %} or {% post_fragment "review" el %}
+    """
+    return render_fragment(kind, post)
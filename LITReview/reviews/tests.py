@@ -0,0 +1,798 @@
+import datetime
+import importlib
+import io
+import json
+import re
+import shutil
+import tempfile
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Max, Min
+from django.test import TestCase, override_settings
+from django.urls import include, reverse
+from django.urls import path as route
+from django.utils import timezone
+from jobs import queue
+from PIL import Image
+from . import fanout, follows, fragments, images, imports, live, stats
+from .autocomplete import usernames_starting_with
+from .admin import DateRangeQuerySet
+from .pagination import CountlessPaginator, EstimatedCountPaginator
+from .querybudget import assert_query_budget
+from .queryplan import assert_indexed, hot_queries
+from .models import FeedEntry, Review, Ticket, UserFollow, UserStats
+from .feeds import REVIEW, TICKET, encode_cursor
+from .async_views import AsyncFeedsView, AsyncPostsView, AsyncSubscribeView
+from .views import FeedsView, PostsView
+
+
+def run_jobs():
+    while job := queue.claim("test"):
+        queue.run(job)
+
+
+def png(width=80, height=60):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "blue").save(buffer, "PNG")
+    return SimpleUploadedFile("cover.png", buffer.getvalue(), "image/png")
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class UploadViewsTests(TestCase):
+    """
+    Tickets with an image, posted through the views streaming the uploads.
+
+    The CSRF checks are enforced: the middleware must leave the body to the
+    views, which set their upload handlers before reading it.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("writer", password="P@ssword123")
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.client = self.client_class(enforce_csrf_checks=True)
+        self.client.force_login(self.user)
+
+    def post(self, path, data):
+        self.client.get(path)
+        token = self.client.cookies["csrftoken"].value
+        return self.client.post(path, dict(data, csrfmiddlewaretoken=token))
+
+    def test_ticket_create(self):
+        response = self.post(
+            "/reviews/add-ticket/", {"title": "Ticket", "description": "d", "image": png()}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Ticket.objects.get(title="Ticket").image)
+
+    def test_review_add_full(self):
+        response = self.post(
+            "/reviews/add-review-full/",
+            {
+                "title": "Full",
+                "description": "d",
+                "image": png(),
+                "headline": "Headline",
+                "rating": "4",
+                "body": "b",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Review.objects.filter(ticket__title="Full", ticket__image__gt="").exists())
+
+    def test_csrf_still_enforced(self):
+        response = self.client.post("/reviews/add-ticket/", {"title": "Forged", "image": png()})
+        self.assertEqual(response.status_code, 403)
+
+
+class FeedsApiTests(TestCase):
+    """
+    Conditional GET of the feed, whose followers' entries are written by jobs.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user("reader", password="P@ssword123")
+        cls.author = User.objects.create_user("author", password="P@ssword123")
+        UserFollow.objects.create(user=cls.reader, followed_user=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        run_jobs()
+        self.client.force_login(self.reader)
+
+    def test_post_and_jobs_committed_together(self):
+        with mock.patch("reviews.signals.enqueue", side_effect=RuntimeError("enqueue failed")):
+            with self.assertRaises(RuntimeError):
+                Ticket.objects.create(user=self.author, title="Lost job")
+        self.assertFalse(Ticket.objects.filter(title="Lost job").exists())
+
+    def test_etag_changes_once_the_post_is_fanned_out(self):
+        Ticket.objects.create(user=self.author, title="Fanned out")
+        etag = self.client.get("/reviews/api/feeds")["ETag"]
+        run_jobs()
+        response = self.client.get("/reviews/api/feeds", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Fanned out")
+        response = self.client.get("/reviews/api/feeds", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+
+class BulkFollowTests(TestCase):
+    """
+    Follows added and removed by list, without the per-row signals.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user("reader", password="P@ssword123")
+        cls.authors = [User.objects.create_user(f"author{n}") for n in range(3)]
+        for author in cls.authors:
+            Ticket.objects.create(user=author, title=f"By {author.username}")
+
+    def setUp(self):
+        cache.clear()
+        run_jobs()
+
+    def test_backfill_is_queued(self):
+        usernames = [author.username for author in self.authors]
+        results = follows.bulk_follow(self.reader, usernames)
+        self.assertEqual(set(results.values()), {follows.FOLLOWED})
+        self.assertFalse(FeedEntry.objects.filter(owner=self.reader).exists())
+        run_jobs()
+        self.assertEqual(FeedEntry.objects.filter(owner=self.reader).count(), 3)
+
+    def test_backfill_skips_the_users_unfollowed_since(self):
+        follows.bulk_follow(self.reader, [author.username for author in self.authors])
+        follows.bulk_unfollow(self.reader, [self.authors[0].username])
+        run_jobs()
+        self.assertQuerySetEqual(
+            FeedEntry.objects.filter(owner=self.reader).values_list("author", flat=True),
+            [author.pk for author in self.authors[1:]],
+            ordered=False,
+        )
+
+    def bulk(self, usernames):
+        self.client.force_login(self.reader)
+        return self.client.post(
+            "/reviews/subscribe/bulk/",
+            {"action": "subscribe", "usernames": usernames},
+            content_type="application/json",
+        )
+
+    def test_view_follows_a_json_list(self):
+        response = self.bulk([author.username for author in self.authors])
+        self.assertEqual(response.json()["summary"], {follows.FOLLOWED: 3})
+
+    def test_view_rejects_a_json_string(self):
+        response = self.bulk(self.authors[0].username)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserFollow.objects.filter(user=self.reader).exists())
+
+    def test_unfollow_counts_each_follow_once(self):
+        usernames = [author.username for author in self.authors]
+        follows.bulk_follow(self.reader, usernames)
+        run_jobs()
+        follows.bulk_unfollow(self.reader, usernames)
+        self.assertFalse(FeedEntry.objects.filter(owner=self.reader).exists())
+        self.assertEqual(UserStats.objects.get(user=self.reader).following_count, 0)
+        self.assertEqual(UserStats.objects.get(user=self.authors[0]).followers_count, 0)
+
+    def test_rebuild_does_not_trust_the_follow_cache(self):
+        follows.followed_ids(self.reader.pk)
+        UserFollow.objects.bulk_create([UserFollow(user=self.reader, followed_user=self.authors[0])])
+        fanout.rebuild([self.reader.pk])
+        self.assertTrue(FeedEntry.objects.filter(owner=self.reader, author=self.authors[0]).exists())
+
+    @override_settings(BULK_FOLLOW_MAX_USERNAMES=2)
+    def test_view_caps_the_usernames(self):
+        response = self.bulk([author.username for author in self.authors])
+        self.assertEqual(response.status_code, 400)
+
+
+def create_feed():
+    """
+    Create a reader following an author, both with tickets and reviews.
+    """
+    reader = User.objects.create_user("reader", password="P@ssword123")
+    author = User.objects.create_user("author", password="P@ssword123")
+    UserFollow.objects.create(user=reader, followed_user=author)
+    for number in range(30):
+        user = author if number % 2 else reader
+        ticket = Ticket.objects.create(user=user, title=f"Ticket {number}")
+        if number % 3:
+            Review.objects.create(ticket=ticket, user=author, rating=3, headline="Review")
+    run_jobs()
+    return reader
+
+
+class QueryBudgetTests(TestCase):
+    """
+    The feed and posts pages run a fixed number of queries, whatever their size.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_feed()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_and_posts(self):
+        for view_class, path in ((FeedsView, "/reviews/feeds"), (PostsView, "/reviews/posts")):
+            for per_page in (5, 20, 100):
+                view = view_class.as_view(per_page=per_page)
+                for params in ({}, {"page": "2"}):
+                    with self.subTest(view=view_class.__name__, per_page=per_page, **params):
+                        response, _ = assert_query_budget(view, self.reader, path=path, **params)
+                        self.assertEqual(response.status_code, 200)
+
+
+class QueryPlanTests(TestCase):
+    """
+    The hot feed and subscription queries are served by indexes, without
+    full table scans nor temporary sorts.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_feed()
+
+    def test_hot_queries_are_indexed(self):
+        for name, queryset in hot_queries(self.reader).items():
+            with self.subTest(name):
+                assert_indexed(queryset, name)
+
+
+class AutocompleteTests(TestCase):
+    """
+    Caseless username prefix lookups, beyond ASCII.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        for username in ("Élise", "elodie", "Straße", "inactive_élan"):
+            User.objects.create_user(username)
+        User.objects.filter(username="inactive_élan").update(is_active=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_non_ascii_prefix(self):
+        self.assertEqual(usernames_starting_with("él"), ["Élise"])
+        self.assertEqual(usernames_starting_with("ÉL"), ["Élise"])
+        self.assertEqual(usernames_starting_with("strass"), ["Straße"])
+
+    def test_renamed_user(self):
+        user = User.objects.get(username="elodie")
+        user.username = "Éloïse"
+        user.save()
+        self.assertEqual(usernames_starting_with("élo"), ["Éloïse"])
+
+
+class ExportViewTests(TestCase):
+    """
+    Streamed exports, whose content must not be buffered under ASGI.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_feed()
+
+    def test_wsgi(self):
+        self.client.force_login(self.reader)
+        response = self.client.get("/reviews/export/?format=jsonl")
+        self.assertFalse(response.is_async)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 15)
+
+    def test_asgi(self):
+        self.async_client.force_login(self.reader)
+
+        async def export():
+            response = await self.async_client.get("/reviews/export/?format=jsonl")
+            return response, b"".join([chunk async for chunk in response.streaming_content])
+
+        response, content = async_to_sync(export)()
+        self.assertTrue(response.is_async)
+        lines = content.decode().splitlines()
+        self.assertEqual(json.loads(lines[0])["type"], "TICKET")
+        self.assertEqual(len(lines), 15)
+
+
+class FragmentTests(TestCase):
+    """
+    Cached snippets of the posts, invalidated when the posts are edited.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("writer", password="P@ssword123")
+        cls.ticket = Ticket.objects.create(
+            user=cls.user, title="Ticket", description="Original description"
+        )
+        cls.review = Review.objects.create(
+            ticket=cls.ticket, user=cls.user, rating=3, headline="Original headline"
+        )
+
+    def setUp(self):
+        cache.clear()
+        fragments.reset_stats()
+
+    def render(self, kind, pk):
+        model = Ticket if kind == "ticket" else Review
+        return fragments.render_fragment(kind, model.objects.get(pk=pk))
+
+    def test_cached(self):
+        self.render("ticket", self.ticket.pk)
+        self.render("ticket", self.ticket.pk)
+        counters = fragments.stats()
+        self.assertEqual((counters["hits"], counters["misses"]), (1, 1))
+
+    def test_ticket_edited(self):
+        self.assertIn("Original description", self.render("ticket", self.ticket.pk))
+        # An update bypassing the signals is not seen: the fragment is cached.
+        Ticket.objects.filter(pk=self.ticket.pk).update(description="Edited description")
+        self.assertIn("Original description", self.render("ticket", self.ticket.pk))
+        Ticket.objects.get(pk=self.ticket.pk).save()
+        self.assertIn("Edited description", self.render("ticket", self.ticket.pk))
+
+    def test_review_edited(self):
+        self.assertIn("Original headline", self.render("review", self.review.pk))
+        review = Review.objects.get(pk=self.review.pk)
+        review.headline = "Edited headline"
+        review.save()
+        self.assertIn("Edited headline", self.render("review", self.review.pk))
+
+
+class DerivativesTests(TestCase):
+    """
+    Resized variants of the ticket images, generated by a job.
+    """
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+
+    def image(self, name, color):
+        buffer = io.BytesIO()
+        Image.new("RGB", (80, 60), color).save(buffer, "PNG")
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_images_differing_by_extension(self):
+        user = User.objects.create_user("writer")
+        names = [
+            self.image("img/reviews/cover.png", "red"),
+            self.image("img/reviews/cover.jpg", "blue"),
+        ]
+        for name in names:
+            Ticket.objects.create(user=user, title=name, image=name)
+        run_jobs()
+        self.assertEqual(Ticket.objects.filter(has_derivatives=True).count(), 2)
+        thumbs = [images.derivative_name(name, "thumb") for name in names]
+        self.assertNotEqual(thumbs[0], thumbs[1])
+        # Each thumbnail is the one of its own image.
+        self.assertEqual(self.dominant_band(thumbs[0]), 0)
+        self.assertEqual(self.dominant_band(thumbs[1]), 2)
+
+    def dominant_band(self, name):
+        with default_storage.open(name) as file, Image.open(file) as image:
+            pixel = image.convert("RGB").getpixel((0, 0))
+        return pixel.index(max(pixel))
+
+
+class AsyncUrls:
+    """
+    URLconf serving the async views in place of the sync ones.
+    """
+    urlpatterns = [
+        route("reviews/feeds", AsyncFeedsView.as_view(), name="feeds"),
+        route("reviews/posts", AsyncPostsView.as_view(), name="posts"),
+        route("reviews/subscribe/", AsyncSubscribeView.as_view(), name="subscribe"),
+        route("", include("core.urls")),
+    ]
+
+
+class AsyncViewsTests(TestCase):
+    """
+    The async feeds, posts and subscribe views render the same pages as the
+    sync ones.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_feed()
+        User.objects.get(username="author").following.create(followed_user=cls.reader)
+        run_jobs()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+        self.async_client.force_login(self.reader)
+
+    def page(self, response):
+        self.assertEqual(response.status_code, 200)
+        return re.sub(r'name="csrfmiddlewaretoken" value="[^"]*"', "", response.content.decode())
+
+    def async_get(self, path):
+        async def get():
+            return await self.async_client.get(path)
+
+        with override_settings(ROOT_URLCONF=AsyncUrls):
+            response = async_to_sync(get)()
+            self.assertIn(
+                response.resolver_match.func.view_class,
+                (AsyncFeedsView, AsyncPostsView, AsyncSubscribeView),
+            )
+        return response
+
+    def test_same_pages(self):
+        pages = {"/reviews/feeds": "Ticket", "/reviews/posts": "Ticket", "/reviews/subscribe/": "author"}
+        for path, expected in pages.items():
+            for query in ("", "?page=2"):
+                with self.subTest(path=path, query=query):
+                    sync_page = self.page(self.client.get(path + query))
+                    async_page = self.page(self.async_get(path + query))
+                    self.assertIn(expected, async_page)
+                    self.assertEqual(async_page, sync_page)
+
+
+@override_settings(LIVE_MAX_AGE=0, LIVE_HEARTBEAT=0.1)
+class LiveFeedTests(TestCase):
+    """
+    The live feed resumes after a Last-Event-ID in the order of the timeline,
+    posts sharing a timestamp included.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user("reader", password="P@ssword123")
+        cls.author = User.objects.create_user("author", password="P@ssword123")
+        UserFollow.objects.create(user=cls.reader, followed_user=cls.author)
+        cls.now = timezone.now()
+        cls.first = Ticket.objects.create(user=cls.author, title="First", time_created=cls.now)
+        cls.second = Ticket.objects.create(user=cls.author, title="Second", time_created=cls.now)
+        cls.review = Review.objects.create(
+            pk=cls.second.pk + 1, ticket=cls.first, user=cls.author,
+            rating=3, headline="Review", time_created=cls.now,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.async_client.force_login(self.reader)
+
+    def event_ids(self, last_event_id):
+        async def get():
+            response = await self.async_client.get(
+                reverse("live-feeds"), headers={"Last-Event-ID": last_event_id}
+            )
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        content = async_to_sync(get)().decode()
+        return re.findall(r"^id: (\S+)$", content, re.MULTILINE)
+
+    def test_resume(self):
+        ids = self.event_ids(encode_cursor(self.now, TICKET, self.first.pk))
+        self.assertEqual(ids, [
+            encode_cursor(self.now, TICKET, self.second.pk),
+            encode_cursor(self.now, REVIEW, self.review.pk),
+        ])
+        self.assertEqual(self.event_ids(ids[-1]), [])
+
+    @override_settings(LIVE_MAX_AGE=60)
+    def test_live_event_after_catch_up(self):
+        # Published once the catch-up sent the second ticket: the review
+        # comes after it in the timeline although "REVIEW" < "TICKET".
+        pk = self.review.pk
+        self.review.delete()
+        event = {
+            "id": encode_cursor(self.now, REVIEW, pk),
+            "type": "review",
+            "data": {},
+        }
+
+        async def read():
+            messages = live.stream({self.author.pk}, encode_cursor(self.now, TICKET, self.first.pk))
+            try:
+                self.assertTrue((await anext(messages)).startswith("retry:"))
+                self.assertIn(f"id: {encode_cursor(self.now, TICKET, self.second.pk)}", await anext(messages))
+                live.hub.publish(self.author.pk, event)
+                return await anext(messages)
+            finally:
+                await messages.aclose()
+
+        self.assertEqual(async_to_sync(read)(), live.format_event(event))
+
+
+class UserStatsTests(TestCase):
+    """
+    The counters updated with F() expressions by the signals match the
+    counts computed from scratch.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user("reader", password="P@ssword123")
+        cls.author = User.objects.create_user("author", password="P@ssword123")
+
+    def assertCounters(self, **expected):
+        for user in (self.reader, self.author):
+            row = UserStats.objects.get(user=user)
+            computed = stats.compute([user.pk])[0]
+            for field in UserStats.COUNTERS:
+                self.assertEqual(getattr(row, field), getattr(computed, field), (user.username, field))
+        row = UserStats.objects.get(user=self.author)
+        self.assertEqual({field: getattr(row, field) for field in expected}, expected)
+
+    def test_tickets(self):
+        first = Ticket.objects.create(user=self.author, title="First")
+        Ticket.objects.create(user=self.author, title="Second")
+        self.assertCounters(tickets_count=2, open_tickets_count=2)
+        first.delete()
+        self.assertCounters(tickets_count=1, open_tickets_count=1)
+
+    def test_reviews(self):
+        ticket = Ticket.objects.create(user=self.reader, title="Ticket")
+        review = Review.objects.create(ticket=ticket, user=self.author, rating=4, headline="Review")
+        self.assertCounters(reviews_count=1, rating_total=4)
+        review.rating = 5
+        review.save()
+        self.assertCounters(reviews_count=1, rating_total=5)
+        review.delete()
+        self.assertCounters(reviews_count=0, rating_total=0)
+
+    def test_ticket_with_review_deleted(self):
+        ticket = Ticket.objects.create(user=self.author, title="Ticket")
+        Review.objects.create(ticket=ticket, user=self.reader, rating=2, headline="Review")
+        self.assertCounters(tickets_count=1, open_tickets_count=0)
+        ticket.delete()
+        self.assertCounters(tickets_count=0, open_tickets_count=0)
+
+    def test_follows(self):
+        follow = UserFollow.objects.create(user=self.reader, followed_user=self.author)
+        self.assertCounters(followers_count=1, following_count=0)
+        follow.delete()
+        self.assertCounters(followers_count=0)
+        follows.bulk_follow(self.author, ["reader"])
+        self.assertCounters(following_count=1)
+        follows.bulk_unfollow(self.author, ["reader"])
+        self.assertCounters(following_count=0)
+
+    def test_backfill(self):
+        ticket = Ticket.objects.create(user=self.author, title="Ticket")
+        Ticket.objects.create(user=self.author, title="Open")
+        Review.objects.create(ticket=ticket, user=self.reader, rating=2, headline="Review")
+        UserFollow.objects.create(user=self.reader, followed_user=self.author)
+        for number in range(5):
+            User.objects.create_user(f"user{number}")
+        UserStats.objects.all().delete()
+        migration = importlib.import_module("reviews.migrations.0009_userstats")
+        # The users of a chunk, four grouped aggregates, the insert, and the
+        # empty chunk ending the loop, whatever the number of users.
+        with self.assertNumQueries(7):
+            migration.backfill_user_stats(apps, None)
+        self.assertEqual(UserStats.objects.count(), User.objects.count())
+        self.assertCounters(tickets_count=2, open_tickets_count=1, followers_count=1)
+
+
+class SearchViewTests(TestCase):
+    """
+    The search page, with and without the full-text index.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_feed()
+        Ticket.objects.create(
+            user=User.objects.get(username="author"), title="Dune", description="Desert planet"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_search(self):
+        response = self.client.get(reverse("search"), {"q": "desert"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["title"] for result in response.context["results"]], ["Dune"])
+
+    def test_unavailable(self):
+        with mock.patch("reviews.views.search.is_available", return_value=False), \
+                mock.patch("reviews.views.search.search") as search:
+            response = self.client.get(reverse("search"), {"q": "desert"})
+        self.assertEqual(response.status_code, 503)
+        self.assertContains(response, "Search is not available", status_code=503)
+        search.assert_not_called()
+
+    def test_migration_without_fts5(self):
+        migration = importlib.import_module("reviews.migrations.0010_search_index")
+        connection = mock.Mock(vendor="postgresql")
+        self.assertFalse(migration.has_fts5(connection))
+        connection.cursor.assert_not_called()
+
+
+class ImportPostsTests(TestCase):
+    """
+    The import_posts command, its rejected records and its checkpoints.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="P@ssword123")
+        cls.reader = User.objects.create_user("reader", password="P@ssword123")
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+
+    def write(self, records):
+        path = f"{self.directory}/posts.jsonl"
+        with open(path, "w", encoding="utf-8") as source:
+            source.writelines(json.dumps(record) + "\n" for record in records)
+        return path
+
+    def import_posts(self, path):
+        out = io.StringIO()
+        call_command("import_posts", path, workers=1, batch_size=2, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_import(self):
+        with open(f"{self.directory}/cover.png", "wb") as image:
+            image.write(png().read())
+        existing = Ticket.objects.create(user=self.reader, title="Existing")
+        path = self.write([
+            {"type": "ticket", "user": "author", "title": "With review",
+             "review": {"headline": "Good", "rating": 4}},
+            {"type": "ticket", "user": "author", "title": "With image", "image": "cover.png"},
+            {"type": "review", "ticket_id": existing.pk, "user": "author", "headline": "Fine", "rating": 3},
+            {"type": "ticket", "user": "nobody", "title": "Rejected"},
+            {"type": "review", "ticket_id": existing.pk, "user": "reader", "headline": "Twice", "rating": 1},
+        ])
+        output = self.import_posts(path)
+        self.assertIn("2 tickets and 2 reviews imported, 2 records rejected.", output)
+        ticket = Ticket.objects.get(title="With image")
+        self.assertTrue(ticket.has_derivatives)
+        self.assertTrue(default_storage.exists(images.derivative_name(ticket.image.name, "thumb")))
+        self.assertEqual(Review.objects.get(ticket__title="With review").user, self.author)
+        self.assertEqual(Review.objects.get(ticket=existing).headline, "Fine")
+        for computed in stats.compute([self.author.pk, self.reader.pk]):
+            row = UserStats.objects.get(user_id=computed.user_id)
+            for field in UserStats.COUNTERS:
+                self.assertEqual(getattr(row, field), getattr(computed, field), field)
+
+    def test_resume_from_checkpoint(self):
+        path = self.write([
+            {"type": "ticket", "user": "author", "title": f"Ticket {number}"} for number in range(5)
+        ])
+        insert = imports.insert
+        calls = []
+
+        def interrupted(batch):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return insert(batch)
+
+        with mock.patch("reviews.imports.insert", side_effect=interrupted), \
+                self.assertRaises(KeyboardInterrupt):
+            self.import_posts(path)
+        self.assertEqual(Ticket.objects.count(), 2)
+        with open(f"{path}.checkpoint", encoding="utf-8") as saved:
+            self.assertEqual(json.load(saved)["line"], 2)
+
+        output = self.import_posts(path)
+        self.assertIn("Resuming after line 2.", output)
+        self.assertIn("5 tickets and 0 reviews imported", output)
+        self.assertEqual(
+            sorted(Ticket.objects.values_list("title", flat=True)),
+            [f"Ticket {number}" for number in range(5)],
+        )
+
+
+class AdminListingTests(TestCase):
+    """
+    The admin changelists count and date their rows without scanning them.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", password="P@ssword123")
+        for month, day in ((1, 15), (1, 20), (3, 2), (3, 9), (3, 30)):
+            Ticket.objects.create(
+                user=cls.admin,
+                title=f"Ticket {month}/{day}",
+                time_created=datetime.datetime(2024, month, day, 12, tzinfo=datetime.timezone.utc),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self, queryset, limit):
+        paginator = EstimatedCountPaginator(queryset, 2)
+        paginator.exact_count_limit = limit
+        return paginator
+
+    def test_estimated_count(self):
+        tickets = Ticket.objects.order_by("pk")
+        self.assertEqual(self.paginator(tickets, 10).count, 5)
+        # Past the limit, the table is estimated from its largest rowid.
+        self.assertEqual(self.paginator(tickets, 3).count, 5)
+        # A filtered listing is reported at the limit.
+        self.assertEqual(self.paginator(tickets.filter(title__startswith="Ticket"), 3).count, 3)
+        self.assertEqual(self.paginator(tickets, 3).num_pages, 3)
+
+    def test_date_range_queryset(self):
+        tickets = DateRangeQuerySet(Ticket)
+        self.assertEqual(
+            tickets.aggregate(first=Min("time_created"), last=Max("time_created")),
+            Ticket.objects.aggregate(first=Min("time_created"), last=Max("time_created")),
+        )
+        # February has no ticket, but lies between the first and last dates.
+        months = [(moment.year, moment.month) for moment in tickets.datetimes("time_created", "month")]
+        self.assertEqual(months, [(2024, 1), (2024, 2), (2024, 3)])
+        days = tickets.filter(time_created__month=1).datetimes("time_created", "day", order="DESC")
+        self.assertEqual(days[0].day, 20)
+        self.assertEqual(len(days), 6)
+        self.assertEqual(DateRangeQuerySet(Review).datetimes("time_created", "year"), [])
+
+    def test_changelist(self):
+        self.client.force_login(self.admin)
+        url = reverse("admin:reviews_ticket_changelist")
+        response = self.client.get(url)
+        self.assertContains(response, "Ticket 3/30")
+        # A single year: the hierarchy offers its months, February included.
+        self.assertContains(response, "time_created__month=2")
+        response = self.client.get(url, {"time_created__year": "2024", "time_created__month": "3"})
+        self.assertEqual(len(response.context["cl"].result_list), 3)
+        self.assertContains(response, "time_created__day=30")
+
+
+class CountlessPaginatorTests(TestCase):
+    """
+    The ?page= paginator reads one extra row instead of counting.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user("writer", password="P@ssword123")
+        for number in range(5):
+            Ticket.objects.create(user=user, title=f"Ticket {number}")
+
+    def setUp(self):
+        cache.clear()
+
+    def page(self, number):
+        paginator = CountlessPaginator(Ticket.objects.order_by("pk"), 2)
+        with self.assertNumQueries(1):
+            return paginator.page(number)
+
+    def test_pages(self):
+        first = self.page(1)
+        self.assertEqual([ticket.title for ticket in first], ["Ticket 0", "Ticket 1"])
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+        self.assertEqual(list(first.page_window), [1, 2])
+        last = self.page("3")
+        self.assertEqual([ticket.title for ticket in last], ["Ticket 4"])
+        self.assertFalse(last.has_next())
+        self.assertEqual(last.previous_page_number(), 2)
+        self.assertEqual(list(last.page_window), [1, 2, 3])
+        self.assertEqual(list(self.page(5).page_window), [3, 4, 5])
+
+    def test_out_of_range(self):
+        self.assertEqual(len(self.page(9)), 0)
+        self.assertFalse(self.page(9).has_next())
+        for number in ("x", None, "0", "-2"):
+            self.assertEqual(self.page(number).number, 1)
+
+    def test_feeds_page(self):
+        reader = create_feed()
+        self.client.force_login(reader)
+        response = self.client.get(reverse("feeds"), {"page": "2"})
+        page = response.context["feeds"]
+        self.assertEqual(page.number, 2)
+        self.assertTrue(page.has_previous())
+        self.assertContains(response, "?page=1")
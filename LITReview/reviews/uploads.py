@@ -0,0 +1,77 @@
+import io
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+DEFAULT_MAX_SIZE = 10 * 1024 * 1024
+DEFAULT_MAX_DIMENSIONS = (6000, 6000)
+
+
+def max_upload_size():
+    return getattr(settings, "TICKET_IMAGE_MAX_SIZE", DEFAULT_MAX_SIZE)
+
+
+def max_upload_dimensions():
+    return getattr(settings, "TICKET_IMAGE_MAX_DIMENSIONS", DEFAULT_MAX_DIMENSIONS)
+
+
+class OversizedUploadedFile(UploadedFile):
+    """
+    Placeholder for an upload that exceeded the size limit.
+
+    The content was discarded while streaming, only its size is known so that
+    the form can report the error.
+    """
+    def __init__(self, name, content_type, size, charset):
+        super().__init__(io.BytesIO(), name, content_type, size, charset)
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Upload handler streaming files to disk chunk by chunk, never in memory.
+
+    Once a file goes over the size limit, its temporary file is dropped and
+    the remaining chunks are discarded instead of written.
+    """
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or max_upload_size()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.oversized = bool(self.content_length and self.content_length > self.max_size)
+        if self.oversized:
+            self.file.close()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if not self.oversized and self.received > self.max_size:
+            self.oversized = True
+            self.file.close()
+        if not self.oversized:
+            self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.oversized:
+            return OversizedUploadedFile(
+                self.file_name, self.content_type, max(file_size, self.received), self.charset
+            )
+        return super().file_complete(file_size)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class StreamingUploadMixin:
+    """
+    Mixin for the views receiving ticket images.
+
+    Replaces the default upload handlers by BoundedUploadHandler. The CSRF
+    check reads request.POST, so it is run here once the handlers are set.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        request.upload_handlers = [BoundedUploadHandler(request)]
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
@@ -1,7 +1,15 @@
+from django.conf import settings
 from django.urls import path
+from .async_views import AsyncFeedsView, AsyncPostsView, AsyncSubscribeView
 from .views import (
     FeedsView,
+    FeedsMoreView,
     PostsView,
+    PostsMoreView,
+    FeedsApiView,
+    PostsApiView,
+    LiveFeedView,
+    ExportView,
     TicketDeleteView,
     TicketUpdateView,
     TicketCreateView,
@@ -10,14 +18,41 @@ from .views import (
     ReviewAddFullView,
     ReviewUpdateView,
     SubscribeView,
+    BulkSubscribeView,
+    UserAutocompleteView,
+    SearchView,
 )
 
+# The async views serve the same pages when ASYNC_VIEWS is set.
+if getattr(settings, "ASYNC_VIEWS", False):
+    feeds_view, posts_view, subscribe_view = AsyncFeedsView, AsyncPostsView, AsyncSubscribeView
+else:
+    feeds_view, posts_view, subscribe_view = FeedsView, PostsView, SubscribeView
+
 urlpatterns = [
     # Feeds view for displaying user feeds
-    path("feeds", FeedsView.as_view(), name="feeds"),
+    path("feeds", feeds_view.as_view(), name="feeds"),
 
     # Posts view for displaying user posts
-    path("posts", PostsView.as_view(), name="posts"),
+    path("posts", posts_view.as_view(), name="posts"),
+
+    # Next page of the feeds, as list items for the infinite scroll
+    path("feeds/more", FeedsMoreView.as_view(), name="feeds-more"),
+
+    # Next page of the posts, as list items for the infinite scroll
+    path("posts/more", PostsMoreView.as_view(), name="posts-more"),
+
+    # JSON feed with cursor pagination and conditional GET
+    path("api/feeds", FeedsApiView.as_view(), name="api-feeds"),
+
+    # JSON posts with cursor pagination and conditional GET
+    path("api/posts", PostsApiView.as_view(), name="api-posts"),
+
+    # Server-Sent Events stream of the new posts of the feed
+    path("live/feeds", LiveFeedView.as_view(), name="live-feeds"),
+
+    # Streamed CSV/JSONL dump of the user's posts, optionally zipped with images
+    path("export/", ExportView.as_view(), name="export"),
 
     # Delete ticket view with dynamic primary key
     path("delete-ticket/<int:pk>/", TicketDeleteView.as_view(), name="delete-ticket"),
@@ -41,5 +76,14 @@ urlpatterns = [
     path("delete-review/<int:pk>/", ReviewDeleteView.as_view(), name="delete-review"),
 
     # Subscribe view for user subscriptions
-    path("subscribe/", SubscribeView.as_view(), name="subscribe"),
+    path("subscribe/", subscribe_view.as_view(), name="subscribe"),
+
+    # Subscribe/unsubscribe to/from a list of users
+    path("subscribe/bulk/", BulkSubscribeView.as_view(), name="subscribe-bulk"),
+
+    # Username prefix lookup for the subscription form
+    path("users/autocomplete/", UserAutocompleteView.as_view(), name="user-autocomplete"),
+
+    # Full-text search over the visible tickets and reviews
+    path("search/", SearchView.as_view(), name="search"),
 ]
@@ -1,84 +1,302 @@
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+import hashlib
+import json
+from collections import Counter
+from functools import partial
+from asgiref.sync import sync_to_async
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import UpdateView, CreateView, TemplateView, DeleteView
-from itertools import chain
-from django.db.models import Value, CharField
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views import View
 from django.urls import reverse
-from django.db import IntegrityError
-from django.contrib.auth.models import User
-from .models import Ticket, Review, UserFollow
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from core.ratelimit import RateLimitMixin
+from core.replicas import ReplicaReadMixin
+from .models import FeedEntry, Ticket, Review, UserFollow
 from .forms import TicketForm, ReviewForm, SubscribeForm
+from .uploads import StreamingUploadMixin
+from .autocomplete import usernames_starting_with
+from .follows import bulk_follow, bulk_unfollow, parse_usernames
+from .pagination import CountlessPaginator
+from .feeds import (
+    InvalidCursor,
+    cursor_page,
+    decode_cursor,
+    hydrate,
+    last_modified,
+    materialized_timeline,
+    serialize,
+    timeline,
+)
+from . import exports, follows, live, search, stats
 
 
 class BaseFeedsView(View):
     """
     Base view for handling feeds and posts.
+
+    Pages are delimited by keyset cursors (``?after=`` / ``?before=``) so only
+    the displayed rows are read, however deep the page. The former ``?page=``
+    links are still served through offset pagination of the same
+    database-side timeline, without counting it.
     """
-    def get_data(self, users=None):
+    per_page = 5
+    template_name = "reviews/feeds.html"
+    more_url_name = None
+    hydrator = staticmethod(hydrate)
+    page_numbers = True
+
+    def get_source(self):
         """
-        Get feeds/posts data for the provided users.
+        Get the timeline source, called as source(cursor, older), of the view.
         """
-        if users is None:
-            users = []
-
-        tickets = Ticket.objects.filter(user__in=users).annotate(
-            content_type=Value("TICKET", CharField())
-        )
-        reviews = Review.objects.filter(user__in=users).annotate(
-            content_type=Value("REVIEW", CharField())
-        )
-        return sorted(
-            chain(reviews, tickets), key=lambda feeds: feeds.time_created, reverse=True
-        )
+        raise NotImplementedError
 
     def get_paginator(self, data, per_page=5):
         """
-        Get a paginator for the provided data.
+        Get the requested page of the provided data, without counting it.
         """
-        paginator = Paginator(data, per_page)
-        page = self.request.GET.get("page")
-        try:
-            paginated_data = paginator.page(page)
-        except PageNotAnInteger:
-            paginated_data = paginator.page(1)
-        except EmptyPage:
-            paginated_data = paginator.page(paginator.num_pages)
+        paginated_data = CountlessPaginator(data, per_page).page(self.request.GET.get("page"))
+        paginated_data.object_list = self.hydrator(paginated_data.object_list)
         return paginated_data
 
+    def get_page(self):
+        """
+        Get the requested page of feeds/posts.
+        """
+        source = self.get_source()
+        if self.page_numbers and "page" in self.request.GET:
+            return self.get_paginator(source(None, True), per_page=self.per_page)
+        try:
+            return cursor_page(
+                source,
+                self.per_page,
+                after=self.request.GET.get("after"),
+                before=self.request.GET.get("before"),
+                hydrator=self.hydrator,
+            )
+        except InvalidCursor:
+            return cursor_page(source, self.per_page, hydrator=self.hydrator)
 
-class FeedsView(LoginRequiredMixin, BaseFeedsView):
+
+class FeedsView(ReplicaReadMixin, LoginRequiredMixin, BaseFeedsView):
     """
     View for displaying user feeds.
+
+    The feed is read from the user's materialized timeline (FeedEntry), so its
+    cost does not depend on the number of followed users.
     """
+    more_url_name = "feeds-more"
+
+    def get_source(self):
+        return partial(materialized_timeline, self.request.user)
+
     def get(self, request):
-        followed_users = UserFollow.objects.filter(user=request.user)
-        users = [followed_user.followed_user for followed_user in followed_users]
-        users.append(request.user)
-        feeds = self.get_data(users)
-        paginated_feeds = self.get_paginator(feeds, per_page=5)
+        paginated_feeds = self.get_page()
         return render(
             request,
-            "reviews/feeds.html",
-            context={"feeds": paginated_feeds, "title": "Feeds"},
+            self.template_name,
+            context={"feeds": paginated_feeds, "title": "Feeds", "more_url_name": self.more_url_name},
         )
 
 
-class PostsView(LoginRequiredMixin, BaseFeedsView):
+class FeedsMoreView(FeedsView):
+    """
+    View returning only the snippets of the next page of the feed, appended
+    by the infinite scroll of the feeds page.
+    """
+    template_name = "reviews/feed_items.html"
+
+
+class PostsView(ReplicaReadMixin, LoginRequiredMixin, BaseFeedsView):
     """
     View for displaying user posts.
     """
+    more_url_name = "posts-more"
+
+    def get_source(self):
+        return partial(timeline, [self.request.user])
+
     def get(self, request):
-        users = [request.user]
-        posts = self.get_data(users)
-        paginated_posts = self.get_paginator(posts, per_page=5)
-        return render(
-            request,
-            "reviews/feeds.html",
-            context={"feeds": paginated_posts, "title": "Posts"},
+        paginated_posts = self.get_page()
+        context = {"feeds": paginated_posts, "title": "Posts", "more_url_name": self.more_url_name}
+        if self.template_name == PostsView.template_name:
+            context["stats"] = stats.for_user(request.user)
+        return render(request, self.template_name, context=context)
+
+
+class PostsMoreView(PostsView):
+    """
+    View returning only the snippets of the next page of the user's posts,
+    appended by the infinite scroll of the posts page.
+    """
+    template_name = "reviews/feed_items.html"
+
+
+class BaseFeedsApiView(BaseFeedsView):
+    """
+    Base view serving feeds/posts as JSON, with conditional GET support.
+
+    Posts are serialized from ``values()`` rows. The ETag and Last-Modified
+    headers are derived from the newest activity of the timeline's authors
+    (UserStats.last_activity), from the authors themselves and from the
+    version of the timeline, so an unchanged poll gets a 304 without running
+    the timeline query.
+    """
+    per_page = 20
+    max_per_page = 100
+    hydrator = staticmethod(serialize)
+    page_numbers = False
+
+    def get_authors(self):
+        """
+        Get the ids of the users whose posts make up the timeline.
+        """
+        raise NotImplementedError
+
+    def get_timeline_version(self):
+        """
+        Get a value changing whenever posts are added to the timeline after
+        their authors' activity was recorded, or None.
+        """
+        return None
+
+    def get_validators(self):
+        """
+        Get the (etag, last_modified) pair of the requested page.
+        """
+        authors = sorted(self.get_authors())
+        modified = last_modified(authors)
+        key = "|".join([
+            self.request.get_full_path(),
+            str(self.request.user.pk),
+            ",".join(map(str, authors)),
+            modified.isoformat() if modified else "",
+            str(self.get_timeline_version()),
+        ])
+        etag = '"%s"' % hashlib.sha256(key.encode()).hexdigest()
+        return etag, modified
+
+    def get(self, request):
+        etag, modified = self.get_validators()
+        timestamp = int(modified.timestamp()) if modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            try:
+                self.per_page = min(
+                    max(int(request.GET.get("per_page", self.per_page)), 1), self.max_per_page
+                )
+            except ValueError:
+                pass
+            page = self.get_page()
+            response = JsonResponse({
+                "results": page.object_list,
+                "has_next": page.has_next,
+                "has_previous": page.has_previous,
+                "next_cursor": page.next_cursor if page.has_next else None,
+                "previous_cursor": page.previous_cursor if page.has_previous else None,
+            })
+        response.headers["ETag"] = etag
+        if timestamp is not None:
+            response.headers["Last-Modified"] = http_date(timestamp)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class FeedsApiView(ReplicaReadMixin, LoginRequiredMixin, BaseFeedsApiView):
+    """
+    View serving the user's feed as JSON.
+    """
+    def get_source(self):
+        return partial(materialized_timeline, self.request.user)
+
+    def get_authors(self):
+        return follows.followed_ids(self.request.user.pk) | {self.request.user.pk}
+
+    def get_timeline_version(self):
+        # The followers' timelines are filled by jobs, after the posts (and
+        # their authors' activity) are committed: the newest entry tells
+        # when they landed.
+        return FeedEntry.objects.filter(owner=self.request.user).aggregate(newest=Max("id"))["newest"]
+
+
+class PostsApiView(ReplicaReadMixin, LoginRequiredMixin, BaseFeedsApiView):
+    """
+    View serving the user's own posts as JSON.
+    """
+    def get_source(self):
+        return partial(timeline, [self.request.user])
+
+    def get_authors(self):
+        return {self.request.user.pk}
+
+
+class ExportView(LoginRequiredMixin, View):
+    """
+    View streaming a dump of all the user's tickets and reviews.
+
+    ``?format=`` is csv (default) or jsonl, and ``?images=1`` packages the
+    dump with the referenced images in a zip archive. The rows are read and
+    sent chunk by chunk (see reviews.exports), so the memory used does not
+    depend on the size of the user's history. Under ASGI the export is
+    streamed through an async iterator, which Django does not buffer.
+    """
+    def get(self, request):
+        export_format = request.GET.get("format", "csv")
+        if export_format not in exports.FORMATS:
+            return HttpResponse(status=400)
+        content_type, extension = exports.FORMATS[export_format]
+        filename = f"{request.user.username}-posts"
+        if request.GET.get("images"):
+            content = exports.export_zip(request.user, export_format)
+            content_type, filename = "application/zip", f"{filename}.zip"
+        else:
+            content = exports.export(request.user, export_format)
+            filename = f"{filename}.{extension}"
+        if isinstance(request, ASGIRequest):
+            content = exports.aiterate(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response.headers["X-Accel-Buffering"] = "no"
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+
+class LiveFeedView(View):
+    """
+    View streaming the new posts of the user's feed as Server-Sent Events.
+
+    The view is asynchronous: under ASGI an idle connection is a coroutine
+    waiting on its queue of the in-process hub, not a thread, and the
+    database is only read when the client resumes from a Last-Event-ID.
+    Under WSGI the stream would be buffered until it ends, so the view
+    answers 204, which tells the browser not to reconnect.
+    """
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+        if user is None:
+            return HttpResponse(status=401)
+        authors = await sync_to_async(follows.followed_ids)(user.pk) | {user.pk}
+        last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+        try:
+            if last_event_id:
+                decode_cursor(last_event_id)
+        except InvalidCursor:
+            last_event_id = None
+        response = StreamingHttpResponse(
+            live.stream(authors, last_event_id), content_type="text/event-stream"
         )
+        response.headers["Cache-Control"] = "no-cache"
+        # Keeps proxies such as nginx from buffering the stream.
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
 
 
 class TicketDeleteView(View):
@@ -104,7 +322,7 @@ class TicketDeleteView(View):
         return redirect("posts")
 
 
-class TicketUpdateView(UpdateView):
+class TicketUpdateView(StreamingUploadMixin, UpdateView):
     """
     View for updating a ticket.
     """
@@ -136,10 +354,24 @@ class TicketUpdateView(UpdateView):
         return reverse("posts")
 
 
-class TicketCreateView(CreateView):
+def save_ticket(t_form, user):
+    """
+    Save a validated TicketForm as a ticket of the given user.
+
+    This is the single path through which ticket images are stored: the
+    upload was streamed to a temporary file by StreamingUploadMixin and is
+    moved into the media storage, the derivatives being generated in the
+    background by the job queue.
+    """
+    t_form.instance.user = user
+    return t_form.save()
+
+
+class TicketCreateView(StreamingUploadMixin, RateLimitMixin, CreateView):
     """
     View for creating a new ticket.
     """
+    rate_limit_scope = "posts"
     model = Ticket
     form_class = TicketForm
     template_name = "reviews/ticket_form.html"
@@ -156,8 +388,8 @@ class TicketCreateView(CreateView):
         """
         Process the form data and assign the current user to the ticket.
         """
-        form.instance.user = self.request.user
-        return super().form_valid(form)
+        self.object = save_ticket(form, self.request.user)
+        return redirect(self.get_success_url())
 
     def get_success_url(self):
         """
@@ -170,10 +402,12 @@ class TicketCreateView(CreateView):
             return reverse('feeds')
 
 
-class ReviewAddView(CreateView):
+class ReviewAddView(RateLimitMixin, CreateView):
     """
     View for adding a new review.
     """
+    rate_limit_scope = "posts"
+
     def get(self, request, pk):
         """
         Display the review form for adding a new review.
@@ -223,10 +457,12 @@ class ReviewAddView(CreateView):
             return reverse('feeds')
 
 
-class ReviewAddFullView(View):
+class ReviewAddFullView(StreamingUploadMixin, RateLimitMixin, View):
     """
     View for adding a full review including a ticket.
     """
+    rate_limit_scope = "posts"
+
     def get(self, request):
         context = {"type": "full", "t_form": TicketForm(), "r_form": ReviewForm(), "title": "New Review"}
         return render(request, "reviews/review_form.html", context)
@@ -237,21 +473,15 @@ class ReviewAddFullView(View):
 
         if t_form.is_valid() and r_form.is_valid():
             # Create a new ticket and associated review
-            image = None
-            t = Ticket.objects.create(
-                user=request.user,
-                title=request.POST["title"],
-                description=request.POST["description"],
-                image=image,
-            )
-            t.save()
-            Review.objects.create(
-                ticket=t,
-                user=request.user,
-                headline=request.POST["headline"],
-                rating=request.POST["rating"],
-                body=request.POST["body"],
-            )
+            with transaction.atomic():
+                t = save_ticket(t_form, request.user)
+                Review.objects.create(
+                    ticket=t,
+                    user=request.user,
+                    headline=request.POST["headline"],
+                    rating=request.POST["rating"],
+                    body=request.POST["body"],
+                )
             messages.success(request, "Your review has been posted!")
             return redirect("feeds")
 
@@ -316,64 +546,155 @@ class ReviewDeleteView(DeleteView):
         return reverse("posts")
 
 
-class SubscribeView(LoginRequiredMixin, TemplateView):
+def handle_subscription(request):
+    """
+    Subscribe or unsubscribe the user to/from the posted username.
+    """
+    form = SubscribeForm(request.POST)
+    action = request.POST.get("action")
+
+    if form.is_valid():
+        followed_user = form.cleaned_data["followed_user"]
+        if request.user == followed_user:
+            messages.error(request, "You can't subscribe/unsubscribe to/from yourself!")
+        else:
+            if action == "subscribe":
+                try:
+                    UserFollow.objects.create(
+                        user=request.user, followed_user=followed_user
+                    )
+                    messages.success(
+                        request, f"You have subscribed to {followed_user.username}!"
+                    )
+                except IntegrityError:
+                    messages.error(
+                        request, f"Already following {followed_user.username}!"
+                    )
+            elif action == "unsubscribe":
+                try:
+                    follow = UserFollow.objects.get(
+                        user=request.user, followed_user=followed_user
+                    )
+                    follow.delete()
+                    messages.success(
+                        request, f"You have unsubscribed from {followed_user.username}!"
+                    )
+                except UserFollow.DoesNotExist:
+                    messages.error(
+                        request, f"You were not following {followed_user.username}!"
+                    )
+    else:
+        for error in form.errors.get("followed_user", []):
+            messages.error(request, error)
+
+    return redirect("subscribe")
+
+
+class SubscribeView(ReplicaReadMixin, LoginRequiredMixin, RateLimitMixin, TemplateView):
     """
     View for subscribing and unsubscribing to/from users.
     """
+    rate_limit_scope = "follows"
     template_name = "reviews/subscribe.html"
     title = "Subscriptions"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user_follows = UserFollow.objects.filter(user=self.request.user).order_by(
+        user_follows = UserFollow.objects.filter(user=self.request.user).select_related(
             "followed_user"
-        )
+        ).order_by("followed_user")
         followed_by = UserFollow.objects.filter(
             followed_user=self.request.user
-        ).order_by("user")
+        ).select_related("user").order_by("user")
         context["form"] = SubscribeForm()
         context["user_follows"] = user_follows
         context["followed_by"] = followed_by
+        context["stats"] = stats.for_user(self.request.user)
         context["title"] = self.title
         return context
 
     def post(self, request, *args, **kwargs):
-        form = SubscribeForm(request.POST)
-        action = request.POST.get("action")
+        return handle_subscription(request)
+
+
+class BulkSubscribeView(LoginRequiredMixin, RateLimitMixin, View):
+    """
+    View subscribing or unsubscribing to/from many users at once.
+
+    Accepts either a JSON body {"action": ..., "usernames": [...]} or a form
+    with an ``action`` and a ``usernames`` list or an uploaded CSV ``file``,
+    of at most BULK_FOLLOW_MAX_USERNAMES users. Returns the result of every
+    username as JSON.
+    """
+    rate_limit_scope = "follows"
 
-        if form.is_valid():
-            followed_user = form.cleaned_data["followed_user"]
+    def post(self, request):
+        if request.content_type == "application/json":
             try:
-                followed_user = User.objects.get(pk=followed_user.id)
-                if request.user == followed_user:
-                    messages.error(request, "You can't subscribe/unsubscribe to/from yourself!")
-                else:
-                    if action == "subscribe":
-                        try:
-                            UserFollow.objects.create(
-                                user=request.user, followed_user=followed_user
-                            )
-                            messages.success(
-                                request, f"You have subscribed to {followed_user.username}!"
-                            )
-                        except IntegrityError:
-                            messages.error(
-                                request, f"Already following {followed_user.username}!"
-                            )
-                    elif action == "unsubscribe":
-                        try:
-                            follow = UserFollow.objects.get(
-                                user=request.user, followed_user=followed_user
-                            )
-                            follow.delete()
-                            messages.success(
-                                request, f"You have unsubscribed from {followed_user.username}!"
-                            )
-                        except UserFollow.DoesNotExist:
-                            messages.error(
-                                request, f"You were not following {followed_user.username}!"
-                            )
-            except User.DoesNotExist:
-                messages.error(request, f"User {followed_user.username} does not exist")
-
-        return redirect("subscribe")
+                payload = json.loads(request.body)
+                action = payload.get("action")
+                usernames = payload.get("usernames", [])
+            except (ValueError, AttributeError):
+                return JsonResponse({"error": "Invalid JSON body."}, status=400)
+            if not isinstance(usernames, list) or not all(isinstance(name, str) for name in usernames):
+                return JsonResponse({"error": "usernames must be a list of strings."}, status=400)
+            usernames = parse_usernames("\n".join(usernames))
+        else:
+            action = request.POST.get("action")
+            upload = request.FILES.get("file")
+            text = upload.read().decode("utf-8-sig") if upload else request.POST.get("usernames", "")
+            usernames = parse_usernames(text)
+
+        if action not in ("subscribe", "unsubscribe"):
+            return JsonResponse({"error": "action must be subscribe or unsubscribe."}, status=400)
+        if len(usernames) > follows.bulk_max_usernames():
+            return JsonResponse(
+                {"error": f"At most {follows.bulk_max_usernames()} usernames at once."}, status=400
+            )
+        if action == "subscribe":
+            results = bulk_follow(request.user, usernames)
+        else:
+            results = bulk_unfollow(request.user, usernames)
+        return JsonResponse({"results": results, "summary": Counter(results.values())})
+
+
+class UserAutocompleteView(LoginRequiredMixin, View):
+    """
+    View returning, as JSON, the usernames starting with the ``q`` parameter.
+    """
+    def get(self, request):
+        usernames = usernames_starting_with(request.GET.get("q", ""))
+        return JsonResponse({"results": usernames})
+
+
+class SearchView(LoginRequiredMixin, View):
+    """
+    View for searching the tickets and reviews the user can see.
+
+    Only the user's own posts and those of the users it follows are
+    searched, through the full-text index (see reviews.search). Databases
+    without the index (not SQLite, or SQLite built without FTS5) get a page
+    saying that search is unavailable.
+    """
+    template_name = "reviews/search.html"
+    per_page = 10
+
+    def get(self, request):
+        query = request.GET.get("q", "").strip()
+        if not search.is_available():
+            context = {"title": "Search", "query": query, "unavailable": True}
+            return render(request, self.template_name, context, status=503)
+        authors = follows.followed_ids(request.user.pk) | {request.user.pk}
+        try:
+            results, next_cursor = search.search(
+                query, authors, self.per_page, after=request.GET.get("after")
+            )
+        except InvalidCursor:
+            results, next_cursor = search.search(query, authors, self.per_page)
+        context = {
+            "title": "Search",
+            "query": query,
+            "results": results,
+            "next_cursor": next_cursor,
+        }
+        return render(request, self.template_name, context)